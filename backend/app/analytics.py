@@ -0,0 +1,165 @@
+"""
+Per-user analytics rollups.
+
+Tracking an action also adds it to its user x UTC day x library action row in
+user_action_daily, inside the same transaction, so the analytics endpoints
+read a few rows per active day instead of rescanning tracked_actions.
+Free-text actions share library_id 0. History recorded before the rollup
+existed (or rows that have drifted) is rebuilt from tracked_actions with:
+
+    cd backend && python -m app.analytics backfill [USER_ID]
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import Date, cast, delete, distinct, func, insert, select
+from sqlalchemy.engine import Engine
+from typing import Iterable, Optional
+import sys
+import os
+
+from app.database import engine as default_engine
+from app.models import ActionLibrary, GameSession, TrackedAction, UserActionDaily
+
+CUSTOM_ACTION_ID = 0
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("ANALYTICS_DEFAULT_DAYS", "30"))
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", "366"))
+ANALYTICS_TOP_ACTIONS = int(os.getenv("ANALYTICS_TOP_ACTIONS", "10"))
+
+def _dialect_insert(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise RuntimeError(f"Analytics rollups need ON CONFLICT support, not available on {dialect_name}")
+    return dialect_insert
+
+def _utc_date(timestamp: datetime) -> date:
+    # Postgres hands timestamptz back aware, SQLite naive UTC
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.date()
+
+def rollup_upsert(dialect_name: str, user_id: int, actions: Iterable):
+    """
+    INSERT ... ON CONFLICT statement adding `actions` to their days' rollup rows.
+
+    Pass the stored rows (after flush or RETURNING), so each action lands on
+    the UTC day of the timestamp the database gave it, as backfill computes it.
+    """
+    totals = defaultdict(lambda: [0, 0, 0])
+    for action in actions:
+        total = totals[_utc_date(action.timestamp), action.library_id or CUSTOM_ACTION_ID]
+        total[0] += 1
+        total[1] += action.user_movement
+        total[2] += action.llm_movement
+
+    stmt = _dialect_insert(dialect_name)(UserActionDaily).values([
+        {
+            "user_id": user_id,
+            "day": day,
+            "library_id": library_id,
+            "action_count": count,
+            "user_movement_total": user_movement,
+            "llm_movement_total": llm_movement
+        }
+        for (day, library_id), (count, user_movement, llm_movement) in totals.items()
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[UserActionDaily.user_id, UserActionDaily.day, UserActionDaily.library_id],
+        set_={
+            "action_count": UserActionDaily.action_count + stmt.excluded.action_count,
+            "user_movement_total": UserActionDaily.user_movement_total + stmt.excluded.user_movement_total,
+            "llm_movement_total": UserActionDaily.llm_movement_total + stmt.excluded.llm_movement_total,
+        }
+    )
+
+def _utc_day(column, dialect_name: str):
+    if dialect_name == "postgresql":
+        return cast(func.timezone("UTC", column), Date)
+    # SQLite stores UTC already, and Date columns as YYYY-MM-DD text
+    return func.date(column)
+
+def backfill(engine: Engine = default_engine, user_id: Optional[int] = None) -> int:
+    """Rebuild rollup rows from tracked_actions for one user, or for everyone."""
+    day = _utc_day(TrackedAction.timestamp, engine.dialect.name)
+    library_id = func.coalesce(TrackedAction.library_id, CUSTOM_ACTION_ID)
+    rebuilt = (
+        select(
+            GameSession.user_id,
+            day,
+            library_id,
+            func.count(TrackedAction.action_id),
+            func.sum(TrackedAction.user_movement),
+            func.sum(TrackedAction.llm_movement)
+        )
+        .join(GameSession, GameSession.session_id == TrackedAction.session_id)
+        .group_by(GameSession.user_id, day, library_id)
+    )
+    clear = delete(UserActionDaily)
+    if user_id is not None:
+        rebuilt = rebuilt.where(GameSession.user_id == user_id)
+        clear = clear.where(UserActionDaily.user_id == user_id)
+
+    with engine.begin() as conn:
+        conn.execute(clear)
+        result = conn.execute(insert(UserActionDaily).from_select(
+            ["user_id", "day", "library_id", "action_count", "user_movement_total", "llm_movement_total"],
+            rebuilt
+        ))
+    return result.rowcount
+
+def window_start(days: int) -> date:
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+def summary_queries(user_id: int, since: date, top_n: int = ANALYTICS_TOP_ACTIONS):
+    """The three rollup queries behind /api/analytics/summary: totals, per day, top actions."""
+    sums = (
+        func.coalesce(func.sum(UserActionDaily.action_count), 0).label("action_count"),
+        func.coalesce(func.sum(UserActionDaily.user_movement_total), 0).label("user_movement"),
+        func.coalesce(func.sum(UserActionDaily.llm_movement_total), 0).label("llm_movement"),
+    )
+    totals = (
+        select(*sums, func.count(distinct(UserActionDaily.day)).label("active_days"))
+        .where(UserActionDaily.user_id == user_id)
+    )
+    daily = (
+        select(UserActionDaily.day, *sums)
+        .where(UserActionDaily.user_id == user_id, UserActionDaily.day >= since)
+        .group_by(UserActionDaily.day)
+        .order_by(UserActionDaily.day)
+    )
+    top_actions = (
+        select(UserActionDaily.library_id, ActionLibrary.action_description, *sums)
+        .outerjoin(ActionLibrary, ActionLibrary.library_id == UserActionDaily.library_id)
+        .where(UserActionDaily.user_id == user_id, UserActionDaily.day >= since)
+        .group_by(UserActionDaily.library_id, ActionLibrary.action_description)
+        .order_by(sums[0].desc(), UserActionDaily.library_id)
+        .limit(top_n)
+    )
+    return totals, daily, top_actions
+
+def build_summary(since: date, totals, daily_rows, top_rows) -> dict:
+    return {
+        "since": since,
+        "totals": dict(totals._mapping),
+        "days": [dict(row._mapping) for row in daily_rows],
+        "top_actions": [
+            {
+                **row._mapping,
+                "library_id": row.library_id or None,
+                "action_description": row.action_description if row.library_id else "Custom actions"
+            }
+            for row in top_rows
+        ],
+    }
+
+def main(argv: list[str]) -> None:
+    if not argv or argv[0] != "backfill":
+        print(__doc__.strip())
+        sys.exit(2)
+    user_id = int(argv[1]) if len(argv) > 1 else None
+    print(f"Rebuilt {backfill(user_id=user_id)} rollup rows")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,49 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
+from collections import Counter
 from app.database import get_db
-from app.models import User, ActionLibrary, TrackedAction, GameSession, GameSessionLog
+from app.models import ActionLibrary, TrackedAction, GameSession, GameSessionLog
 from app.schemas import (
     ActionLibraryCreate, ActionLibraryResponse,
     TrackedActionCreate, TrackedActionResponse,
     GameSessionLogCreate, GameSessionLogResponse
 )
-from app.auth import get_current_user
+from app.auth import get_current_user_id
+from app.conditional import etag_matches, not_modified, session_etag, session_version_headers
+from app import analytics, events, idempotency, library_cache
+from app.api.sessions import bump_version, get_owned_session
+from app.usage_counter import usage_counter
+from app.pagination import ACTIONS_KEYSET, LOGS_KEYSET, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, next_cursor_headers, time_bound
+from app.fastjson import FastJSONResponse, columns, list_response
 
 router = APIRouter()
 
 # Action Library endpoints
 @router.get("/library", response_model=List[ActionLibraryResponse])
 def get_action_library(
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    # Get all non-user-created actions plus user's custom actions
-    actions = db.query(ActionLibrary).filter(
-        (ActionLibrary.user_created == False) |
-        (ActionLibrary.created_from_session_id.in_(
-            db.query(GameSession.session_id).filter(GameSession.user_id == current_user.user_id)
-        ))
-    ).order_by(ActionLibrary.times_used.desc()).all()
-    return actions
+    # Starter actions plus the user's custom actions, served from the library cache
+    if_none_match = request.headers.get("if-none-match")
+    etag = library_cache.current_etag(current_user_id)
+    if etag and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    etag, actions = library_cache.get_library(db, current_user_id)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    # The cached rows are already plain dicts in ActionLibraryResponse shape
+    return FastJSONResponse(actions, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
 
 @router.post("/library", response_model=ActionLibraryResponse, status_code=status.HTTP_201_CREATED)
 def create_library_action(
     action_data: ActionLibraryCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
     # Verify session belongs to user if provided
     if action_data.created_from_session_id:
-        session = db.query(GameSession).filter(
-            GameSession.session_id == action_data.created_from_session_id,
-            GameSession.user_id == current_user.user_id
-        ).first()
-        if not session:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Session not found"
-            )
+        get_owned_session(db, action_data.created_from_session_id, current_user_id)
 
     new_action = ActionLibrary(
         action_description=action_data.action_description,
@@ -55,6 +61,7 @@ def create_library_action(
     db.add(new_action)
     db.commit()
     db.refresh(new_action)
+    library_cache.invalidate_user(current_user_id)
     return new_action
 
 @router.patch("/library/{library_id}", response_model=ActionLibraryResponse)
@@ -62,7 +69,7 @@ def update_library_action(
     library_id: int,
     action_data: ActionLibraryCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
     # Get the action
     action = db.query(ActionLibrary).filter(ActionLibrary.library_id == library_id).first()
@@ -84,7 +91,7 @@ def update_library_action(
     if action.created_from_session_id:
         session = db.query(GameSession).filter(
             GameSession.session_id == action.created_from_session_id,
-            GameSession.user_id == current_user.user_id
+            GameSession.user_id == current_user_id
         ).first()
         if not session:
             raise HTTPException(
@@ -99,13 +106,14 @@ def update_library_action(
 
     db.commit()
     db.refresh(action)
+    library_cache.invalidate_user(current_user_id)
     return action
 
 @router.delete("/library/{library_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_library_action(
     library_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
     # Get the action
     action = db.query(ActionLibrary).filter(ActionLibrary.library_id == library_id).first()
@@ -127,7 +135,7 @@ def delete_library_action(
     if action.created_from_session_id:
         session = db.query(GameSession).filter(
             GameSession.session_id == action.created_from_session_id,
-            GameSession.user_id == current_user.user_id
+            GameSession.user_id == current_user_id
         ).first()
         if not session:
             raise HTTPException(
@@ -137,19 +145,27 @@ def delete_library_action(
 
     db.delete(action)
     db.commit()
+    library_cache.invalidate_user(current_user_id)
     return None
 
 # Tracked Actions endpoints
 @router.post("/track", response_model=TrackedActionResponse, status_code=status.HTTP_201_CREATED)
 def track_action(
     action_data: TrackedActionCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
+    # A retry of a request that already went through gets the stored response
+    key = idempotency.request_key(current_user_id, idempotency_key, "track", action_data)
+    replayed = idempotency.replay(db, key)
+    if replayed is not None:
+        return replayed
+
     # Verify session belongs to user
-    session = db.query(GameSession).filter(
+    session = db.query(GameSession.session_id).filter(
         GameSession.session_id == action_data.session_id,
-        GameSession.user_id == current_user.user_id
+        GameSession.user_id == current_user_id
     ).first()
 
     if not session:
@@ -158,42 +174,73 @@ def track_action(
             detail="Session not found"
         )
 
+    # Update session scores and version in SQL so concurrent taps can't overwrite each other
+    scores = (db.execute(
+        update(GameSession)
+        .where(GameSession.session_id == action_data.session_id)
+        .values(
+            user_score=GameSession.user_score + action_data.user_movement,
+            llm_score=GameSession.llm_score + action_data.llm_movement,
+            version=GameSession.version + 1
+        )
+        .returning(GameSession.user_score, GameSession.llm_score, GameSession.version)
+        .execution_options(synchronize_session=False)
+    )).one()
+
     # Create tracked action
     tracked_action = TrackedAction(
         session_id=action_data.session_id,
         library_id=action_data.library_id,
         action_description=action_data.action_description,
         user_movement=action_data.user_movement,
-        llm_movement=action_data.llm_movement
+        llm_movement=action_data.llm_movement,
+        session_version=scores.version
     )
     db.add(tracked_action)
-
-    # Update session scores
-    session.user_score += action_data.user_movement
-    session.llm_score += action_data.llm_movement
-
-    # Update library action times_used if from library
-    if action_data.library_id:
-        library_action = db.query(ActionLibrary).filter(
-            ActionLibrary.library_id == action_data.library_id
-        ).first()
-        if library_action:
-            library_action.times_used += 1
-
-    db.commit()
+    db.flush()
     db.refresh(tracked_action)
-    return tracked_action
-
-@router.get("/session/{session_id}/actions", response_model=List[TrackedActionResponse])
-def get_session_actions(
-    session_id: int,
+    # The analytics rollup is updated in the same transaction, on the stored timestamp's day
+    db.execute(analytics.rollup_upsert(db.get_bind().dialect.name, current_user_id, [tracked_action]))
+    response = TrackedActionResponse.model_validate(tracked_action)
+    replayed = idempotency.commit(db, key, status.HTTP_201_CREATED, response)
+    if replayed is not None:
+        return replayed
+
+    # times_used is aggregated in memory and flushed in the background
+    if action_data.library_id:
+        usage_counter.add(action_data.library_id)
+    events.publish_scores(action_data.session_id, scores, [response])
+    return response
+
+@router.post("/track/batch", response_model=List[TrackedActionResponse], status_code=status.HTTP_201_CREATED)
+def track_actions_batch(
+    actions_data: List[TrackedActionCreate],
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
+    if not actions_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No actions to track"
+        )
+
+    session_id = actions_data[0].session_id
+    if any(action_data.session_id != session_id for action_data in actions_data):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="All actions in a batch must belong to the same session"
+        )
+
+    key = idempotency.request_key(current_user_id, idempotency_key, "track_batch", actions_data)
+    replayed = idempotency.replay(db, key)
+    if replayed is not None:
+        return replayed
+
     # Verify session belongs to user
-    session = db.query(GameSession).filter(
+    session = db.query(GameSession.session_id).filter(
         GameSession.session_id == session_id,
-        GameSession.user_id == current_user.user_id
+        GameSession.user_id == current_user_id
     ).first()
 
     if not session:
@@ -202,29 +249,90 @@ def get_session_actions(
             detail="Session not found"
         )
 
-    actions = db.query(TrackedAction).filter(
-        TrackedAction.session_id == session_id
-    ).all()
-    return actions
+    # Apply the summed score movement atomically; the whole batch is one version
+    scores = (db.execute(
+        update(GameSession)
+        .where(GameSession.session_id == session_id)
+        .values(
+            user_score=GameSession.user_score + sum(a.user_movement for a in actions_data),
+            llm_score=GameSession.llm_score + sum(a.llm_movement for a in actions_data),
+            version=GameSession.version + 1
+        )
+        .returning(GameSession.user_score, GameSession.llm_score, GameSession.version)
+        .execution_options(synchronize_session=False)
+    )).one()
+
+    # Insert all tracked actions in one statement
+    tracked_actions = db.execute(
+        insert(TrackedAction)
+        .returning(*TrackedAction.__table__.c)
+        .execution_options(render_nulls=True),
+        [
+            {
+                "session_id": session_id,
+                "library_id": action_data.library_id,
+                "action_description": action_data.action_description,
+                "user_movement": action_data.user_movement,
+                "llm_movement": action_data.llm_movement,
+                "session_version": scores.version
+            }
+            for action_data in actions_data
+        ]
+    ).mappings().all()
+    tracked_actions = sorted(tracked_actions, key=lambda action: action["action_id"])
+    response = [TrackedActionResponse.model_validate(dict(action)) for action in tracked_actions]
+    db.execute(analytics.rollup_upsert(db.get_bind().dialect.name, current_user_id, response))
+    replayed = idempotency.commit(db, key, status.HTTP_201_CREATED, response)
+    if replayed is not None:
+        return replayed
+
+    usage_counter.add_many(Counter(a.library_id for a in actions_data if a.library_id))
+    events.publish_scores(session_id, scores, response)
+    return response
+
+@router.get("/session/{session_id}/actions", response_model=List[TrackedActionResponse])
+def get_session_actions(
+    session_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    since_version: Optional[int] = Query(None, ge=0)
+):
+    # Verify session belongs to user; its version says whether anything changed
+    session = get_owned_session(db, session_id, current_user_id)
+    etag = session_etag(session, "actions", {
+        "limit": limit, "cursor": cursor, "since": since, "since_version": since_version
+    })
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
+    query = db.query(*columns(TrackedAction, TrackedActionResponse)).filter(TrackedAction.session_id == session_id)
+    if since:
+        query = query.filter(TrackedAction.timestamp >= time_bound(TrackedAction.timestamp, since))
+    if since_version is not None:
+        # Only rows written after the version the client last saw
+        query = query.filter(TrackedAction.session_version > since_version)
+    actions, next_cursor = ACTIONS_KEYSET.page(ACTIONS_KEYSET.apply(query, cursor, limit).all(), limit)
+    return list_response(TrackedActionResponse, actions, {**next_cursor_headers(next_cursor), **session_version_headers(session, etag)})
 
 # Game Session Logs endpoints
 @router.post("/log", response_model=GameSessionLogResponse, status_code=status.HTTP_201_CREATED)
 def create_log(
     log_data: GameSessionLogCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    # Verify session and action belong to user
-    session = db.query(GameSession).filter(
-        GameSession.session_id == log_data.session_id,
-        GameSession.user_id == current_user.user_id
-    ).first()
+    key = idempotency.request_key(current_user_id, idempotency_key, "log", log_data)
+    replayed = idempotency.replay(db, key)
+    if replayed is not None:
+        return replayed
 
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
+    # Verify session and action belong to user
+    get_owned_session(db, log_data.session_id, current_user_id)
 
     action = db.query(TrackedAction).filter(
         TrackedAction.action_id == log_data.action_id,
@@ -240,32 +348,43 @@ def create_log(
     new_log = GameSessionLog(
         session_id=log_data.session_id,
         action_id=log_data.action_id,
-        optional_note=log_data.optional_note
+        optional_note=log_data.optional_note,
+        session_version=bump_version(db, log_data.session_id)
     )
     db.add(new_log)
-    db.commit()
+    db.flush()
     db.refresh(new_log)
-    return new_log
+    response = GameSessionLogResponse.model_validate(new_log)
+    replayed = idempotency.commit(db, key, status.HTTP_201_CREATED, response)
+    if replayed is not None:
+        return replayed
+    events.publish(log_data.session_id, "log", response)
+    return response
 
 @router.get("/session/{session_id}/logs", response_model=List[GameSessionLogResponse])
 def get_session_logs(
     session_id: int,
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    since_version: Optional[int] = Query(None, ge=0)
 ):
-    # Verify session belongs to user
-    session = db.query(GameSession).filter(
-        GameSession.session_id == session_id,
-        GameSession.user_id == current_user.user_id
-    ).first()
-
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
-
-    logs = db.query(GameSessionLog).filter(
-        GameSessionLog.session_id == session_id
-    ).order_by(GameSessionLog.timestamp.asc()).all()
-    return logs
+    # Verify session belongs to user; its version says whether anything changed
+    session = get_owned_session(db, session_id, current_user_id)
+    etag = session_etag(session, "logs", {
+        "limit": limit, "cursor": cursor, "since": since, "since_version": since_version
+    })
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
+    query = db.query(*columns(GameSessionLog, GameSessionLogResponse)).filter(GameSessionLog.session_id == session_id)
+    if since:
+        query = query.filter(GameSessionLog.timestamp >= time_bound(GameSessionLog.timestamp, since))
+    if since_version is not None:
+        # Only rows written after the version the client last saw
+        query = query.filter(GameSessionLog.session_version > since_version)
+    logs, next_cursor = LOGS_KEYSET.page(LOGS_KEYSET.apply(query, cursor, limit).all(), limit)
+    return list_response(GameSessionLogResponse, logs, {**next_cursor_headers(next_cursor), **session_version_headers(session, etag)})
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, Query, status
+from typing import Optional
+from app.schemas import SlowQueryLogResponse
+from app.auth import get_admin_user_id
+from app import slow_queries
+
+router = APIRouter()
+
+@router.get("/slow-queries", response_model=SlowQueryLogResponse)
+def get_slow_queries(
+    route: Optional[str] = Query(None, description='e.g. "GET /api/sessions/{session_id}/state"'),
+    min_duration_ms: float = Query(0.0, ge=0),
+    limit: int = Query(50, ge=1, le=slow_queries.SLOW_QUERY_BUFFER_SIZE),
+    admin_user_id: int = Depends(get_admin_user_id)
+):
+    # Newest first, from this process's ring buffer
+    return SlowQueryLogResponse(
+        enabled=slow_queries.SLOW_QUERY_LOG,
+        threshold_ms=slow_queries.SLOW_QUERY_THRESHOLD_MS,
+        sample_rate=slow_queries.SLOW_QUERY_SAMPLE_RATE,
+        recorded=slow_queries.slow_query_log.recorded,
+        samples=slow_queries.query_samples(route, min_duration_ms, limit)
+    )
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+def clear_slow_queries(admin_user_id: int = Depends(get_admin_user_id)):
+    slow_queries.slow_query_log.clear()
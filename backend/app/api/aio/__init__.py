@@ -0,0 +1,14 @@
+# Async route handlers, used in place of the blocking ones when DB_MODE=async
+from fastapi import APIRouter
+from fastapi.routing import APIRoute
+
+def overlay(sync_router: APIRouter, async_router: APIRouter) -> APIRouter:
+    # Swap in async handlers route by route so path ordering (e.g. /export-all
+    # before /{session_id}) is preserved and unported endpoints keep working
+    def key(route):
+        return (route.path, frozenset(route.methods)) if isinstance(route, APIRoute) else None
+
+    async_routes = {key(route): route for route in async_router.routes}
+    routes = [async_routes.pop(key(route), route) for route in sync_router.routes]
+    routes.extend(async_routes.values())
+    return APIRouter(routes=routes)
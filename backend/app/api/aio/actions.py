@@ -0,0 +1,347 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+from collections import Counter
+from app.database import get_async_db
+from app.models import ActionLibrary, TrackedAction, GameSession, GameSessionLog
+from app.schemas import (
+    ActionLibraryCreate, ActionLibraryResponse,
+    TrackedActionCreate, TrackedActionResponse,
+    GameSessionLogCreate, GameSessionLogResponse
+)
+from app.auth import get_current_user_id_async
+from app.conditional import etag_matches, not_modified, session_etag, session_version_headers
+from app import analytics, events, idempotency, library_cache
+from app.api.aio.sessions import bump_version, get_owned_session
+from app.usage_counter import usage_counter
+from app.pagination import ACTIONS_KEYSET, LOGS_KEYSET, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, next_cursor_headers, time_bound
+from app.fastjson import FastJSONResponse, columns, list_response
+
+router = APIRouter()
+
+# Action Library endpoints
+@router.get("/library", response_model=List[ActionLibraryResponse])
+async def get_action_library(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    # Starter actions plus the user's custom actions, served from the library cache
+    if_none_match = request.headers.get("if-none-match")
+    etag = library_cache.current_etag(current_user_id)
+    if etag and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    etag, actions = await library_cache.get_library_async(db, current_user_id)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    # The cached rows are already plain dicts in ActionLibraryResponse shape
+    return FastJSONResponse(actions, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+@router.post("/library", response_model=ActionLibraryResponse, status_code=status.HTTP_201_CREATED)
+async def create_library_action(
+    action_data: ActionLibraryCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    # Verify session belongs to user if provided
+    if action_data.created_from_session_id:
+        await get_owned_session(db, action_data.created_from_session_id, current_user_id)
+
+    new_action = ActionLibrary(
+        action_description=action_data.action_description,
+        default_user_movement=action_data.default_user_movement,
+        default_llm_movement=action_data.default_llm_movement,
+        created_from_session_id=action_data.created_from_session_id,
+        user_created=True
+    )
+    db.add(new_action)
+    await db.commit()
+    await db.refresh(new_action)
+    library_cache.invalidate_user(current_user_id)
+    return new_action
+
+async def _get_editable_action(db: AsyncSession, library_id: int, user_id: int, verb: str) -> ActionLibrary:
+    action = await db.get(ActionLibrary, library_id)
+
+    if not action:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Action not found"
+        )
+
+    # Only allow changing user-created actions
+    if not action.user_created:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Cannot {verb} starter actions"
+        )
+
+    # Verify the action was created by this user (by checking the session)
+    if action.created_from_session_id:
+        owner = await db.scalar(select(GameSession.session_id).where(
+            GameSession.session_id == action.created_from_session_id,
+            GameSession.user_id == user_id
+        ))
+        if not owner:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Not authorized to {verb} this action"
+            )
+    return action
+
+@router.patch("/library/{library_id}", response_model=ActionLibraryResponse)
+async def update_library_action(
+    library_id: int,
+    action_data: ActionLibraryCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    action = await _get_editable_action(db, library_id, current_user_id, "edit")
+
+    # Update fields
+    action.action_description = action_data.action_description
+    action.default_user_movement = action_data.default_user_movement
+    action.default_llm_movement = action_data.default_llm_movement
+
+    await db.commit()
+    await db.refresh(action)
+    library_cache.invalidate_user(current_user_id)
+    return action
+
+@router.delete("/library/{library_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_library_action(
+    library_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    action = await _get_editable_action(db, library_id, current_user_id, "delete")
+
+    await db.delete(action)
+    await db.commit()
+    library_cache.invalidate_user(current_user_id)
+    return None
+
+# Tracked Actions endpoints
+@router.post("/track", response_model=TrackedActionResponse, status_code=status.HTTP_201_CREATED)
+async def track_action(
+    action_data: TrackedActionCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    # A retry of a request that already went through gets the stored response
+    key = idempotency.request_key(current_user_id, idempotency_key, "track", action_data)
+    replayed = await idempotency.replay_async(db, key)
+    if replayed is not None:
+        return replayed
+
+    await get_owned_session(db, action_data.session_id, current_user_id)
+
+    # Update session scores and version in SQL so concurrent taps can't overwrite each other
+    scores = (await db.execute(
+        update(GameSession)
+        .where(GameSession.session_id == action_data.session_id)
+        .values(
+            user_score=GameSession.user_score + action_data.user_movement,
+            llm_score=GameSession.llm_score + action_data.llm_movement,
+            version=GameSession.version + 1
+        )
+        .returning(GameSession.user_score, GameSession.llm_score, GameSession.version)
+        .execution_options(synchronize_session=False)
+    )).one()
+
+    # Create tracked action
+    tracked_action = TrackedAction(
+        session_id=action_data.session_id,
+        library_id=action_data.library_id,
+        action_description=action_data.action_description,
+        user_movement=action_data.user_movement,
+        llm_movement=action_data.llm_movement,
+        session_version=scores.version
+    )
+    db.add(tracked_action)
+    await db.flush()
+    await db.refresh(tracked_action)
+    # The analytics rollup is updated in the same transaction, on the stored timestamp's day
+    await db.execute(analytics.rollup_upsert(db.bind.dialect.name, current_user_id, [tracked_action]))
+    response = TrackedActionResponse.model_validate(tracked_action)
+    replayed = await idempotency.commit_async(db, key, status.HTTP_201_CREATED, response)
+    if replayed is not None:
+        return replayed
+
+    # times_used is aggregated in memory and flushed in the background
+    if action_data.library_id:
+        usage_counter.add(action_data.library_id)
+    events.publish_scores(action_data.session_id, scores, [response])
+    return response
+
+@router.post("/track/batch", response_model=List[TrackedActionResponse], status_code=status.HTTP_201_CREATED)
+async def track_actions_batch(
+    actions_data: List[TrackedActionCreate],
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    if not actions_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No actions to track"
+        )
+
+    session_id = actions_data[0].session_id
+    if any(action_data.session_id != session_id for action_data in actions_data):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="All actions in a batch must belong to the same session"
+        )
+
+    key = idempotency.request_key(current_user_id, idempotency_key, "track_batch", actions_data)
+    replayed = await idempotency.replay_async(db, key)
+    if replayed is not None:
+        return replayed
+
+    await get_owned_session(db, session_id, current_user_id)
+
+    # Apply the summed score movement atomically; the whole batch is one version
+    scores = (await db.execute(
+        update(GameSession)
+        .where(GameSession.session_id == session_id)
+        .values(
+            user_score=GameSession.user_score + sum(a.user_movement for a in actions_data),
+            llm_score=GameSession.llm_score + sum(a.llm_movement for a in actions_data),
+            version=GameSession.version + 1
+        )
+        .returning(GameSession.user_score, GameSession.llm_score, GameSession.version)
+        .execution_options(synchronize_session=False)
+    )).one()
+
+    # Insert all tracked actions in one statement
+    result = await db.execute(
+        insert(TrackedAction)
+        .returning(*TrackedAction.__table__.c)
+        .execution_options(render_nulls=True),
+        [
+            {
+                "session_id": session_id,
+                "library_id": action_data.library_id,
+                "action_description": action_data.action_description,
+                "user_movement": action_data.user_movement,
+                "llm_movement": action_data.llm_movement,
+                "session_version": scores.version
+            }
+            for action_data in actions_data
+        ]
+    )
+    tracked_actions = sorted(result.mappings().all(), key=lambda action: action["action_id"])
+    response = [TrackedActionResponse.model_validate(dict(action)) for action in tracked_actions]
+    await db.execute(analytics.rollup_upsert(db.bind.dialect.name, current_user_id, response))
+    replayed = await idempotency.commit_async(db, key, status.HTTP_201_CREATED, response)
+    if replayed is not None:
+        return replayed
+
+    usage_counter.add_many(Counter(a.library_id for a in actions_data if a.library_id))
+    events.publish_scores(session_id, scores, response)
+    return response
+
+@router.get("/session/{session_id}/actions", response_model=List[TrackedActionResponse])
+async def get_session_actions(
+    session_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    since_version: Optional[int] = Query(None, ge=0)
+):
+    session = await get_owned_session(db, session_id, current_user_id)
+    etag = session_etag(session, "actions", {
+        "limit": limit, "cursor": cursor, "since": since, "since_version": since_version
+    })
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
+    query = select(*columns(TrackedAction, TrackedActionResponse)).where(TrackedAction.session_id == session_id)
+    if since:
+        query = query.where(TrackedAction.timestamp >= time_bound(TrackedAction.timestamp, since))
+    if since_version is not None:
+        # Only rows written after the version the client last saw
+        query = query.where(TrackedAction.session_version > since_version)
+    rows = await db.execute(ACTIONS_KEYSET.apply(query, cursor, limit))
+    actions, next_cursor = ACTIONS_KEYSET.page(rows, limit)
+    return list_response(TrackedActionResponse, actions, {**next_cursor_headers(next_cursor), **session_version_headers(session, etag)})
+
+# Game Session Logs endpoints
+@router.post("/log", response_model=GameSessionLogResponse, status_code=status.HTTP_201_CREATED)
+async def create_log(
+    log_data: GameSessionLogCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    key = idempotency.request_key(current_user_id, idempotency_key, "log", log_data)
+    replayed = await idempotency.replay_async(db, key)
+    if replayed is not None:
+        return replayed
+
+    # Verify session and action belong to user
+    await get_owned_session(db, log_data.session_id, current_user_id)
+
+    action = await db.scalar(select(TrackedAction.action_id).where(
+        TrackedAction.action_id == log_data.action_id,
+        TrackedAction.session_id == log_data.session_id
+    ))
+
+    if not action:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Action not found"
+        )
+
+    new_log = GameSessionLog(
+        session_id=log_data.session_id,
+        action_id=log_data.action_id,
+        optional_note=log_data.optional_note,
+        session_version=await bump_version(db, log_data.session_id)
+    )
+    db.add(new_log)
+    await db.flush()
+    await db.refresh(new_log)
+    response = GameSessionLogResponse.model_validate(new_log)
+    replayed = await idempotency.commit_async(db, key, status.HTTP_201_CREATED, response)
+    if replayed is not None:
+        return replayed
+    events.publish(log_data.session_id, "log", response)
+    return response
+
+@router.get("/session/{session_id}/logs", response_model=List[GameSessionLogResponse])
+async def get_session_logs(
+    session_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    since_version: Optional[int] = Query(None, ge=0)
+):
+    session = await get_owned_session(db, session_id, current_user_id)
+    etag = session_etag(session, "logs", {
+        "limit": limit, "cursor": cursor, "since": since, "since_version": since_version
+    })
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
+    query = select(*columns(GameSessionLog, GameSessionLogResponse)).where(GameSessionLog.session_id == session_id)
+    if since:
+        query = query.where(GameSessionLog.timestamp >= time_bound(GameSessionLog.timestamp, since))
+    if since_version is not None:
+        # Only rows written after the version the client last saw
+        query = query.where(GameSessionLog.session_version > since_version)
+    rows = await db.execute(LOGS_KEYSET.apply(query, cursor, limit))
+    logs, next_cursor = LOGS_KEYSET.page(rows, limit)
+    return list_response(GameSessionLogResponse, logs, {**next_cursor_headers(next_cursor), **session_version_headers(session, etag)})
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_async_db
+from app.schemas import ActionContribution, AnalyticsSummaryResponse, SessionDelta, TrajectoryResponse
+from app.auth import get_current_user_id_async
+from app.api.aio.sessions import get_owned_session
+from app import trajectory
+from app.analytics import ANALYTICS_DEFAULT_DAYS, ANALYTICS_MAX_DAYS, build_summary, summary_queries, window_start
+
+router = APIRouter()
+
+@router.get("/summary", response_model=AnalyticsSummaryResponse)
+async def get_summary(
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async),
+    days: int = Query(ANALYTICS_DEFAULT_DAYS, ge=1, le=ANALYTICS_MAX_DAYS)
+):
+    # All-time totals, plus a per-day trend and top actions for the last `days` days
+    since = window_start(days)
+    totals, daily, top_actions = summary_queries(current_user_id, since)
+    return build_summary(
+        since,
+        (await db.execute(totals)).one(),
+        (await db.execute(daily)).all(),
+        (await db.execute(top_actions)).all()
+    )
+
+# Vectorized trajectory analytics over the full tracked-action history
+@router.get("/trajectory", response_model=TrajectoryResponse)
+async def get_trajectory(
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async),
+    session_id: Optional[int] = None,
+    window: int = Query(trajectory.TRAJECTORY_DEFAULT_WINDOW, ge=1, le=trajectory.TRAJECTORY_MAX_WINDOW),
+    points: int = Query(trajectory.TRAJECTORY_DEFAULT_POINTS, ge=2, le=trajectory.TRAJECTORY_MAX_POINTS)
+):
+    if session_id is not None:
+        await get_owned_session(db, session_id, current_user_id)
+    return await db.run_sync(trajectory.trajectory_for, current_user_id, session_id, window, points)
+
+@router.get("/contributions", response_model=List[ActionContribution])
+async def get_contributions(
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async),
+    session_id: Optional[int] = None
+):
+    if session_id is not None:
+        await get_owned_session(db, session_id, current_user_id)
+    return await db.run_sync(trajectory.contributions_for, current_user_id, session_id)
+
+@router.get("/session-deltas", response_model=List[SessionDelta])
+async def get_session_deltas(
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    return await db.run_sync(trajectory.session_deltas_for, current_user_id)
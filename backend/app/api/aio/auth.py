@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from typing import Optional
+from app.database import AsyncSessionLocal
+from app.models import User
+from app.schemas import UserCreate, UserResponse, Token
+from app.auth import create_access_token, get_current_user_async, invalidate_user
+from app.hashing import hash_password, verify_password
+
+router = APIRouter()
+
+# Short-lived sessions, so no pooled connection is held while a hash is pending
+async def _get_user_by_email(email: str) -> Optional[User]:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(User).where(User.email == email))
+
+async def _create_user(email: str, hashed_password: str) -> User:
+    async with AsyncSessionLocal() as db:
+        new_user = User(email=email, hashed_password=hashed_password)
+        db.add(new_user)
+        await db.commit()
+        await db.refresh(new_user)
+        return new_user
+
+@router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def signup(user_data: UserCreate):
+    # Check if user already exists
+    existing_user = await _get_user_by_email(user_data.email)
+    if existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+
+    # Create new user
+    hashed_password = await hash_password(user_data.password)
+    new_user = await _create_user(user_data.email, hashed_password)
+    # SQLite can hand out the id of a deleted user again
+    invalidate_user(new_user.user_id)
+
+    return new_user
+
+@router.post("/login", response_model=Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    # OAuth2PasswordRequestForm uses 'username' field, but we'll use it for email
+    user = await _get_user_by_email(form_data.username)
+
+    if not user or not await verify_password(form_data.password, user.hashed_password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Create access token
+    access_token = create_access_token(data={"sub": str(user.user_id)})
+
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.get("/me", response_model=UserResponse)
+async def get_current_user_info(current_user: User = Depends(get_current_user_async)):
+    return current_user
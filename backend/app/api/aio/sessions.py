@@ -0,0 +1,216 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+from app.database import get_async_db
+from app.models import GameSession, GameSessionLog, SelectedAction, TrackedAction
+from app.schemas import GameSessionCreate, GameSessionUpdate, GameSessionResponse, SessionStateResponse
+from app.auth import get_current_user_id_async
+from app import events, idempotency, library_cache
+from app.conditional import etag_matches, not_modified, session_etag, session_version_headers
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SESSIONS_KEYSET, next_cursor_headers, time_bound
+from app.fastjson import columns, list_response
+
+router = APIRouter()
+
+async def get_owned_session(db: AsyncSession, session_id: int, user_id: int) -> GameSession:
+    session = await db.scalar(select(GameSession).where(
+        GameSession.session_id == session_id,
+        GameSession.user_id == user_id
+    ))
+
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    return session
+
+async def bump_version(db: AsyncSession, session_id: int) -> int:
+    """Advance the session's version in SQL; the row lock orders concurrent writers."""
+    return (await db.execute(
+        update(GameSession)
+        .where(GameSession.session_id == session_id)
+        .values(version=GameSession.version + 1)
+        .returning(GameSession.version)
+        .execution_options(synchronize_session=False)
+    )).scalar_one()
+
+@router.post("/", response_model=GameSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_session(
+    session_data: GameSessionCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    key = idempotency.request_key(current_user_id, idempotency_key, "create_session", session_data)
+    replayed = await idempotency.replay_async(db, key)
+    if replayed is not None:
+        return replayed
+
+    new_session = GameSession(
+        user_id=current_user_id,
+        session_name=session_data.session_name,
+        status="active"
+    )
+    db.add(new_session)
+    await db.flush()  # Get session_id before committing
+
+    # Add selected actions
+    db.add_all([
+        SelectedAction(session_id=new_session.session_id, library_id=action_id)
+        for action_id in session_data.selected_action_ids
+    ])
+
+    await db.refresh(new_session)
+    response = GameSessionResponse.model_validate(new_session)
+    replayed = await idempotency.commit_async(db, key, status.HTTP_201_CREATED, response)
+    if replayed is not None:
+        return replayed
+    return response
+
+@router.get("/{session_id}/selected-actions")
+async def get_session_selected_actions(
+    session_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    await get_owned_session(db, session_id, current_user_id)
+
+    selected = await db.scalars(select(SelectedAction.library_id).where(
+        SelectedAction.session_id == session_id
+    ))
+    return selected.all()
+
+@router.get("/{session_id}/state", response_model=SessionStateResponse)
+async def get_session_state(
+    session_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    session = await get_owned_session(db, session_id, current_user_id)
+
+    selected_ids = (await db.scalars(
+        select(SelectedAction.library_id).where(SelectedAction.session_id == session_id)
+    )).all()
+
+    if selected_ids:
+        # Ordered like the library itself, pending usage counts included
+        library_actions = await library_cache.selected_actions_async(db, current_user_id, selected_ids)
+    else:
+        # Sessions started without a selection offer the whole library
+        _, library_actions = await library_cache.get_library_async(db, current_user_id)
+
+    tracked_actions = await db.scalars(
+        select(TrackedAction)
+        .where(TrackedAction.session_id == session_id)
+        .order_by(TrackedAction.timestamp, TrackedAction.action_id)
+    )
+
+    logs = await db.scalars(
+        select(GameSessionLog)
+        .where(GameSessionLog.session_id == session_id)
+        .order_by(GameSessionLog.timestamp, GameSessionLog.log_id)
+    )
+
+    return {
+        "session": session,
+        "selected_action_ids": [action["library_id"] for action in library_actions] if selected_ids else [],
+        "library_actions": library_actions,
+        "tracked_actions": tracked_actions.all(),
+        "logs": logs.all(),
+    }
+
+@router.get("/", response_model=List[GameSessionResponse])
+async def get_user_sessions(
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async),
+    status: str = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None
+):
+    query = select(*columns(GameSession, GameSessionResponse)).where(GameSession.user_id == current_user_id)
+    if status:
+        query = query.where(GameSession.status == status)
+    if since:
+        query = query.where(GameSession.start_time >= time_bound(GameSession.start_time, since))
+    rows = await db.execute(SESSIONS_KEYSET.apply(query, cursor, limit))
+    sessions, next_cursor = SESSIONS_KEYSET.page(rows, limit)
+    return list_response(GameSessionResponse, sessions, next_cursor_headers(next_cursor))
+
+@router.get("/{session_id}", response_model=GameSessionResponse)
+async def get_session(
+    session_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    session = await get_owned_session(db, session_id, current_user_id)
+    etag = session_etag(session)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    response.headers.update(session_version_headers(session))
+    return session
+
+@router.patch("/{session_id}", response_model=GameSessionResponse)
+async def update_session(
+    session_id: int,
+    session_update: GameSessionUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    session = await get_owned_session(db, session_id, current_user_id)
+
+    # Update fields
+    if session_update.session_name is not None:
+        session.session_name = session_update.session_name
+    if session_update.status is not None:
+        session.status = session_update.status
+        if session_update.status == "ended" and session.end_time is None:
+            session.end_time = datetime.utcnow()
+    if session_update.end_time is not None:
+        session.end_time = session_update.end_time
+    session.version = GameSession.version + 1
+
+    await db.commit()
+    await db.refresh(session)
+    events.publish(session.session_id, "status", GameSessionResponse.model_validate(session))
+    return session
+
+async def _set_status(db: AsyncSession, session_id: int, user_id: int, new_status: str) -> GameSession:
+    session = await get_owned_session(db, session_id, user_id)
+    session.status = new_status
+    if new_status == "ended":
+        session.end_time = datetime.utcnow()
+    session.version = GameSession.version + 1
+    await db.commit()
+    await db.refresh(session)
+    events.publish(session.session_id, "status", GameSessionResponse.model_validate(session))
+    return session
+
+@router.post("/{session_id}/pause", response_model=GameSessionResponse)
+async def pause_session(
+    session_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    return await _set_status(db, session_id, current_user_id, "paused")
+
+@router.post("/{session_id}/resume", response_model=GameSessionResponse)
+async def resume_session(
+    session_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    return await _set_status(db, session_id, current_user_id, "active")
+
+@router.post("/{session_id}/end", response_model=GameSessionResponse)
+async def end_session(
+    session_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    return await _set_status(db, session_id, current_user_id, "ended")
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from collections import Counter
+from app.database import get_async_db
+from app.models import GameSession, TrackedAction
+from app.schemas import SyncRequest, SyncResponse, TrackedActionResponse
+from app.auth import get_current_user_id_async
+from app import analytics, events, sync
+from app.api.aio.sessions import bump_version, get_owned_session
+from app.usage_counter import usage_counter
+from app.fastjson import FastJSONResponse, columns, rows_to_dicts
+
+router = APIRouter()
+
+@router.post("", response_model=SyncResponse)
+async def sync_session(
+    sync_data: SyncRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    if len(sync_data.actions) > sync.SYNC_MAX_ACTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {sync.SYNC_MAX_ACTIONS} actions per sync"
+        )
+
+    session_id = sync_data.session_id
+    await get_owned_session(db, session_id, current_user_id)
+
+    pending = sync.prepare(sync_data.actions, datetime.utcnow())
+    if pending:
+        pending = sync.unstored(pending, await db.scalars(sync.stored_client_ids(session_id, pending)))
+
+    stored = []
+    scores = None
+    if pending:
+        # Locks the session row; re-check for actions a concurrent sync stored
+        version = await bump_version(db, session_id)
+        pending = sync.unstored(pending, await db.scalars(sync.stored_client_ids(session_id, pending)))
+    if pending:
+        stored = (await db.execute(
+            insert(TrackedAction)
+            .returning(*columns(TrackedAction, TrackedActionResponse))
+            .execution_options(render_nulls=True),
+            sync.action_rows(session_id, pending, version)
+        )).all()
+        await db.execute(analytics.rollup_upsert(db.bind.dialect.name, current_user_id, stored))
+        scores = (await db.execute(
+            update(GameSession)
+            .where(GameSession.session_id == session_id)
+            .values(
+                user_score=GameSession.user_score + sum(a.user_movement for a in pending),
+                llm_score=GameSession.llm_score + sum(a.llm_movement for a in pending)
+            )
+            .returning(GameSession.user_score, GameSession.llm_score, GameSession.version)
+            .execution_options(synchronize_session=False)
+        )).one()
+
+    session_row = (await db.execute(sync.session_query(session_id))).one()
+    actions = (await db.execute(sync.actions_query(session_id, sync_data.since_version))).all()
+    logs = (await db.execute(sync.logs_query(session_id, sync_data.since_version))).all()
+    await db.commit()
+
+    if scores is not None:
+        usage_counter.add_many(Counter(a.library_id for a in pending if a.library_id))
+        events.publish_scores(session_id, scores, rows_to_dicts(TrackedActionResponse, stored))
+    return FastJSONResponse(sync.response_body(session_row, pending, actions, logs))
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database import get_db
+from app.schemas import ActionContribution, AnalyticsSummaryResponse, SessionDelta, TrajectoryResponse
+from app.auth import get_current_user_id
+from app.api.sessions import get_owned_session
+from app import trajectory
+from app.analytics import ANALYTICS_DEFAULT_DAYS, ANALYTICS_MAX_DAYS, build_summary, summary_queries, window_start
+
+router = APIRouter()
+
+@router.get("/summary", response_model=AnalyticsSummaryResponse)
+def get_summary(
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id),
+    days: int = Query(ANALYTICS_DEFAULT_DAYS, ge=1, le=ANALYTICS_MAX_DAYS)
+):
+    # All-time totals, plus a per-day trend and top actions for the last `days` days
+    since = window_start(days)
+    totals, daily, top_actions = summary_queries(current_user_id, since)
+    return build_summary(
+        since,
+        db.execute(totals).one(),
+        db.execute(daily).all(),
+        db.execute(top_actions).all()
+    )
+
+# Vectorized trajectory analytics over the full tracked-action history
+@router.get("/trajectory", response_model=TrajectoryResponse)
+def get_trajectory(
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id),
+    session_id: Optional[int] = None,
+    window: int = Query(trajectory.TRAJECTORY_DEFAULT_WINDOW, ge=1, le=trajectory.TRAJECTORY_MAX_WINDOW),
+    points: int = Query(trajectory.TRAJECTORY_DEFAULT_POINTS, ge=2, le=trajectory.TRAJECTORY_MAX_POINTS)
+):
+    if session_id is not None:
+        get_owned_session(db, session_id, current_user_id)
+    return trajectory.trajectory_for(db, current_user_id, session_id, window, points)
+
+@router.get("/contributions", response_model=List[ActionContribution])
+def get_contributions(
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id),
+    session_id: Optional[int] = None
+):
+    if session_id is not None:
+        get_owned_session(db, session_id, current_user_id)
+    return trajectory.contributions_for(db, current_user_id, session_id)
+
+@router.get("/session-deltas", response_model=List[SessionDelta])
+def get_session_deltas(
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    return trajectory.session_deltas_for(db, current_user_id)
@@ -1,17 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app.database import get_db
+from typing import Optional
+from app.database import SessionLocal, get_db
 from app.models import User
 from app.schemas import UserCreate, UserResponse, Token
-from app.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from app.auth import create_access_token, get_current_user, invalidate_user
+from app.hashing import hash_password, verify_password
 
 router = APIRouter()
 
+# Signup and login are async so bcrypt waits on its own executor instead of
+# holding a threadpool slot; only the short database calls use the threadpool.
+# Each call has its own short-lived session, so no pooled connection is held
+# while a hash is pending.
+def _get_user_by_email(email: str) -> Optional[User]:
+    with SessionLocal() as db:
+        return db.query(User).filter(User.email == email).first()
+
+def _create_user(email: str, hashed_password: str) -> User:
+    with SessionLocal() as db:
+        new_user = User(email=email, hashed_password=hashed_password)
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+        return new_user
+
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+async def signup(user_data: UserCreate):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await run_in_threadpool(_get_user_by_email, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -19,20 +38,19 @@ def signup(user_data: UserCreate, db: Session = Depends(get_db)):
         )
 
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
-    new_user = User(email=user_data.email, hashed_password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    hashed_password = await hash_password(user_data.password)
+    new_user = await run_in_threadpool(_create_user, user_data.email, hashed_password)
+    # SQLite can hand out the id of a deleted user again
+    invalidate_user(new_user.user_id)
 
     return new_user
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     # OAuth2PasswordRequestForm uses 'username' field, but we'll use it for email
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await run_in_threadpool(_get_user_by_email, form_data.username)
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
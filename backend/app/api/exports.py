@@ -0,0 +1,125 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models import ExportJob
+from app.schemas import ExportJobCreate, ExportJobResponse
+from app.auth import get_current_user_id
+from app.conditional import byte_range
+from app.export import EXPORT_CHUNK_SIZE
+from app import export_jobs, research_export
+import os
+
+router = APIRouter()
+
+def get_owned_job(db: Session, job_id: str, user_id: int) -> ExportJob:
+    job = db.get(ExportJob, job_id)
+
+    if not job or job.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export not found"
+        )
+    return job
+
+def _job_response(job: ExportJob) -> ExportJobResponse:
+    response = ExportJobResponse.model_validate(job, from_attributes=True)
+    if export_jobs.is_abandoned(job):
+        response.status = "failed"
+        response.error = "The export worker stopped before finishing"
+    elif job.status == "done":
+        response.download_url = f"/api/exports/{job.job_id}/download"
+    return response
+
+@router.post("/", response_model=ExportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_export(
+    export_data: ExportJobCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    dataset, anonymize = export_data.dataset, export_data.anonymize
+    if export_data.format == "csv":
+        # The CSV is the existing all-sessions export; it has no variants
+        dataset, anonymize = None, False
+    elif dataset is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{export_data.format} exports need a dataset"
+        )
+    elif export_data.format != "jsonl" and not research_export.has_pyarrow():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f'{export_data.format} exports require pyarrow (pip install -e ".[research]")'
+        )
+
+    job, created = export_jobs.create_job(db, current_user_id, export_data.format, dataset, anonymize)
+    if created:
+        export_jobs.export_pool.submit(job.job_id)
+    else:
+        response.status_code = status.HTTP_200_OK
+    return _job_response(job)
+
+@router.get("/{job_id}", response_model=ExportJobResponse)
+def get_export(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    return _job_response(get_owned_job(db, job_id, current_user_id))
+
+def _read_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(EXPORT_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+@router.get("/{job_id}/download")
+def download_export(
+    job_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    job = get_owned_job(db, job_id, current_user_id)
+    if job.status != "done":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Export is not finished"
+        )
+
+    path = export_jobs.file_path(job)
+    if not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Export has expired"
+        )
+
+    # A job's file never changes, so the job id is a strong validator
+    etag = f'"{job.job_id}"'
+    size = os.path.getsize(path)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f"attachment; filename={export_jobs.download_name(job)}"
+    }
+
+    if_range = request.headers.get("if-range")
+    requested = byte_range(request.headers.get("range"), size) if not if_range or if_range == etag else None
+    if requested is None:
+        start, end, status_code = 0, size - 1, status.HTTP_200_OK
+    else:
+        (start, end), status_code = requested, status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        _read_file(path, start, end - start + 1),
+        status_code=status_code,
+        media_type=export_jobs.MEDIA_TYPES[job.format],
+        headers=headers
+    )
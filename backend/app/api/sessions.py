@@ -1,25 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 from datetime import datetime
-from app.database import get_db
-from app.models import User, GameSession, SelectedAction, TrackedAction, ActionLibrary
-from app.schemas import GameSessionCreate, GameSessionUpdate, GameSessionResponse
-from app.auth import get_current_user
-import io
-import csv
+import asyncio
+from app.database import SessionLocal, get_db
+from app.models import GameSession, GameSessionLog, SelectedAction, TrackedAction
+from app.schemas import GameSessionCreate, GameSessionUpdate, GameSessionResponse, ImportResponse, SessionStateResponse
+from app.auth import get_current_user_id, get_stream_user_id
+from app.export import stream_csv, iter_all_sessions_rows, iter_session_rows
+from app import importer, research_export
+from app import events, idempotency, library_cache
+from app.conditional import etag_matches, not_modified, session_etag, session_version_headers
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SESSIONS_KEYSET, next_cursor_headers, time_bound
+from app.fastjson import columns, list_response
 
 router = APIRouter()
 
+def get_owned_session(db: Session, session_id: int, user_id: int) -> GameSession:
+    session = db.query(GameSession).filter(
+        GameSession.session_id == session_id,
+        GameSession.user_id == user_id
+    ).first()
+
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    return session
+
+def bump_version(db: Session, session_id: int) -> int:
+    """Advance the session's version in SQL; the row lock orders concurrent writers."""
+    return db.execute(
+        update(GameSession)
+        .where(GameSession.session_id == session_id)
+        .values(version=GameSession.version + 1)
+        .returning(GameSession.version)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
 @router.post("/", response_model=GameSessionResponse, status_code=status.HTTP_201_CREATED)
 def create_session(
     session_data: GameSessionCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
+    key = idempotency.request_key(current_user_id, idempotency_key, "create_session", session_data)
+    replayed = idempotency.replay(db, key)
+    if replayed is not None:
+        return replayed
+
     new_session = GameSession(
-        user_id=current_user.user_id,
+        user_id=current_user_id,
         session_name=session_data.session_name,
         status="active"
     )
@@ -34,27 +70,21 @@ def create_session(
         )
         db.add(selected_action)
 
-    db.commit()
     db.refresh(new_session)
-    return new_session
+    response = GameSessionResponse.model_validate(new_session)
+    replayed = idempotency.commit(db, key, status.HTTP_201_CREATED, response)
+    if replayed is not None:
+        return replayed
+    return response
 
 @router.get("/{session_id}/selected-actions")
 def get_session_selected_actions(
     session_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
     # Verify session belongs to user
-    session = db.query(GameSession).filter(
-        GameSession.session_id == session_id,
-        GameSession.user_id == current_user.user_id
-    ).first()
-
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
+    get_owned_session(db, session_id, current_user_id)
 
     selected = db.query(SelectedAction).filter(
         SelectedAction.session_id == session_id
@@ -62,120 +92,128 @@ def get_session_selected_actions(
 
     return [s.library_id for s in selected]
 
+@router.get("/{session_id}/state", response_model=SessionStateResponse)
+def get_session_state(
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    session = get_owned_session(db, session_id, current_user_id)
+
+    selected_ids = [row.library_id for row in db.query(SelectedAction.library_id).filter(
+        SelectedAction.session_id == session_id
+    )]
+
+    if selected_ids:
+        # Ordered like the library itself, pending usage counts included
+        library_actions = library_cache.selected_actions(db, current_user_id, selected_ids)
+    else:
+        # Sessions started without a selection offer the whole library
+        _, library_actions = library_cache.get_library(db, current_user_id)
+
+    tracked_actions = db.query(TrackedAction).filter(
+        TrackedAction.session_id == session_id
+    ).order_by(TrackedAction.timestamp, TrackedAction.action_id).all()
+
+    logs = db.query(GameSessionLog).filter(
+        GameSessionLog.session_id == session_id
+    ).order_by(GameSessionLog.timestamp, GameSessionLog.log_id).all()
+
+    return {
+        "session": session,
+        "selected_action_ids": [action["library_id"] for action in library_actions] if selected_ids else [],
+        "library_actions": library_actions,
+        "tracked_actions": tracked_actions,
+        "logs": logs,
+    }
+
 @router.get("/", response_model=List[GameSessionResponse])
 def get_user_sessions(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    status: str = None
+    current_user_id: int = Depends(get_current_user_id),
+    status: str = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None
 ):
-    query = db.query(GameSession).filter(GameSession.user_id == current_user.user_id)
+    # Plain column tuples, encoded straight to JSON (see app/fastjson.py)
+    query = db.query(*columns(GameSession, GameSessionResponse)).filter(GameSession.user_id == current_user_id)
     if status:
         query = query.filter(GameSession.status == status)
-    sessions = query.order_by(GameSession.start_time.desc()).all()
-    return sessions
+    if since:
+        query = query.filter(GameSession.start_time >= time_bound(GameSession.start_time, since))
+    # Newest first; pass the X-Next-Cursor header back as ?cursor= for the next page
+    sessions, next_cursor = SESSIONS_KEYSET.page(SESSIONS_KEYSET.apply(query, cursor, limit).all(), limit)
+    return list_response(GameSessionResponse, sessions, next_cursor_headers(next_cursor))
 
 @router.get("/export-all")
 def export_all_sessions(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    # Get all sessions for user
-    sessions = db.query(GameSession).filter(
-        GameSession.user_id == current_user.user_id
-    ).order_by(GameSession.start_time.desc()).all()
-
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write sessions summary
-    writer.writerow(['All Sessions Summary'])
-    writer.writerow(['Session ID', 'Session Name', 'Start Time', 'End Time', 'Status', 'User Score', 'LLM Score', 'Duration (minutes)', 'Total Actions'])
-
-    for session in sessions:
-        # Calculate duration
-        duration = ''
-        if session.end_time and session.start_time:
-            delta = session.end_time - session.start_time
-            duration = round(delta.total_seconds() / 60, 1)
-
-        # Count actions
-        action_count = db.query(TrackedAction).filter(
-            TrackedAction.session_id == session.session_id
-        ).count()
-
-        writer.writerow([
-            session.session_id,
-            session.session_name or 'Unnamed',
-            session.start_time,
-            session.end_time or 'Ongoing',
-            session.status,
-            session.user_score,
-            session.llm_score,
-            duration,
-            action_count
-        ])
-
-    writer.writerow([])
-    writer.writerow([])
-
-    # Write detailed actions for each session
-    writer.writerow(['Detailed Action Log'])
-    writer.writerow(['Timestamp', 'Session ID', 'Session Name', 'Action ID', 'Description', 'User Points', 'LLM Points', 'Source'])
-
-    for session in sessions:
-        tracked_actions = db.query(TrackedAction).filter(
-            TrackedAction.session_id == session.session_id
-        ).order_by(TrackedAction.timestamp.asc()).all()
-
-        for action in tracked_actions:
-            if action.library_id:
-                library_action = db.query(ActionLibrary).filter(
-                    ActionLibrary.library_id == action.library_id
-                ).first()
-                description = library_action.action_description if library_action else 'Unknown'
-                source = 'Library'
-            else:
-                description = action.action_description or 'Custom'
-                source = 'Custom'
-
-            writer.writerow([
-                action.timestamp,
-                session.session_id,
-                session.session_name or 'Unnamed',
-                action.action_id,
-                description,
-                action.user_movement,
-                action.llm_movement,
-                source
-            ])
-
-    output.seek(0)
     return StreamingResponse(
-        iter([output.getvalue()]),
+        stream_csv(iter_all_sessions_rows(current_user_id)),
         media_type="text/csv",
         headers={
             "Content-Disposition": f"attachment; filename=turn_all_data_export.csv"
         }
     )
 
-@router.get("/{session_id}", response_model=GameSessionResponse)
-def get_session(
-    session_id: int,
+@router.get("/export-research/{dataset}")
+def export_research(
+    dataset: Literal["sessions", "actions", "logs"],
+    format: Literal["jsonl", "arrow", "parquet"] = "jsonl",
+    anonymize: bool = True,
+    session_id: Optional[int] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    session = db.query(GameSession).filter(
-        GameSession.session_id == session_id,
-        GameSession.user_id == current_user.user_id
-    ).first()
+    if session_id is not None:
+        get_owned_session(db, session_id, current_user_id)
+    if format != "jsonl" and not research_export.has_pyarrow():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f'{format} exports require pyarrow (pip install -e ".[research]")'
+        )
 
-    if not session:
+    suffix = f"session_{session_id}_" if session_id is not None else ""
+    return StreamingResponse(
+        research_export.stream_export(dataset, format, current_user_id, session_id, anonymize),
+        media_type=research_export.MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f"attachment; filename=turn_{suffix}{dataset}.{research_export.EXTENSIONS[format]}"
+        }
+    )
+
+@router.post("/import", response_model=ImportResponse, status_code=status.HTTP_201_CREATED)
+def import_sessions(
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    # Restores CSV exports, or sessions/actions/logs research exports uploaded together
+    try:
+        counts, library_uses = importer.import_files(db, current_user_id, [upload.file for upload in files])
+    except importer.ImportDataError as exc:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
         )
+    importer.after_import(current_user_id, library_uses)
+    return counts
 
+@router.get("/{session_id}", response_model=GameSessionResponse)
+def get_session(
+    session_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    session = get_owned_session(db, session_id, current_user_id)
+    etag = session_etag(session)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    response.headers.update(session_version_headers(session))
     return session
 
 @router.patch("/{session_id}", response_model=GameSessionResponse)
@@ -183,18 +221,9 @@ def update_session(
     session_id: int,
     session_update: GameSessionUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    session = db.query(GameSession).filter(
-        GameSession.session_id == session_id,
-        GameSession.user_id == current_user.user_id
-    ).first()
-
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
+    session = get_owned_session(db, session_id, current_user_id)
 
     # Update fields
     if session_update.session_name is not None:
@@ -205,144 +234,106 @@ def update_session(
             session.end_time = datetime.utcnow()
     if session_update.end_time is not None:
         session.end_time = session_update.end_time
+    session.version = GameSession.version + 1
 
     db.commit()
     db.refresh(session)
+    events.publish(session.session_id, "status", GameSessionResponse.model_validate(session))
     return session
 
 @router.post("/{session_id}/pause", response_model=GameSessionResponse)
 def pause_session(
     session_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    session = db.query(GameSession).filter(
-        GameSession.session_id == session_id,
-        GameSession.user_id == current_user.user_id
-    ).first()
-
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
+    session = get_owned_session(db, session_id, current_user_id)
 
     session.status = "paused"
+    session.version = GameSession.version + 1
     db.commit()
     db.refresh(session)
+    events.publish(session.session_id, "status", GameSessionResponse.model_validate(session))
     return session
 
 @router.post("/{session_id}/resume", response_model=GameSessionResponse)
 def resume_session(
     session_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    session = db.query(GameSession).filter(
-        GameSession.session_id == session_id,
-        GameSession.user_id == current_user.user_id
-    ).first()
-
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
+    session = get_owned_session(db, session_id, current_user_id)
 
     session.status = "active"
+    session.version = GameSession.version + 1
     db.commit()
     db.refresh(session)
+    events.publish(session.session_id, "status", GameSessionResponse.model_validate(session))
     return session
 
 @router.post("/{session_id}/end", response_model=GameSessionResponse)
 def end_session(
     session_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    session = db.query(GameSession).filter(
-        GameSession.session_id == session_id,
-        GameSession.user_id == current_user.user_id
-    ).first()
-
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
+    session = get_owned_session(db, session_id, current_user_id)
 
     session.status = "ended"
     session.end_time = datetime.utcnow()
+    session.version = GameSession.version + 1
     db.commit()
     db.refresh(session)
+    events.publish(session.session_id, "status", GameSessionResponse.model_validate(session))
     return session
 
+def _session_snapshot(session_id: int, user_id: int) -> GameSessionResponse:
+    with SessionLocal() as db:
+        return GameSessionResponse.model_validate(get_owned_session(db, session_id, user_id))
+
+async def _event_stream(request: Request, session_id: int, user_id: int):
+    async with events.hub.subscribe(events.session_channel(session_id)) as subscription:
+        # Read the snapshot after subscribing so no update can fall in between
+        snapshot = await run_in_threadpool(_session_snapshot, session_id, user_id)
+        yield events.format_event("snapshot", snapshot)
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), events.EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            yield message
+            if message is events.RESYNC:
+                break
+
+@router.get("/{session_id}/events")
+async def stream_session_events(
+    session_id: int,
+    request: Request,
+    current_user_id: int = Depends(get_stream_user_id)
+):
+    # Fail with 404 before the stream starts
+    await run_in_threadpool(_session_snapshot, session_id, current_user_id)
+
+    return StreamingResponse(
+        _event_stream(request, session_id, current_user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{session_id}/export")
 def export_session(
     session_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
     # Verify session belongs to user
-    session = db.query(GameSession).filter(
-        GameSession.session_id == session_id,
-        GameSession.user_id == current_user.user_id
-    ).first()
-
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
-
-    # Get all tracked actions for this session
-    tracked_actions = db.query(TrackedAction).filter(
-        TrackedAction.session_id == session_id
-    ).all()
+    get_owned_session(db, session_id, current_user_id)
 
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write session info header
-    writer.writerow(['Session Information'])
-    writer.writerow(['Session ID', session.session_id])
-    writer.writerow(['Session Name', session.session_name or 'Unnamed'])
-    writer.writerow(['Start Time', session.start_time])
-    writer.writerow(['End Time', session.end_time or 'Ongoing'])
-    writer.writerow(['Status', session.status])
-    writer.writerow(['Final User Score', session.user_score])
-    writer.writerow(['Final LLM Score', session.llm_score])
-    writer.writerow([])
-
-    # Write actions data
-    writer.writerow(['Actions Tracked'])
-    writer.writerow(['Timestamp', 'Action ID', 'Description', 'User Points', 'LLM Points', 'Source'])
-
-    for action in tracked_actions:
-        # Get description from library if available
-        if action.library_id:
-            library_action = db.query(ActionLibrary).filter(
-                ActionLibrary.library_id == action.library_id
-            ).first()
-            description = library_action.action_description if library_action else 'Unknown'
-            source = 'Library'
-        else:
-            description = action.action_description or 'Custom'
-            source = 'Custom (Session)'
-
-        writer.writerow([
-            action.timestamp,
-            action.action_id,
-            description,
-            action.user_movement,
-            action.llm_movement,
-            source
-        ])
-
-    output.seek(0)
     return StreamingResponse(
-        iter([output.getvalue()]),
+        stream_csv(iter_session_rows(session_id)),
         media_type="text/csv",
         headers={
             "Content-Disposition": f"attachment; filename=session_{session_id}_export.csv"
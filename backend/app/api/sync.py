@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from datetime import datetime
+from collections import Counter
+from app.database import get_db
+from app.models import GameSession, TrackedAction
+from app.schemas import SyncRequest, SyncResponse, TrackedActionResponse
+from app.auth import get_current_user_id
+from app import analytics, events, sync
+from app.api.sessions import bump_version, get_owned_session
+from app.usage_counter import usage_counter
+from app.fastjson import FastJSONResponse, columns, rows_to_dicts
+
+router = APIRouter()
+
+@router.post("", response_model=SyncResponse)
+def sync_session(
+    sync_data: SyncRequest,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    # Queued offline actions in, everything since the client's cursor out (see app/sync.py)
+    if len(sync_data.actions) > sync.SYNC_MAX_ACTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {sync.SYNC_MAX_ACTIONS} actions per sync"
+        )
+
+    session_id = sync_data.session_id
+    get_owned_session(db, session_id, current_user_id)
+
+    # Resent actions are common after a lost response; skip them without writing
+    pending = sync.prepare(sync_data.actions, datetime.utcnow())
+    if pending:
+        pending = sync.unstored(pending, db.scalars(sync.stored_client_ids(session_id, pending)))
+
+    stored = []
+    scores = None
+    if pending:
+        # Bumping the version locks the session row, so a concurrent sync of
+        # the same queue waits here and then finds the actions stored
+        version = bump_version(db, session_id)
+        pending = sync.unstored(pending, db.scalars(sync.stored_client_ids(session_id, pending)))
+    if pending:
+        stored = db.execute(
+            insert(TrackedAction)
+            .returning(*columns(TrackedAction, TrackedActionResponse))
+            .execution_options(render_nulls=True),
+            sync.action_rows(session_id, pending, version)
+        ).all()
+        db.execute(analytics.rollup_upsert(db.get_bind().dialect.name, current_user_id, stored))
+        scores = (db.execute(
+            update(GameSession)
+            .where(GameSession.session_id == session_id)
+            .values(
+                user_score=GameSession.user_score + sum(a.user_movement for a in pending),
+                llm_score=GameSession.llm_score + sum(a.llm_movement for a in pending)
+            )
+            .returning(GameSession.user_score, GameSession.llm_score, GameSession.version)
+            .execution_options(synchronize_session=False)
+        )).one()
+
+    session_row = db.execute(sync.session_query(session_id)).one()
+    actions = db.execute(sync.actions_query(session_id, sync_data.since_version)).all()
+    logs = db.execute(sync.logs_query(session_id, sync_data.since_version)).all()
+    db.commit()
+
+    if scores is not None:
+        usage_counter.add_many(Counter(a.library_id for a in pending if a.library_id))
+        events.publish_scores(session_id, scores, rows_to_dicts(TrackedActionResponse, stored))
+    return FastJSONResponse(sync.response_body(session_row, pending, actions, logs))
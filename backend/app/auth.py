@@ -1,13 +1,18 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-import bcrypt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import SessionLocal, get_db, get_async_db
 from app.models import User
 from app.schemas import TokenData
+from app.cache import TTLCache
+from app.hashing import hash_password_sync, verify_password_sync
+import threading
+import time
 import os
 
 # Security configuration
@@ -15,15 +20,28 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Accounts allowed to use the /api/admin endpoints
+ADMIN_EMAILS = frozenset(email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip())
+
+# Verified token -> user_id cache, so most requests skip the JWT decode and user lookup
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+
+token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+# Bumping a user's generation invalidates all of their cached tokens at once
+_user_generations: dict[int, int] = {}
+_user_generations_lock = threading.Lock()
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
+# Blocking variants for scripts; request handlers await app.hashing instead
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return verify_password_sync(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    return hash_password_sync(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -35,12 +53,32 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
+def invalidate_user(user_id: int) -> None:
+    # Drops every cached token for the user; call on signup, deletion or password change
+    with _user_generations_lock:
+        _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+
+def auth_cache_stats() -> dict:
+    return token_cache.stats()
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _cached_user_id(token: str) -> Optional[int]:
+    cached = token_cache.get(token)
+    if cached is not None:
+        user_id, generation = cached
+        if generation == _user_generations.get(user_id, 0):
+            return user_id
+        token_cache.pop(token)
+    return None
+
+def _decode_token(token: str) -> tuple[int, dict]:
+    credentials_exception = _credentials_exception()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id_str: str = payload.get("sub")
@@ -50,8 +88,88 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         token_data = TokenData(user_id=user_id)
     except JWTError:
         raise credentials_exception
+    return token_data.user_id, payload
+
+def _remember_token(token: str, user_id: int, generation: int, payload: dict) -> None:
+    # Never cache a token past its own expiry
+    ttl = min(AUTH_CACHE_TTL_SECONDS, payload["exp"] - time.time()) if "exp" in payload else AUTH_CACHE_TTL_SECONDS
+    if ttl > 0:
+        token_cache.set(token, (user_id, generation), ttl=ttl)
 
-    user = db.query(User).filter(User.user_id == token_data.user_id).first()
+def get_current_user_id(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> int:
+    user_id = _cached_user_id(token)
+    if user_id is not None:
+        return user_id
+
+    user_id, payload = _decode_token(token)
+    generation = _user_generations.get(user_id, 0)
+    # Loads the full row so get_current_user finds it in the identity map
+    user = db.get(User, user_id)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    _remember_token(token, user_id, generation, payload)
+    return user_id
+
+async def get_current_user_id_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> int:
+    user_id = _cached_user_id(token)
+    if user_id is not None:
+        return user_id
+
+    user_id, payload = _decode_token(token)
+    generation = _user_generations.get(user_id, 0)
+    user = await db.get(User, user_id)
+    if user is None:
+        raise _credentials_exception()
+
+    _remember_token(token, user_id, generation, payload)
+    return user_id
+
+def _user_exists(user_id: int) -> bool:
+    with SessionLocal() as db:
+        return db.get(User, user_id) is not None
+
+# Event streams hold their connection open, so they check the user without
+# keeping a pooled DB session for the life of the stream. EventSource cannot
+# send headers, which is why the token may also come as ?token=
+async def get_stream_user_id(
+    token: Optional[str] = Query(None),
+    bearer: Optional[str] = Depends(oauth2_scheme_optional)
+) -> int:
+    token = bearer or token
+    if not token:
+        raise _credentials_exception()
+
+    user_id = _cached_user_id(token)
+    if user_id is not None:
+        return user_id
+
+    user_id, payload = _decode_token(token)
+    generation = _user_generations.get(user_id, 0)
+    if not await run_in_threadpool(_user_exists, user_id):
+        raise _credentials_exception()
+
+    _remember_token(token, user_id, generation, payload)
+    return user_id
+
+def get_current_user(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)) -> User:
+    user = db.get(User, user_id)
+    if user is None:
+        invalidate_user(user_id)
+        raise _credentials_exception()
+    return user
+
+async def get_current_user_async(user_id: int = Depends(get_current_user_id_async), db: AsyncSession = Depends(get_async_db)) -> User:
+    user = await db.get(User, user_id)
+    if user is None:
+        invalidate_user(user_id)
+        raise _credentials_exception()
     return user
+
+def get_admin_user_id(user: User = Depends(get_current_user)) -> int:
+    if user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user.user_id
@@ -0,0 +1,194 @@
+"""
+Negotiated response compression (zstd, brotli, gzip).
+
+CompressionMiddleware picks the first encoding in COMPRESSION_ENCODINGS that
+the client's Accept-Encoding allows and the server can produce. gzip is
+always available. brotli and zstd need their packages
+(pip install -e ".[compression]").
+
+Streaming responses (the CSV and research exports) are compressed chunk by
+chunk: each body message is compressed and flushed as soon as it arrives, so
+the client starts decoding right away and nothing is buffered whole. A
+single-message response smaller than COMPRESSION_MIN_SIZE is sent as is,
+since compressing small JSON costs more than it saves.
+
+These responses pass through untouched:
+
+- responses that are already encoded
+- formats that carry their own compression (Arrow IPC, Parquet, images)
+- Server-Sent Events, which must reach the client event by event
+- responses that advertise byte ranges, because ranges address the
+  unencoded file
+"""
+from typing import Optional
+import zlib
+import os
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_ENCODINGS = tuple(
+    name.strip() for name in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if name.strip()
+)
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+_COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+)
+_UNCOMPRESSIBLE_TYPES = ("text/event-stream",)
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+_CODECS = {"gzip": _Gzip}
+if brotli is not None:
+    _CODECS["br"] = _Brotli
+if zstandard is not None:
+    _CODECS["zstd"] = _Zstd
+
+def available_encodings() -> list[str]:
+    return [name for name in COMPRESSION_ENCODINGS if name in _CODECS]
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Our most preferred encoding that the client accepts, or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    for name in available_encodings():
+        if accepted.get(name, wildcard) > 0:
+            return name
+    return None
+
+def _compressible(headers: dict) -> bool:
+    if b"content-encoding" in headers or b"accept-ranges" in headers or b"content-range" in headers:
+        return False
+    content_type = headers.get(b"content-type", b"").decode("latin-1").lower()
+    if content_type.startswith(_UNCOMPRESSIBLE_TYPES):
+        return False
+    return content_type.startswith(_COMPRESSIBLE_TYPES)
+
+def _encoded_headers(raw_headers, encoding: str) -> list:
+    headers = []
+    vary = None
+    for key, value in raw_headers:
+        name = key.lower()
+        if name == b"content-length":
+            continue
+        if name == b"etag" and not value.startswith(b"W/"):
+            # The encoded bytes differ from the identity representation's
+            value = b"W/" + value
+        if name == b"vary":
+            vary = value
+            continue
+        headers.append((key, value))
+    vary_values = [v.strip().lower() for v in vary.split(b",")] if vary else []
+    if b"accept-encoding" not in vary_values and b"*" not in vary_values:
+        vary = (vary + b", " if vary else b"") + b"Accept-Encoding"
+    headers.append((b"vary", vary))
+    headers.append((b"content-encoding", encoding.encode("latin-1")))
+    return headers
+
+class CompressionMiddleware:
+    """Pure ASGI middleware, so streamed bodies are compressed as they are produced."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = None
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        codec = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, codec, passthrough
+            if message["type"] == "http.response.start":
+                # Held until the first body message shows how large the response is
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if codec is None:
+                headers = {key.lower(): value for key, value in start_message["headers"]}
+                small = not more_body and len(body) < COMPRESSION_MIN_SIZE
+                if small or start_message["status"] in (204, 206, 304) or not _compressible(headers):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                codec = _CODECS[encoding]()
+                await send({**start_message, "headers": _encoded_headers(start_message["headers"], encoding)})
+
+            data = codec.chunk(body) if more_body else codec.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,59 @@
+"""
+Helpers for conditional GETs (ETag / If-None-Match) and byte Range requests.
+"""
+from fastapi import HTTPException, Response, status
+from typing import Optional
+import hashlib
+import json
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == wanted for candidate in if_none_match.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def session_etag(session, kind: str = "session", params: Optional[dict] = None) -> str:
+    # Every write to a session bumps its version, so the version identifies its state.
+    # Lists derived from it add their kind and a digest of the query that selected
+    # them, so one page's or delta's validator never matches another's.
+    tag = f"{kind}-{session.session_id}-v{session.version}"
+    if params:
+        encoded = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        tag += "-" + hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:16]
+    return f'W/"{tag}"'
+
+def session_version_headers(session, etag: Optional[str] = None) -> dict:
+    return {
+        "ETag": etag or session_etag(session),
+        "X-Session-Version": str(session.version),
+        "Cache-Control": "private, no-cache",
+    }
+
+def byte_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """Inclusive (start, end) for a single `bytes=` range, or None to send everything."""
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        # Multiple ranges are allowed to be answered with the whole representation
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # bytes=-N is the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,  # named differently across Starlette versions
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from collections import deque
+import threading
+import time
 import os
 
 # Get database URL from environment or use SQLite for local development
@@ -10,14 +15,162 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./turn_app.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# "sync" serves the API from blocking handlers on the threadpool; "async" swaps in
+# async handlers on an AsyncEngine (asyncpg / aiosqlite) where they exist
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+def _async_url(url: str) -> str:
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", "true")
+
+# SQLite performance profile, applied to every new connection
+SQLITE_WAL = _env_flag("SQLITE_WAL", "true")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IS_SQLITE_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") in ("sqlite:", "sqlite:/"))
+
+class PoolWaitStats:
+    """Time spent waiting for a pooled connection, recorded on every checkout."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self._recent.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            checkouts, total_wait, max_wait = self.checkouts, self.total_wait, self.max_wait
+
+        def percentile(q):
+            return recent[min(len(recent) - 1, int(q * len(recent)))] if recent else 0.0
+
+        return {
+            "checkouts": checkouts,
+            "wait_seconds_total": total_wait,
+            "wait_seconds_max": max_wait,
+            "wait_seconds_p50": percentile(0.50),
+            "wait_seconds_p95": percentile(0.95),
+            "wait_seconds_p99": percentile(0.99),
+        }
+
+# _do_get is where QueuePool blocks for a free (or new overflow) connection
+class TimedQueuePool(QueuePool):
+    wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+def _engine_options(poolclass) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if IS_SQLITE_MEMORY:
+        # In-memory databases live and die with a single connection
+        return options
+    options.update(
+        poolclass=poolclass,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        if SQLITE_WAL and not IS_SQLITE_MEMORY:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    finally:
+        cursor.close()
+
 # Create engine
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **_engine_options(TimedQueuePool)
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The blocking engine stays available in async mode for exports and scripts
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(TimedAsyncQueuePool))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+def pool_stats() -> dict:
+    stats = {}
+    for name, eng in (("sync", engine), ("async", async_engine)):
+        if eng is None:
+            continue
+        pool = eng.pool
+        entry = {"status": pool.status()}
+        if isinstance(pool, QueuePool):
+            entry.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+                checked_in=pool.checkedin(),
+            )
+        wait_stats = getattr(pool, "wait_stats", None)
+        if wait_stats is not None:
+            entry.update(wait_stats.snapshot())
+        stats[name] = entry
+    return stats
+
 Base = declarative_base()
 
 # Dependency to get database session
@@ -27,3 +180,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database sessions require DB_MODE=async")
+    async with AsyncSessionLocal() as db:
+        yield db
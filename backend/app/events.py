@@ -0,0 +1,206 @@
+"""
+Per-session event fan-out for live score updates.
+
+Handlers publish after they commit; the SSE endpoint subscribes one queue per
+open stream. The default backend delivers within this process only. Set
+EVENTS_BACKEND=redis (pip install -e ".[redis]") to relay events through Redis
+pub/sub so every worker sees every publish.
+
+Other modules can also register a callback for a channel (on_message), e.g.
+to drop a cache entry that another worker has changed.
+
+A client that falls EVENTS_QUEUE_SIZE events behind is not sent a stream with
+holes in it: its queue is replaced by a single "resync" event and the stream
+ends, so the client reloads the session state and reconnects.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi.encoders import jsonable_encoder
+from typing import AsyncIterator, Callable, Optional
+import asyncio
+import json
+import logging
+import threading
+import os
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local")  # local or redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+EVENTS_CHANNEL_PREFIX = os.getenv("EVENTS_CHANNEL_PREFIX", "turn:")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+# Comment frames keep idle streams open through proxies
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+
+logger = logging.getLogger(__name__)
+
+def session_channel(session_id: int) -> str:
+    return f"session:{session_id}"
+
+def format_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+# Last message of a stream that fell behind
+RESYNC = format_event("resync", {"reason": "too many undelivered events"})
+
+class Subscription:
+    def __init__(self, channel: str, maxsize: int):
+        self.channel = channel
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def _put(self, message: str) -> None:
+        if self.overflowed:
+            return
+        if self._queue.full():
+            # Score events carry the actions they added, and status and log
+            # events stand alone, so none can be dropped safely; the client
+            # starts over from a fresh snapshot instead
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self.overflowed = True
+            message = RESYNC
+        self._queue.put_nowait(message)
+
+    def deliver(self, message: str) -> None:
+        # Publishers run on threadpool workers as well as the event loop
+        self._loop.call_soon_threadsafe(self._put, message)
+
+    async def get(self) -> str:
+        return await self._queue.get()
+
+class LocalBackend:
+    """Delivers events to subscribers in this process only."""
+
+    def __init__(self):
+        self._subscribers: dict[str, set[Subscription]] = defaultdict(set)
+        self._callbacks: dict[str, list[Callable[[str], None]]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: str) -> None:
+        self._deliver(channel, message)
+
+    def on_message(self, channel: str, callback: Callable[[str], None]) -> None:
+        """Call callback with every message published on channel, by any worker."""
+        with self._lock:
+            self._callbacks[channel].append(callback)
+
+    def _deliver(self, channel: str, message: str) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+            callbacks = list(self._callbacks.get(channel, ()))
+        for callback in callbacks:
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Event callback for %s failed", channel)
+        for subscription in subscribers:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                pass  # its event loop has closed; unsubscribe will clean it up
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[Subscription]:
+        subscription = Subscription(channel, EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+class RedisBackend(LocalBackend):
+    """Publishes through Redis; one listener per process feeds the local subscribers."""
+
+    def __init__(self, url: str, prefix: str):
+        try:
+            import redis
+            import redis.asyncio as redis_async
+        except ImportError:
+            raise RuntimeError('EVENTS_BACKEND=redis requires the redis package (pip install -e ".[redis]")')
+        super().__init__()
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._async_client = redis_async.Redis.from_url(url)
+        # Publishing never blocks a request, whichever thread it comes from
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="events-publish")
+        self._listener: Optional[asyncio.Task] = None
+
+    def publish(self, channel: str, message: str) -> None:
+        self._executor.submit(self._publish, self.prefix + channel, message)
+
+    def _publish(self, channel: str, message: str) -> None:
+        try:
+            self._client.publish(channel, message)
+        except Exception:
+            logger.exception("Failed to publish event to %s", channel)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._async_client.pubsub()
+            try:
+                await pubsub.psubscribe(self.prefix + "*")
+                async for item in pubsub.listen():
+                    if item["type"] != "pmessage":
+                        continue
+                    channel = item["channel"].decode("utf-8")[len(self.prefix):]
+                    self._deliver(channel, item["data"].decode("utf-8"))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event listener lost its Redis connection; reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self._executor.shutdown(wait=True)
+        await self._async_client.aclose()
+        self._client.close()
+
+def _create_backend() -> LocalBackend:
+    if EVENTS_BACKEND == "redis":
+        return RedisBackend(REDIS_URL, EVENTS_CHANNEL_PREFIX)
+    return LocalBackend()
+
+hub = _create_backend()
+
+def publish(session_id: int, event: str, data) -> None:
+    # Messages travel pre-framed as Server-Sent Events
+    hub.publish(session_channel(session_id), format_event(event, data))
+
+def publish_scores(session_id: int, scores, actions: list) -> None:
+    publish(session_id, "score", {
+        "session_id": session_id,
+        "user_score": scores.user_score,
+        "llm_score": scores.llm_score,
+        "version": scores.version,
+        "actions": actions,
+    })
@@ -0,0 +1,170 @@
+"""
+Streaming export engine shared by the CSV export endpoints.
+
+Rows are produced straight from the database cursor and written into a small
+buffer that is handed to the client every EXPORT_CHUNK_SIZE characters, so an
+export never holds the whole file in memory.
+"""
+from sqlalchemy import func, select
+import io
+import csv
+import os
+
+from app.database import SessionLocal
+from app.models import GameSession, TrackedAction, ActionLibrary
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "65536"))
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "1000"))
+
+def stream_csv(rows, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Encode an iterable of CSV rows, yielding text chunks of about chunk_size."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _duration_minutes(start_time, end_time):
+    if end_time and start_time:
+        delta = end_time - start_time
+        return round(delta.total_seconds() / 60, 1)
+    return ''
+
+def _describe(library_id, action_description, library_description, custom_source):
+    if library_id:
+        return library_description or 'Unknown', 'Library'
+    return action_description or 'Custom', custom_source
+
+def action_counts_subquery(*criteria):
+    """
+    Actions per session, restricted by criteria on GameSession so only the
+    exported sessions' actions are grouped, not the whole table.
+    """
+    return (
+        select(TrackedAction.session_id, func.count(TrackedAction.action_id).label("action_count"))
+        .join(GameSession, GameSession.session_id == TrackedAction.session_id)
+        .where(*criteria)
+        .group_by(TrackedAction.session_id)
+        .subquery()
+    )
+
+def _session_summary_query(user_id: int):
+    # One aggregated query instead of a COUNT per session
+    action_counts = action_counts_subquery(GameSession.user_id == user_id)
+    return (
+        select(GameSession, func.coalesce(action_counts.c.action_count, 0))
+        .outerjoin(action_counts, action_counts.c.session_id == GameSession.session_id)
+        .where(GameSession.user_id == user_id)
+        .order_by(GameSession.start_time.desc(), GameSession.session_id.desc())
+    )
+
+def _action_detail_query(*criteria):
+    # Library descriptions are joined in rather than looked up per action
+    return (
+        select(
+            TrackedAction.timestamp,
+            TrackedAction.session_id,
+            GameSession.session_name,
+            TrackedAction.action_id,
+            TrackedAction.library_id,
+            TrackedAction.action_description,
+            ActionLibrary.action_description,
+            TrackedAction.user_movement,
+            TrackedAction.llm_movement,
+        )
+        .join(GameSession, GameSession.session_id == TrackedAction.session_id)
+        .outerjoin(ActionLibrary, ActionLibrary.library_id == TrackedAction.library_id)
+        .where(*criteria)
+        .execution_options(yield_per=EXPORT_YIELD_PER)
+    )
+
+def iter_all_sessions_rows(user_id: int):
+    # The export outlives the request's dependency-scoped session, so it owns one
+    db = SessionLocal()
+    try:
+        yield ['All Sessions Summary']
+        yield ['Session ID', 'Session Name', 'Start Time', 'End Time', 'Status', 'User Score', 'LLM Score', 'Duration (minutes)', 'Total Actions']
+
+        for session, action_count in db.execute(_session_summary_query(user_id)):
+            yield [
+                session.session_id,
+                session.session_name or 'Unnamed',
+                session.start_time,
+                session.end_time or 'Ongoing',
+                session.status,
+                session.user_score,
+                session.llm_score,
+                _duration_minutes(session.start_time, session.end_time),
+                action_count
+            ]
+
+        yield []
+        yield []
+
+        yield ['Detailed Action Log']
+        yield ['Timestamp', 'Session ID', 'Session Name', 'Action ID', 'Description', 'User Points', 'LLM Points', 'Source']
+
+        query = _action_detail_query(GameSession.user_id == user_id).order_by(
+            GameSession.start_time.desc(),
+            GameSession.session_id.desc(),
+            TrackedAction.timestamp.asc(),
+            TrackedAction.action_id.asc()
+        )
+        for (timestamp, session_id, session_name, action_id, library_id,
+             action_description, library_description, user_movement, llm_movement) in db.execute(query):
+            description, source = _describe(library_id, action_description, library_description, 'Custom')
+            yield [
+                timestamp,
+                session_id,
+                session_name or 'Unnamed',
+                action_id,
+                description,
+                user_movement,
+                llm_movement,
+                source
+            ]
+    finally:
+        db.close()
+
+def iter_session_rows(session_id: int):
+    db = SessionLocal()
+    try:
+        session = db.get(GameSession, session_id)
+        if session is None:
+            return
+
+        yield ['Session Information']
+        yield ['Session ID', session.session_id]
+        yield ['Session Name', session.session_name or 'Unnamed']
+        yield ['Start Time', session.start_time]
+        yield ['End Time', session.end_time or 'Ongoing']
+        yield ['Status', session.status]
+        yield ['Final User Score', session.user_score]
+        yield ['Final LLM Score', session.llm_score]
+        yield []
+
+        yield ['Actions Tracked']
+        yield ['Timestamp', 'Action ID', 'Description', 'User Points', 'LLM Points', 'Source']
+
+        query = _action_detail_query(TrackedAction.session_id == session_id).order_by(
+            TrackedAction.timestamp.asc(),
+            TrackedAction.action_id.asc()
+        )
+        for (timestamp, _, _, action_id, library_id,
+             action_description, library_description, user_movement, llm_movement) in db.execute(query):
+            description, source = _describe(library_id, action_description, library_description, 'Custom (Session)')
+            yield [
+                timestamp,
+                action_id,
+                description,
+                user_movement,
+                llm_movement,
+                source
+            ]
+    finally:
+        db.close()
@@ -0,0 +1,323 @@
+"""
+Background export jobs.
+
+POST /api/exports records a job and hands it to this process's worker pool,
+which writes the export to EXPORT_DIR instead of streaming it over a request
+connection. Clients poll the job for progress and download the finished file
+with Range requests, so a dropped download resumes rather than starting over.
+
+Every job stores a fingerprint of the user's data. A new request for the same
+export reuses a queued, running or unexpired finished job whose fingerprint
+still matches. A unique partial index allows one queued or running job per
+export, so of two concurrent requests one inserts and the other is handed
+its job. Files are deleted EXPORT_TTL_SECONDS after they finish. Each pool
+heartbeats the jobs it holds; a queued or running job whose heartbeat stops
+(its process died) is reported as failed and never reused.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Iterator, Optional
+import hashlib
+import logging
+import threading
+import uuid
+import os
+
+from app.database import SessionLocal
+from app.export import stream_csv, iter_all_sessions_rows
+from app.models import ActionLibrary, ExportJob, GameSession, GameSessionLog, TrackedAction
+from app import research_export
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "./exports")
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_TTL_SECONDS = int(os.getenv("EXPORT_TTL_SECONDS", str(24 * 3600)))
+EXPORT_HEARTBEAT_SECONDS = float(os.getenv("EXPORT_HEARTBEAT_SECONDS", "15"))
+# A job is abandoned once its heartbeat is this old
+EXPORT_STALE_SECONDS = float(os.getenv("EXPORT_STALE_SECONDS", "120"))
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+MEDIA_TYPES = {"csv": "text/csv", **research_export.MEDIA_TYPES}
+EXTENSIONS = {"csv": "csv", **research_export.EXTENSIONS}
+
+logger = logging.getLogger(__name__)
+
+def file_path(job: ExportJob) -> str:
+    return os.path.join(EXPORT_DIR, f"{job.job_id}.{EXTENSIONS[job.format]}")
+
+def download_name(job: ExportJob) -> str:
+    if job.format == "csv":
+        return "turn_all_data_export.csv"
+    return f"turn_{job.dataset}.{EXTENSIONS[job.format]}"
+
+def _naive_utc(value: datetime) -> datetime:
+    # Postgres hands timestamptz back aware, SQLite naive; times are written as UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def is_abandoned(job: ExportJob, now: Optional[datetime] = None) -> bool:
+    now = now or datetime.utcnow()
+    return job.status in ("queued", "running") and _naive_utc(job.updated_at) < now - timedelta(seconds=EXPORT_STALE_SECONDS)
+
+def data_version(db: Session, user_id: int) -> str:
+    """Fingerprint of everything an export of this user's data contains."""
+    owned_sessions = select(GameSession.session_id).where(GameSession.user_id == user_id)
+    digest = hashlib.sha1()
+    sessions = db.execute(
+        select(
+            GameSession.session_id, GameSession.session_name, GameSession.status,
+            GameSession.end_time, GameSession.user_score, GameSession.llm_score
+        )
+        .where(GameSession.user_id == user_id)
+        .order_by(GameSession.session_id)
+    )
+    for row in sessions:
+        digest.update(repr(tuple(row)).encode("utf-8"))
+    # Actions and logs are append-only, so a count and the newest id identify them
+    for table_id, session_column in ((TrackedAction.action_id, TrackedAction.session_id),
+                                     (GameSessionLog.log_id, GameSessionLog.session_id)):
+        row = db.execute(
+            select(func.count(table_id), func.max(table_id)).where(session_column.in_(owned_sessions))
+        ).one()
+        digest.update(repr(tuple(row)).encode("utf-8"))
+    custom_actions = db.execute(
+        select(ActionLibrary.library_id, ActionLibrary.action_description)
+        .where(ActionLibrary.user_created == True, ActionLibrary.created_from_session_id.in_(owned_sessions))
+        .order_by(ActionLibrary.library_id)
+    )
+    for row in custom_actions:
+        digest.update(repr(tuple(row)).encode("utf-8"))
+    return digest.hexdigest()
+
+def _rows_total(db: Session, job: ExportJob) -> int:
+    def count(dataset):
+        query = research_export.count_query(dataset, job.user_id)
+        return db.execute(query).scalar()
+    if job.format == "csv":
+        return count("sessions") + count("actions")
+    return count(job.dataset)
+
+def _matching(user_id: int, fmt: str, dataset: Optional[str], anonymize: bool, version: str) -> list:
+    return [
+        ExportJob.user_id == user_id,
+        ExportJob.format == fmt,
+        ExportJob.dataset.is_(None) if dataset is None else ExportJob.dataset == dataset,
+        ExportJob.anonymize == anonymize,
+        ExportJob.data_version == version,
+    ]
+
+def find_reusable(db: Session, user_id: int, fmt: str, dataset: Optional[str], anonymize: bool, version: str) -> Optional[ExportJob]:
+    now = datetime.utcnow()
+    candidates = db.scalars(
+        select(ExportJob)
+        .where(*_matching(user_id, fmt, dataset, anonymize, version), ExportJob.status.in_(("queued", "running", "done")))
+        .order_by(ExportJob.created_at.desc())
+    )
+    for job in candidates:
+        if job.status == "done" and _naive_utc(job.expires_at) > now and os.path.exists(file_path(job)):
+            return job
+        if job.status != "done" and not is_abandoned(job, now):
+            return job
+    return None
+
+def _fail_abandoned(db: Session, criteria: list) -> None:
+    # They hold the unique active slot (migration 8) until marked failed
+    now = datetime.utcnow()
+    db.execute(
+        update(ExportJob)
+        .where(
+            *criteria,
+            ExportJob.status.in_(("queued", "running")),
+            ExportJob.updated_at < now - timedelta(seconds=EXPORT_STALE_SECONDS)
+        )
+        .values(
+            status="failed",
+            error="The export worker stopped before finishing",
+            finished_at=now,
+            expires_at=now + timedelta(seconds=EXPORT_TTL_SECONDS)
+        )
+    )
+
+def create_job(db: Session, user_id: int, fmt: str, dataset: Optional[str], anonymize: bool) -> tuple[ExportJob, bool]:
+    """The job to report for this request, and whether it is new (and must be submitted)."""
+    version = data_version(db, user_id)
+    job = find_reusable(db, user_id, fmt, dataset, anonymize, version)
+    if job is not None:
+        return job, False
+
+    _fail_abandoned(db, _matching(user_id, fmt, dataset, anonymize, version))
+    now = datetime.utcnow()
+    job = ExportJob(
+        job_id=uuid.uuid4().hex,
+        user_id=user_id,
+        format=fmt,
+        dataset=dataset,
+        anonymize=anonymize,
+        data_version=version,
+        status="queued",
+        rows_written=0,
+        created_at=now,
+        updated_at=now
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request inserted the same job first; report that one
+        db.rollback()
+        existing = find_reusable(db, user_id, fmt, dataset, anonymize, version)
+        if existing is None:
+            raise
+        return existing, False
+    db.refresh(job)
+    return job, True
+
+def _set(job_id: str, **values) -> None:
+    with SessionLocal() as db:
+        db.execute(update(ExportJob).where(ExportJob.job_id == job_id).values(updated_at=datetime.utcnow(), **values))
+        db.commit()
+
+def _encoded(job: ExportJob, progress) -> Iterator:
+    if job.format == "csv":
+        def rows():
+            for row in iter_all_sessions_rows(job.user_id):
+                progress(1)
+                yield row
+        return stream_csv(rows())
+
+    def chunks():
+        for chunk in research_export.iter_chunks(job.dataset, job.user_id, None, job.anonymize):
+            progress(len(chunk))
+            yield chunk
+    return research_export.encode(job.dataset, job.format, chunks(), job.anonymize)
+
+def run_job(job_id: str) -> None:
+    with SessionLocal() as db:
+        job = db.get(ExportJob, job_id)
+        if job is None:
+            return
+        db.expunge(job)
+
+    path = file_path(job)
+    partial = path + ".part"
+    rows_total = 0
+    written = 0
+    last_report = datetime.utcnow()
+
+    def progress(rows: int) -> None:
+        nonlocal written, last_report
+        written += rows
+        now = datetime.utcnow()
+        if (now - last_report).total_seconds() >= PROGRESS_INTERVAL_SECONDS:
+            last_report = now
+            # The CSV's header and spacer rows can run a little past the estimate
+            _set(job_id, rows_written=min(written, rows_total))
+
+    try:
+        with SessionLocal() as db:
+            rows_total = _rows_total(db, job)
+        _set(job_id, status="running", rows_total=rows_total)
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        with open(partial, "wb") as out:
+            for data in _encoded(job, progress):
+                out.write(data.encode("utf-8") if isinstance(data, str) else data)
+        os.replace(partial, path)
+        finished = datetime.utcnow()
+        _set(
+            job_id,
+            status="done",
+            rows_written=rows_total,
+            size_bytes=os.path.getsize(path),
+            finished_at=finished,
+            expires_at=finished + timedelta(seconds=EXPORT_TTL_SECONDS)
+        )
+    except Exception as exc:
+        logger.exception("Export job %s failed", job_id)
+        if os.path.exists(partial):
+            os.remove(partial)
+        finished = datetime.utcnow()
+        _set(
+            job_id,
+            status="failed",
+            error=str(exc)[:500],
+            finished_at=finished,
+            expires_at=finished + timedelta(seconds=EXPORT_TTL_SECONDS)
+        )
+
+def sweep_expired() -> int:
+    """Delete expired jobs and their files."""
+    with SessionLocal() as db:
+        expired = db.scalars(select(ExportJob).where(ExportJob.expires_at <= datetime.utcnow())).all()
+        for job in expired:
+            for path in (file_path(job), file_path(job) + ".part"):
+                if os.path.exists(path):
+                    os.remove(path)
+        if expired:
+            db.execute(delete(ExportJob).where(ExportJob.job_id.in_([job.job_id for job in expired])))
+            db.commit()
+        return len(expired)
+
+class ExportWorkerPool:
+    def __init__(self, workers: int, heartbeat: float):
+        self.workers = workers
+        self.heartbeat = heartbeat
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._held: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, job_id: str) -> None:
+        if self._executor is None:
+            raise RuntimeError("Export worker pool is not running")
+        with self._lock:
+            self._held.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id: str) -> None:
+        try:
+            run_job(job_id)
+        finally:
+            with self._lock:
+                self._held.discard(job_id)
+
+    def _beat(self) -> None:
+        with self._lock:
+            held = list(self._held)
+        if held:
+            with SessionLocal() as db:
+                db.execute(
+                    update(ExportJob)
+                    .where(ExportJob.job_id.in_(held), ExportJob.status.in_(("queued", "running")))
+                    .values(updated_at=datetime.utcnow())
+                )
+                db.commit()
+        sweep_expired()
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat):
+            try:
+                self._beat()
+            except Exception:
+                logger.exception("Export job heartbeat failed")
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export-job")
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._heartbeat_loop, name="export-job-heartbeat", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            # Queued jobs are dropped; their heartbeat stops, so clients see them fail
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+export_pool = ExportWorkerPool(EXPORT_WORKERS, EXPORT_HEARTBEAT_SECONDS)
@@ -0,0 +1,94 @@
+"""
+Password hashing on a dedicated, bounded executor.
+
+bcrypt is deliberately slow, so running it inline would hold a request worker
+for hundreds of milliseconds per login. Hashing runs on its own process pool
+instead, and admission control turns bursts beyond PASSWORD_HASH_MAX_PENDING
+into 429 responses rather than letting them starve the rest of the API.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+from typing import Optional
+import asyncio
+import multiprocessing
+import threading
+import bcrypt
+import os
+
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process")  # process or thread
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+def hash_password_sync(password: str) -> str:
+    salt = bcrypt.gensalt()
+    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    return hashed.decode('utf-8')
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def _get_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if PASSWORD_HASH_EXECUTOR == "thread":
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+            else:
+                # spawn keeps workers independent of the server's threads and sockets
+                _executor = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+        return _executor
+
+def _discard_executor(executor: Executor) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+async def _run(fn, *args):
+    global _pending
+    with _pending_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many authentication requests, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        executor = _get_executor()
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # A crashed worker poisons the pool; start a fresh one for the next caller
+            _discard_executor(executor)
+            raise
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+async def hash_password(password: str) -> str:
+    return await _run(hash_password_sync, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password_sync, plain_password, hashed_password)
+
+def hashing_stats() -> dict:
+    return {"pending": _pending, "max_pending": PASSWORD_HASH_MAX_PENDING, "workers": PASSWORD_HASH_WORKERS}
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
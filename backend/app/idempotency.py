@@ -0,0 +1,223 @@
+"""
+Idempotency-Key support for write endpoints.
+
+Clients on flaky networks retry POSTs whose response they never saw. When a
+request carries an `Idempotency-Key` header, the endpoint stores its response
+in the same transaction as the write. A retry with the same key gets the
+stored response back (with `Idempotent-Replayed: true`) and nothing runs again.
+
+Stored responses live in the idempotency_keys table, so they survive
+restarts and are shared by every worker. Each process also keeps the most
+recent IDEMPOTENCY_CACHE_SIZE of them in memory, so a retry that reaches the
+same worker is answered without touching the database. Keys are scoped to
+the user and expire after IDEMPOTENCY_TTL_SECONDS. A background sweeper
+deletes expired rows.
+
+Reusing a key for a different request (another endpoint or another body) is
+answered with 422. When two copies of a request race, the key's primary key
+serializes them: the loser's transaction is rolled back and it replays the
+winner's response.
+"""
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Optional
+import hashlib
+import json
+import logging
+import threading
+import os
+
+from app.cache import TTLCache
+from app.database import engine as default_engine
+from app.models import IdempotencyKey
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_SWEEP_INTERVAL_SECONDS = float(os.getenv("IDEMPOTENCY_SWEEP_INTERVAL_SECONDS", "300"))
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+logger = logging.getLogger(__name__)
+
+class StoredResponse:
+    __slots__ = ("fingerprint", "status_code", "body")
+
+    def __init__(self, fingerprint: str, status_code: int, body: str):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.body = body
+
+_cache = TTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL_SECONDS)
+
+class RequestKey:
+    """A client's Idempotency-Key, with the fingerprint of the request it was sent with."""
+    __slots__ = ("user_id", "key", "fingerprint")
+
+    def __init__(self, user_id: int, key: str, fingerprint: str):
+        self.user_id = user_id
+        self.key = key
+        self.fingerprint = fingerprint
+
+    @property
+    def cache_key(self) -> tuple[int, str]:
+        return self.user_id, self.key
+
+def request_key(user_id: int, key: Optional[str], endpoint: str, payload: Any) -> Optional[RequestKey]:
+    """None when the client sent no key, so the endpoint behaves as before."""
+    if key is None:
+        return None
+    encoded = json.dumps([endpoint, jsonable_encoder(payload)], sort_keys=True, separators=(",", ":"))
+    return RequestKey(user_id, key, hashlib.sha256(encoded.encode("utf-8")).hexdigest())
+
+def _encode(body: Any) -> str:
+    # Same bytes FastAPI's JSONResponse would send for the response model
+    return json.dumps(jsonable_encoder(body), ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+def _replay(request: RequestKey, stored: StoredResponse) -> Response:
+    if stored.fingerprint != request.fingerprint:
+        raise HTTPException(
+            status_code=422,  # named differently across Starlette versions
+            detail="Idempotency-Key was already used for a different request"
+        )
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"}
+    )
+
+def _lookup_query(request: RequestKey):
+    return select(IdempotencyKey).where(
+        IdempotencyKey.user_id == request.user_id,
+        IdempotencyKey.key == request.key
+    )
+
+def _from_row(request: RequestKey, row: Optional[IdempotencyKey]) -> Optional[StoredResponse]:
+    if row is None:
+        return None
+    expires_at = row.expires_at
+    if expires_at.tzinfo is not None:
+        # Postgres hands timestamptz back aware, SQLite naive
+        expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+    remaining = (expires_at - datetime.utcnow()).total_seconds()
+    if remaining <= 0:
+        return None
+    stored = StoredResponse(row.fingerprint, row.status_code, row.response_body)
+    _cache.set(request.cache_key, stored, ttl=remaining)
+    return stored
+
+def _expired_query(request: RequestKey):
+    # Not swept yet; cleared so the key can be stored again
+    return delete(IdempotencyKey).where(
+        IdempotencyKey.user_id == request.user_id,
+        IdempotencyKey.key == request.key,
+        IdempotencyKey.expires_at <= datetime.utcnow()
+    )
+
+def _new_row(request: RequestKey, status_code: int, body: str) -> IdempotencyKey:
+    now = datetime.utcnow()
+    return IdempotencyKey(
+        user_id=request.user_id,
+        key=request.key,
+        fingerprint=request.fingerprint,
+        status_code=status_code,
+        response_body=body,
+        created_at=now,
+        expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    )
+
+def replay(db, request: Optional[RequestKey]) -> Optional[Response]:
+    """The stored response for a repeated key, or None to go ahead with the write."""
+    if request is None:
+        return None
+    stored = _cache.get(request.cache_key)
+    if stored is None:
+        stored = _from_row(request, db.scalar(_lookup_query(request)))
+    if stored is None:
+        db.execute(_expired_query(request))
+        return None
+    return _replay(request, stored)
+
+def commit(db, request: Optional[RequestKey], status_code: int, body: Any) -> Optional[Response]:
+    """
+    Commit the write together with its response. Returns None on success, or
+    the winner's response when a concurrent copy of the request committed first.
+    """
+    if request is None:
+        db.commit()
+        return None
+    encoded = _encode(body)
+    db.add(_new_row(request, status_code, encoded))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        stored = _from_row(request, db.scalar(_lookup_query(request)))
+        if stored is None:
+            raise
+        return _replay(request, stored)
+    _cache.set(request.cache_key, StoredResponse(request.fingerprint, status_code, encoded))
+    return None
+
+async def replay_async(db, request: Optional[RequestKey]) -> Optional[Response]:
+    if request is None:
+        return None
+    stored = _cache.get(request.cache_key)
+    if stored is None:
+        stored = _from_row(request, await db.scalar(_lookup_query(request)))
+    if stored is None:
+        await db.execute(_expired_query(request))
+        return None
+    return _replay(request, stored)
+
+async def commit_async(db, request: Optional[RequestKey], status_code: int, body: Any) -> Optional[Response]:
+    if request is None:
+        await db.commit()
+        return None
+    encoded = _encode(body)
+    db.add(_new_row(request, status_code, encoded))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        stored = _from_row(request, await db.scalar(_lookup_query(request)))
+        if stored is None:
+            raise
+        return _replay(request, stored)
+    _cache.set(request.cache_key, StoredResponse(request.fingerprint, status_code, encoded))
+    return None
+
+def sweep_expired(engine: Engine = default_engine) -> int:
+    with engine.begin() as conn:
+        return conn.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())).rowcount
+
+class Sweeper:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                sweep_expired()
+            except Exception:
+                logger.exception("Failed to sweep expired idempotency keys")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="idempotency-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+sweeper = Sweeper(IDEMPOTENCY_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,395 @@
+"""
+Bulk import / restore from exported data.
+
+Accepts the all-sessions and single-session CSV exports, and un-anonymized
+research exports (JSON Lines, Arrow IPC or Parquet; give sessions, actions and
+logs together so their ids can be linked). Files are read a row at a time and
+written with executemany in batches of IMPORT_BATCH_SIZE, all in one
+transaction. Session, action and library ids are remapped: library actions
+are matched by description against the starter pack and the user's own
+actions, and missing ones are recreated as custom actions. Session scores are
+recomputed set-wise once every row is in, then the analytics rollup is
+rebuilt for the user.
+
+    cd backend && python -m app.importer EMAIL FILE [FILE ...]
+"""
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+from typing import BinaryIO, Iterator, Optional
+import csv
+import io
+import json
+import sys
+import os
+
+from app.models import ActionLibrary, GameSession, GameSessionLog, TrackedAction, User
+from app.export import EXPORT_YIELD_PER
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+# Order files must be applied in, by what they contain
+_RANK = {"csv_all": 0, "csv_session": 0, "sessions": 0, "actions": 1, "logs": 2}
+
+class ImportDataError(ValueError):
+    """The file is not an export this importer understands, or its rows don't link up."""
+
+def _parse_time(value) -> Optional[datetime]:
+    if value in (None, "", "Ongoing"):
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ImportDataError(f"Invalid timestamp: {value!r}")
+
+def _parse_int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ImportDataError(f"Invalid number: {value!r}")
+
+def detect(stream: BinaryIO) -> str:
+    """Which export a file is, from its first bytes; the stream is rewound."""
+    head = stream.read(4096)
+    stream.seek(0)
+    if not head.strip():
+        # An export of a user with no rows yet is a zero-byte file
+        return "empty"
+    if head.startswith(b"PAR1"):
+        return "parquet"
+    if head.startswith(b"\xff\xff\xff\xff"):
+        return "arrow"
+    first_line = head.split(b"\n", 1)[0].strip().decode("utf-8-sig", errors="replace")
+    if first_line.startswith("All Sessions Summary"):
+        return "csv_all"
+    if first_line.startswith("Session Information"):
+        return "csv_session"
+    if first_line.startswith("{"):
+        return "jsonl"
+    raise ImportDataError("Unrecognized export format")
+
+def _dataset_of(row: dict) -> str:
+    if isinstance(row.get("session_id"), str):
+        raise ImportDataError("Anonymized exports cannot be restored")
+    if "log_id" in row:
+        return "logs"
+    if "action_id" in row and "user_movement" in row:
+        return "actions"
+    if "start_time" in row:
+        return "sessions"
+    raise ImportDataError("Unrecognized research export")
+
+def _iter_jsonl(stream: BinaryIO) -> Iterator[dict]:
+    for line in io.TextIOWrapper(stream, encoding="utf-8"):
+        if line.strip():
+            yield json.loads(line)
+
+def _iter_columnar(stream: BinaryIO, fmt: str) -> Iterator[dict]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportDataError('Arrow and Parquet imports require pyarrow (pip install -e ".[research]")')
+    if fmt == "parquet":
+        batches = pq.ParquetFile(stream).iter_batches(batch_size=EXPORT_YIELD_PER)
+    else:
+        batches = pa.ipc.open_stream(stream)
+    for batch in batches:
+        yield from batch.to_pylist()
+
+def open_rows(stream: BinaryIO) -> tuple[str, Iterator]:
+    """(kind, rows) for one export file. CSV kinds yield csv rows, the rest dicts."""
+    fmt = detect(stream)
+    if fmt == "empty":
+        return fmt, iter(())
+    if fmt.startswith("csv"):
+        return fmt, csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    rows = _iter_jsonl(stream) if fmt == "jsonl" else _iter_columnar(stream, fmt)
+    first = next(rows, None)
+    if first is None:
+        return "empty", iter(())
+    return _dataset_of(first), _chain_first(first, rows)
+
+def _chain_first(first, rows):
+    yield first
+    yield from rows
+
+def _session_total(column):
+    return (
+        select(func.coalesce(func.sum(column), 0))
+        .where(TrackedAction.session_id == GameSession.session_id)
+        .scalar_subquery()
+    )
+
+class Importer:
+    def __init__(self, db: Session, user_id: int, batch_size: int = IMPORT_BATCH_SIZE):
+        self.db = db
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.session_ids: dict[int, int] = {}
+        self.action_ids: dict[int, int] = {}
+        self.keep_action_ids = False
+        self.library_uses: Counter = Counter()
+        self.counts = Counter(sessions=0, actions=0, logs=0, library_actions=0)
+        self._sessions: list[tuple[int, dict]] = []
+        self._pending_session_ids: set[int] = set()
+        self._actions: list[tuple[Optional[int], dict]] = []
+        self._logs: list[dict] = []
+
+        # Starter actions and the user's own library actions, by description
+        self.library = dict(db.execute(
+            select(ActionLibrary.action_description, ActionLibrary.library_id)
+            .where(
+                (ActionLibrary.user_created == False)
+                | ActionLibrary.created_from_session_id.in_(
+                    select(GameSession.session_id).where(GameSession.user_id == user_id)
+                )
+            )
+            .order_by(ActionLibrary.library_id.desc())
+        ).all())
+
+    # Sessions
+    def add_session(self, old_id: int, name: Optional[str], start_time, end_time, status: str) -> None:
+        if old_id in self.session_ids or old_id in self._pending_session_ids:
+            raise ImportDataError(f"Session {old_id} appears twice")
+        self._pending_session_ids.add(old_id)
+        self._sessions.append((old_id, {
+            "user_id": self.user_id,
+            "session_name": name,
+            "start_time": _parse_time(start_time) or datetime.utcnow(),
+            "end_time": _parse_time(end_time),
+            "status": status or "ended",
+            "user_score": 0,
+            "llm_score": 0
+        }))
+        if len(self._sessions) >= self.batch_size:
+            self.flush_sessions()
+
+    def flush_sessions(self) -> None:
+        if not self._sessions:
+            return
+        new_ids = self.db.execute(
+            insert(GameSession).returning(GameSession.session_id, sort_by_parameter_order=True),
+            [row for _, row in self._sessions]
+        ).scalars().all()
+        self.session_ids.update(zip((old for old, _ in self._sessions), new_ids))
+        self.counts["sessions"] += len(new_ids)
+        self._sessions.clear()
+        self._pending_session_ids.clear()
+
+    def _session(self, old_id) -> int:
+        self.flush_sessions()
+        try:
+            return self.session_ids[_parse_int(old_id)]
+        except KeyError:
+            raise ImportDataError(f"Action or log refers to session {old_id}, which is not in the import")
+
+    # Library actions
+    def _library_id(self, description: Optional[str], session_id: int, user_movement: int, llm_movement: int) -> int:
+        library_id = self.library.get(description)
+        if library_id is None:
+            library_id = self.db.execute(insert(ActionLibrary).values(
+                action_description=description or "Imported action",
+                default_user_movement=user_movement,
+                default_llm_movement=llm_movement,
+                created_from_session_id=session_id,
+                times_used=0,
+                user_created=True
+            ).returning(ActionLibrary.library_id)).scalar_one()
+            self.library[description] = library_id
+            self.counts["library_actions"] += 1
+        return library_id
+
+    # Tracked actions
+    def add_action(self, old_id: Optional[int], old_session_id, timestamp, from_library: bool,
+                   description: Optional[str], user_movement, llm_movement) -> None:
+        session_id = self._session(old_session_id)
+        user_movement, llm_movement = _parse_int(user_movement), _parse_int(llm_movement)
+        library_id = None
+        if from_library:
+            library_id = self._library_id(description, session_id, user_movement, llm_movement)
+            self.library_uses[library_id] += 1
+            description = None
+        self._actions.append((old_id, {
+            "session_id": session_id,
+            "library_id": library_id,
+            "action_description": description,
+            "user_movement": user_movement,
+            "llm_movement": llm_movement,
+            "timestamp": _parse_time(timestamp) or datetime.utcnow()
+        }))
+        if len(self._actions) >= self.batch_size:
+            self.flush_actions()
+
+    def flush_actions(self) -> None:
+        if not self._actions:
+            return
+        rows = [row for _, row in self._actions]
+        if self.keep_action_ids:
+            new_ids = self.db.execute(
+                insert(TrackedAction).returning(TrackedAction.action_id, sort_by_parameter_order=True),
+                rows
+            ).scalars().all()
+            self.action_ids.update(zip((old for old, _ in self._actions), new_ids))
+        else:
+            self.db.execute(insert(TrackedAction), rows)
+        self.counts["actions"] += len(rows)
+        self._actions.clear()
+
+    # Logs
+    def add_log(self, old_session_id, old_action_id, timestamp, note: Optional[str]) -> None:
+        session_id = self._session(old_session_id)
+        self.flush_actions()
+        action_id = self.action_ids.get(_parse_int(old_action_id))
+        if action_id is None:
+            raise ImportDataError(f"Log refers to action {old_action_id}, which is not in the import")
+        self._logs.append({
+            "session_id": session_id,
+            "action_id": action_id,
+            "timestamp": _parse_time(timestamp) or datetime.utcnow(),
+            "optional_note": note
+        })
+        if len(self._logs) >= self.batch_size:
+            self.flush_logs()
+
+    def flush_logs(self) -> None:
+        if self._logs:
+            self.db.execute(insert(GameSessionLog), self._logs)
+            self.counts["logs"] += len(self._logs)
+            self._logs.clear()
+
+    # Readers
+    def read_csv_all(self, rows: Iterator[list]) -> None:
+        section = None
+        for row in rows:
+            if not row or not any(row):
+                continue
+            if len(row) == 1:
+                section = row[0]
+                next(rows, None)  # column headers
+                continue
+            if section == "All Sessions Summary":
+                session_id, name, start_time, end_time, status = row[:5]
+                self.add_session(_parse_int(session_id), None if name == "Unnamed" else name, start_time, end_time, status)
+            elif section == "Detailed Action Log":
+                timestamp, session_id, _, action_id, description, user_movement, llm_movement, source = row[:8]
+                self.add_action(_parse_int(action_id), session_id, timestamp, source == "Library",
+                                description, user_movement, llm_movement)
+            else:
+                raise ImportDataError(f"Unexpected CSV section {section!r}")
+
+    def read_csv_session(self, rows: Iterator[list]) -> None:
+        info = {}
+        section = None
+        session_id = None
+        for row in rows:
+            if not row or not any(row):
+                continue
+            if len(row) == 1:
+                section = row[0]
+                if section == "Actions Tracked":
+                    next(rows, None)  # column headers
+                    session_id = _parse_int(info.get("Session ID"))
+                    name = info.get("Session Name")
+                    self.add_session(session_id, None if name == "Unnamed" else name,
+                                     info.get("Start Time"), info.get("End Time"), info.get("Status"))
+                continue
+            if section == "Session Information":
+                info[row[0]] = row[1]
+            elif section == "Actions Tracked":
+                timestamp, action_id, description, user_movement, llm_movement, source = row[:6]
+                self.add_action(_parse_int(action_id), session_id, timestamp, source == "Library",
+                                description, user_movement, llm_movement)
+
+    def read_dataset(self, dataset: str, rows: Iterator[dict]) -> None:
+        for row in rows:
+            if dataset == "sessions":
+                self.add_session(_parse_int(row["session_id"]), row.get("session_name"),
+                                 row.get("start_time"), row.get("end_time"), row.get("status"))
+            elif dataset == "actions":
+                self.add_action(_parse_int(row["action_id"]), row["session_id"], row.get("timestamp"),
+                                row.get("library_id") is not None, row.get("action_description"),
+                                row["user_movement"], row["llm_movement"])
+            else:
+                self.add_log(row["session_id"], row["action_id"], row.get("timestamp"), row.get("optional_note"))
+
+    def finish(self) -> dict:
+        self.flush_sessions()
+        self.flush_actions()
+        self.flush_logs()
+
+        # Scores are the sum of each session's movements, recomputed in one statement per batch
+        new_ids = list(self.session_ids.values())
+        for start in range(0, len(new_ids), self.batch_size):
+            self.db.execute(
+                update(GameSession)
+                .where(GameSession.session_id.in_(new_ids[start:start + self.batch_size]))
+                .values(
+                    user_score=_session_total(TrackedAction.user_movement),
+                    llm_score=_session_total(TrackedAction.llm_movement)
+                )
+                .execution_options(synchronize_session=False)
+            )
+        return dict(self.counts)
+
+def import_files(db: Session, user_id: int, streams: list[BinaryIO]) -> tuple[dict, Counter]:
+    """Import export files for one user in a single transaction.
+
+    Returns the row counts and how often each library action was used, for after_import.
+    """
+    opened = sorted((open_rows(stream) for stream in streams), key=lambda item: _RANK.get(item[0], 0))
+    importer = Importer(db, user_id)
+    # Logs point at actions, so action ids are only tracked when logs come too
+    importer.keep_action_ids = any(kind == "logs" for kind, _ in opened)
+    try:
+        for kind, rows in opened:
+            if kind == "csv_all":
+                importer.read_csv_all(rows)
+            elif kind == "csv_session":
+                importer.read_csv_session(rows)
+            elif kind != "empty":
+                importer.read_dataset(kind, rows)
+        counts = importer.finish()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return counts, importer.library_uses
+
+def after_import(user_id: int, library_uses: Counter) -> None:
+    """Bring caches, counters and rollups derived from the imported rows up to date."""
+    from app import analytics, library_cache
+    from app.usage_counter import usage_counter
+
+    usage_counter.add_many(library_uses)
+    library_cache.invalidate_user(user_id)
+    analytics.backfill(user_id=user_id)
+
+def main(argv: list[str]) -> None:
+    if len(argv) < 2:
+        print(__doc__.strip())
+        sys.exit(2)
+    from app.database import SessionLocal
+    from app.usage_counter import usage_counter
+
+    email, paths = argv[0], argv[1:]
+    with SessionLocal() as db:
+        user_id = db.execute(select(User.user_id).where(User.email == email)).scalar()
+        if user_id is None:
+            print(f"No user with email {email}")
+            sys.exit(1)
+        streams = [open(path, "rb") for path in paths]
+        try:
+            counts, library_uses = import_files(db, user_id, streams)
+        finally:
+            for stream in streams:
+                stream.close()
+    after_import(user_id, library_uses)
+    usage_counter.flush()
+    print(", ".join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items()))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
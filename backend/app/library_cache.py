@@ -0,0 +1,220 @@
+"""
+Process-wide cache of the action library.
+
+Starter actions are shared by every user and cached once; each user's custom
+actions are cached as a separate overlay. The create/patch/delete library
+endpoints invalidate the overlay they change, and both parts expire after
+LIBRARY_CACHE_TTL_SECONDS so times_used ordering catches up on its own.
+
+Invalidations are also published on the events hub. With EVENTS_BACKEND=redis
+every worker drops the entry, so a library change is visible (and the ETag
+changes) on all of them at once. With the local backend only this process
+hears it; run one worker, or accept that other workers serve the old library
+for up to LIBRARY_CACHE_TTL_SECONDS.
+
+times_used in the response is the cached count plus the increments this
+process has not flushed yet (usage_counter), and the ETag covers those too,
+so a tap changes the ordering and ETag right away. After a flush the parts
+holding the flushed actions are dropped and reloaded with the new counts.
+Increments pending in other workers are not visible until they flush.
+"""
+from sqlalchemy import select
+from typing import Optional
+import hashlib
+import json
+import os
+
+from app import events
+from app.cache import TTLCache
+from app.models import ActionLibrary, GameSession
+from app.usage_counter import usage_counter
+
+LIBRARY_CACHE_TTL_SECONDS = int(os.getenv("LIBRARY_CACHE_TTL_SECONDS", "60"))
+LIBRARY_CACHE_SIZE = int(os.getenv("LIBRARY_CACHE_SIZE", "10000"))
+LIBRARY_CHANNEL = "library"
+
+_COLUMNS = (
+    ActionLibrary.library_id,
+    ActionLibrary.action_description,
+    ActionLibrary.default_user_movement,
+    ActionLibrary.default_llm_movement,
+    ActionLibrary.times_used,
+    ActionLibrary.user_created,
+)
+
+# Which user's overlay holds each cached custom action, to drop it on flush.
+# Entries live exactly as long as the overlay holding them: they go when it
+# is dropped, expires, is evicted or is replaced
+_overlay_owner: dict[int, int] = {}
+
+def _forget_overlay(user_id: int, overlay: "_Part") -> None:
+    for library_id in overlay.ids:
+        # Unless a newer overlay has claimed it since
+        if _overlay_owner.get(library_id) == user_id:
+            del _overlay_owner[library_id]
+
+_STARTER_KEY = "starter"
+_starter_cache = TTLCache(maxsize=1, ttl=LIBRARY_CACHE_TTL_SECONDS)
+_overlay_cache = TTLCache(maxsize=LIBRARY_CACHE_SIZE, ttl=LIBRARY_CACHE_TTL_SECONDS, on_evict=_forget_overlay)
+
+class _Part:
+    __slots__ = ("rows", "ids", "digest")
+
+    def __init__(self, rows):
+        self.rows = [
+            {**row, "times_used": row["times_used"] or 0, "user_created": bool(row["user_created"])}
+            for row in rows
+        ]
+        self.ids = frozenset(row["library_id"] for row in self.rows)
+        encoded = json.dumps(self.rows, sort_keys=True, default=str).encode("utf-8")
+        self.digest = hashlib.sha1(encoded).hexdigest()
+
+def starter_query():
+    return select(*_COLUMNS).where(ActionLibrary.user_created == False)
+
+def user_actions_query(user_id: int):
+    return select(*_COLUMNS).where(
+        ActionLibrary.user_created == True,
+        ActionLibrary.created_from_session_id.in_(
+            select(GameSession.session_id).where(GameSession.user_id == user_id)
+        )
+    )
+
+def _pending(starter: _Part, overlay: _Part) -> dict[int, int]:
+    return {
+        library_id: count for library_id, count in usage_counter.snapshot().items()
+        if library_id in starter.ids or library_id in overlay.ids
+    }
+
+def _etag(starter: _Part, overlay: _Part, pending: dict[int, int]) -> str:
+    key = starter.digest + overlay.digest + json.dumps(sorted(pending.items()))
+    return 'W/"' + hashlib.sha1(key.encode("ascii")).hexdigest()[:20] + '"'
+
+def _combine(starter: _Part, overlay: _Part) -> tuple[str, list[dict]]:
+    pending = _pending(starter, overlay)
+    rows = starter.rows + overlay.rows
+    if pending:
+        rows = [
+            {**row, "times_used": row["times_used"] + pending[row["library_id"]]} if row["library_id"] in pending else row
+            for row in rows
+        ]
+    rows.sort(key=_library_order)
+    return _etag(starter, overlay, pending), rows
+
+def _library_order(row: dict):
+    # Most used first, as the uncached endpoint ordered them
+    return (-row["times_used"], row["library_id"])
+
+def current_etag(user_id: int) -> Optional[str]:
+    """ETag of the user's library if it is fully cached, without touching the database."""
+    starter = _starter_cache.get(_STARTER_KEY)
+    overlay = _overlay_cache.get(user_id)
+    if starter is None or overlay is None:
+        return None
+    return _etag(starter, overlay, _pending(starter, overlay))
+
+def _set_overlay(user_id: int, overlay: _Part) -> None:
+    _overlay_cache.set(user_id, overlay)
+    _overlay_owner.update(dict.fromkeys(overlay.ids, user_id))
+
+def get_library(db, user_id: int) -> tuple[str, list[dict]]:
+    starter = _starter_cache.get(_STARTER_KEY)
+    if starter is None:
+        starter = _Part(db.execute(starter_query()).mappings().all())
+        _starter_cache.set(_STARTER_KEY, starter)
+    overlay = _overlay_cache.get(user_id)
+    if overlay is None:
+        overlay = _Part(db.execute(user_actions_query(user_id)).mappings().all())
+        _set_overlay(user_id, overlay)
+    return _combine(starter, overlay)
+
+async def get_library_async(db, user_id: int) -> tuple[str, list[dict]]:
+    starter = _starter_cache.get(_STARTER_KEY)
+    if starter is None:
+        starter = _Part((await db.execute(starter_query())).mappings().all())
+        _starter_cache.set(_STARTER_KEY, starter)
+    overlay = _overlay_cache.get(user_id)
+    if overlay is None:
+        overlay = _Part((await db.execute(user_actions_query(user_id))).mappings().all())
+        _set_overlay(user_id, overlay)
+    return _combine(starter, overlay)
+
+def _pick(library: list[dict], library_ids) -> tuple[list[dict], set[int]]:
+    chosen = set(library_ids)
+    picked = [row for row in library if row["library_id"] in chosen]
+    return picked, chosen.difference(row["library_id"] for row in picked)
+
+def _with_missing(picked: list[dict], missing_rows) -> list[dict]:
+    pending = usage_counter.snapshot()
+    extra = [
+        {**row, "times_used": row["times_used"] + pending.get(row["library_id"], 0)}
+        for row in _Part(missing_rows).rows
+    ]
+    return sorted(picked + extra, key=_library_order)
+
+def selected_actions(db, user_id: int, library_ids) -> list[dict]:
+    """
+    The given library actions in library order, as get_library returns them.
+
+    Any the user's cached library doesn't hold (another worker's new custom
+    action, not expired here yet) are read directly.
+    """
+    _, library = get_library(db, user_id)
+    picked, missing = _pick(library, library_ids)
+    if not missing:
+        return picked
+    return _with_missing(picked, db.execute(select(*_COLUMNS).where(ActionLibrary.library_id.in_(missing))).mappings().all())
+
+async def selected_actions_async(db, user_id: int, library_ids) -> list[dict]:
+    _, library = await get_library_async(db, user_id)
+    picked, missing = _pick(library, library_ids)
+    if not missing:
+        return picked
+    return _with_missing(picked, (await db.execute(select(*_COLUMNS).where(ActionLibrary.library_id.in_(missing)))).mappings().all())
+
+def _drop(scope: str, user_id: Optional[int] = None) -> None:
+    if scope == "user":
+        overlay = _overlay_cache.pop(user_id)
+        if overlay is not None:
+            _forget_overlay(user_id, overlay)
+    elif scope == "starter":
+        _starter_cache.pop(_STARTER_KEY)
+    else:
+        _starter_cache.clear()
+        _overlay_cache.clear()
+        _overlay_owner.clear()
+
+def _invalidate(scope: str, user_id: Optional[int] = None) -> None:
+    # Dropped here at once, so this worker's next read is fresh, then in every
+    # other worker when the message reaches them
+    _drop(scope, user_id)
+    events.hub.publish(LIBRARY_CHANNEL, json.dumps({"scope": scope, "user_id": user_id}))
+
+def _on_invalidation(message: str) -> None:
+    data = json.loads(message)
+    _drop(data["scope"], data.get("user_id"))
+
+events.hub.on_message(LIBRARY_CHANNEL, _on_invalidation)
+
+def invalidate_user(user_id: int) -> None:
+    _invalidate("user", user_id)
+
+def invalidate_starter() -> None:
+    _invalidate("starter")
+
+def invalidate_all() -> None:
+    _invalidate("all")
+
+def _counts_flushed(counts) -> None:
+    # The cached times_used no longer include these once they leave usage_counter.
+    # Pending counts are per process, so this isn't published to other workers
+    starter = _starter_cache.get(_STARTER_KEY)
+    if starter is not None and not starter.ids.isdisjoint(counts):
+        _drop("starter")
+    for user_id in {_overlay_owner.pop(library_id) for library_id in counts if library_id in _overlay_owner}:
+        _drop("user", user_id)
+
+usage_counter.on_flush(_counts_flushed)
+
+def library_cache_stats() -> dict:
+    return {"starter": _starter_cache.stats(), "overlays": _overlay_cache.stats()}
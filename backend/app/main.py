@@ -1,16 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, sessions, actions
-from app.database import engine
-from app.models import Base
+from app.api import auth, sessions, actions, analytics, exports, admin, sync
+from app.database import async_engine, DB_MODE, pool_stats
+from app import events, hashing, idempotency
+from app.compression import CompressionMiddleware
+from app.metrics import MetricsMiddleware, registry as metrics_registry
+from app.usage_counter import usage_counter
+from app.export_jobs import export_pool
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# The schema is managed by versioned migrations (python -m app.migrations),
+# run as a deploy step rather than on every process start
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    usage_counter.start()
+    export_pool.start()
+    idempotency.sweeper.start()
+    await events.hub.start()
+    yield
+    await events.hub.stop()
+    idempotency.sweeper.stop()
+    export_pool.stop()
+    # Flush buffered times_used increments before the process exits
+    usage_counter.stop()
+    hashing.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 app = FastAPI(
     title="Turn API",
     description="Reflection support game for LLM collaboration",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for frontend
@@ -20,12 +43,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Session-Version", "Idempotent-Replayed", "Server-Timing"],
 )
 
+# Compresses streamed exports chunk by chunk; see app/compression.py
+app.add_middleware(CompressionMiddleware)
+
+# Added last so it is outermost and times CORS handling too
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
-app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
-app.include_router(sessions.router, prefix="/api/sessions", tags=["sessions"])
-app.include_router(actions.router, prefix="/api/actions", tags=["actions"])
+auth_router, sessions_router, actions_router, analytics_router = auth.router, sessions.router, actions.router, analytics.router
+sync_router = sync.router
+if DB_MODE == "async":
+    from app.api.aio import overlay, auth as async_auth, sessions as async_sessions, actions as async_actions, analytics as async_analytics
+    from app.api.aio import sync as async_sync
+    auth_router = overlay(auth.router, async_auth.router)
+    sessions_router = overlay(sessions.router, async_sessions.router)
+    actions_router = overlay(actions.router, async_actions.router)
+    analytics_router = overlay(analytics.router, async_analytics.router)
+    sync_router = overlay(sync.router, async_sync.router)
+
+app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
+app.include_router(sessions_router, prefix="/api/sessions", tags=["sessions"])
+app.include_router(actions_router, prefix="/api/actions", tags=["actions"])
+app.include_router(analytics_router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(sync_router, prefix="/api/sync", tags=["sync"])
+app.include_router(exports.router, prefix="/api/exports", tags=["exports"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 @app.get("/")
 def root():
@@ -34,3 +79,13 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/health/pool")
+def pool_health():
+    # Checkout wait times and pool occupancy, for tuning DB_POOL_* settings
+    return pool_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text format: per-route latency, status codes, DB time and pool stats
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
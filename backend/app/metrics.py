@@ -0,0 +1,253 @@
+"""
+Request-level performance instrumentation.
+
+MetricsMiddleware times every HTTP request and records it per route template
+(/api/sessions/{session_id}, not the raw path) in a latency histogram and a
+status-code counter, alongside an in-flight gauge. SQLAlchemy cursor events
+on both engines count the queries each request runs and the time spent in
+them; the totals come back on the response as a Server-Timing header, so a
+slow endpoint or an N+1 pattern shows up in the browser's network panel.
+
+Everything is rendered in Prometheus text format on /metrics, together with
+the connection pool figures from database.pool_stats(). Counters live in this
+process only; scrape each worker.
+"""
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Optional
+import bisect
+import threading
+import time
+import os
+
+from sqlalchemy import event
+
+from app.database import async_engine, engine, pool_stats
+
+def _buckets(value: str) -> tuple[float, ...]:
+    return tuple(sorted(float(bound) for bound in value.split(",") if bound.strip()))
+
+METRICS_LATENCY_BUCKETS = _buckets(os.getenv(
+    "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10"
+))
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes", "on")
+
+UNMATCHED_ROUTE = "unmatched"
+
+class RequestStats:
+    """Queries run on behalf of the current request."""
+    __slots__ = ("scope", "queries", "db_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+
+# Sync handlers run on the threadpool with a copy of the request's context, so
+# the stats object is shared by reference and mutated in place
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+class Registry:
+    def __init__(self, buckets: tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._buckets = buckets
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.responses: defaultdict[tuple[str, str, int], int] = defaultdict(int)
+        self.route_queries: defaultdict[tuple[str, str], int] = defaultdict(int)
+        self.route_db_seconds: defaultdict[tuple[str, str], float] = defaultdict(float)
+        self.in_flight = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+
+    def started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(self._buckets)
+            histogram.observe(seconds)
+            self.responses[(method, route, status)] += 1
+            self.route_queries[key] += stats.queries
+            self.route_db_seconds[key] += stats.db_seconds
+
+    def query(self, seconds: float) -> None:
+        # Includes queries outside requests (export workers, usage flushes)
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+
+    def render(self) -> str:
+        with self._lock:
+            latency = {key: (list(h.counts), h.total) for key, h in self.latency.items()}
+            responses = dict(self.responses)
+            route_queries = dict(self.route_queries)
+            route_db_seconds = dict(self.route_db_seconds)
+            in_flight, queries, db_seconds = self.in_flight, self.queries, self.db_seconds
+
+        lines = []
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        family("http_request_duration_seconds", "histogram", "Request latency by route template")
+        for (method, route), (counts, total) in sorted(latency.items()):
+            labels = f'method="{method}",route="{_escape(route)}"'
+            cumulative = 0
+            for bound, count in zip(self._buckets, counts):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{_number(bound)}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {_number(total)}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        family("http_responses_total", "counter", "Responses by route template and status code")
+        for (method, route, status), count in sorted(responses.items()):
+            lines.append(f'http_responses_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+        family("http_requests_in_flight", "gauge", "Requests currently being served")
+        lines.append(f"http_requests_in_flight {in_flight}")
+
+        family("http_request_db_queries_total", "counter", "Database queries run while serving each route")
+        for (method, route), count in sorted(route_queries.items()):
+            lines.append(f'http_request_db_queries_total{{method="{method}",route="{_escape(route)}"}} {count}')
+
+        family("http_request_db_seconds_total", "counter", "Database time spent while serving each route")
+        for (method, route), seconds in sorted(route_db_seconds.items()):
+            lines.append(f'http_request_db_seconds_total{{method="{method}",route="{_escape(route)}"}} {_number(seconds)}')
+
+        family("db_queries_total", "counter", "Database queries run by this process")
+        lines.append(f"db_queries_total {queries}")
+        family("db_query_seconds_total", "counter", "Database time spent by this process")
+        lines.append(f"db_query_seconds_total {_number(db_seconds)}")
+
+        lines.extend(_pool_lines(pool_stats()))
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+_POOL_GAUGES = {
+    "size": "Configured pool size",
+    "checked_out": "Connections in use",
+    "checked_in": "Idle connections in the pool",
+    "overflow": "Connections beyond pool size (negative while the pool is still filling)",
+    "wait_seconds_max": "Longest wait for a connection",
+    "wait_seconds_p50": "Median wait for a connection (recent checkouts)",
+    "wait_seconds_p95": "95th percentile wait for a connection (recent checkouts)",
+    "wait_seconds_p99": "99th percentile wait for a connection (recent checkouts)",
+}
+_POOL_COUNTERS = {
+    "checkouts": "Connection checkouts",
+    "wait_seconds_total": "Time spent waiting for a connection",
+}
+
+def _pool_lines(stats: dict) -> list[str]:
+    lines = []
+    for kind, fields in (("gauge", _POOL_GAUGES), ("counter", _POOL_COUNTERS)):
+        for field, help_text in fields.items():
+            name = f"db_pool_{field}" + ("_total" if kind == "counter" and not field.endswith("_total") else "")
+            values = [(engine_name, entry[field]) for engine_name, entry in stats.items() if field in entry]
+            if not values:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for engine_name, value in values:
+                lines.append(f'{name}{{engine="{engine_name}"}} {_number(value)}')
+    return lines
+
+registry = Registry(METRICS_LATENCY_BUCKETS)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start"].pop()
+    registry.query(seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection is not None else None
+    if starts:
+        starts.pop()
+
+for _engine in (engine, async_engine.sync_engine if async_engine is not None else None):
+    if _engine is not None:
+        event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(_engine, "handle_error", _handle_error)
+
+def _route_template(scope) -> str:
+    # Newer FastAPI keeps the include prefix off the matched route and on the
+    # effective route context instead
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED_ROUTE
+
+def current_route() -> Optional[str]:
+    """Method and route template of the request being served, if any."""
+    stats = _current.get()
+    if stats is None:
+        return None
+    return f"{stats.scope['method']} {_route_template(stats.scope)}"
+
+def server_timing(stats: RequestStats, seconds: float) -> str:
+    return f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", app;dur={seconds * 1000:.1f}'
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses pass through unbuffered."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    # Measured when the headers go out; a streamed body's own
+                    # queries are still counted in /metrics
+                    header = server_timing(stats, time.perf_counter() - start).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        registry.started()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            registry.finished(scope["method"], _route_template(scope), status, time.perf_counter() - start, stats)
@@ -0,0 +1,75 @@
+"""
+Versioned schema migrations.
+
+Each module in app/migrations/versions defines a `revision` number, a
+`description` and an `upgrade(conn)` function. Applied revisions are recorded
+in the schema_migrations table, so running the migrations is an explicit,
+repeatable deploy step:
+
+    cd backend && python -m app.migrations
+"""
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, Text, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import func
+from types import ModuleType
+import importlib
+import pkgutil
+
+from app.database import engine as default_engine
+from app.migrations import versions
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("revision", Integer, primary_key=True),
+    Column("description", Text, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+# Arbitrary key so concurrent deploys on Postgres don't migrate twice
+_ADVISORY_LOCK_ID = 724_2001
+
+def load_migrations() -> list[ModuleType]:
+    modules = [
+        importlib.import_module(f"{versions.__name__}.{info.name}")
+        for info in pkgutil.iter_modules(versions.__path__)
+    ]
+    modules.sort(key=lambda module: module.revision)
+    revisions = [module.revision for module in modules]
+    if len(set(revisions)) != len(revisions):
+        raise RuntimeError(f"Duplicate migration revisions: {revisions}")
+    return modules
+
+def applied_revisions(engine: Engine = default_engine) -> set[int]:
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        return set(conn.scalars(select(schema_migrations.c.revision)))
+
+def current_revision(engine: Engine = default_engine) -> int:
+    return max(applied_revisions(engine), default=0)
+
+def upgrade(engine: Engine = default_engine, target: int = None) -> list[int]:
+    """Apply pending migrations in order, each in its own transaction."""
+    applied = []
+    with engine.connect() as lock_conn:
+        is_postgres = engine.dialect.name == "postgresql"
+        if is_postgres:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+            lock_conn.commit()
+        try:
+            done = applied_revisions(engine)
+            for migration in load_migrations():
+                if migration.revision in done or (target is not None and migration.revision > target):
+                    continue
+                with engine.begin() as conn:
+                    migration.upgrade(conn)
+                    conn.execute(schema_migrations.insert().values(
+                        revision=migration.revision,
+                        description=migration.description
+                    ))
+                applied.append(migration.revision)
+        finally:
+            if is_postgres:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _ADVISORY_LOCK_ID})
+                lock_conn.commit()
+    return applied
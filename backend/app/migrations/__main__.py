@@ -0,0 +1,24 @@
+"""
+Run schema migrations: python -m app.migrations [upgrade [REVISION] | current]
+"""
+import sys
+
+from app.migrations import current_revision, load_migrations, upgrade
+
+def main(argv: list[str]) -> None:
+    command = argv[0] if argv else "upgrade"
+    if command == "upgrade":
+        target = int(argv[1]) if len(argv) > 1 else None
+        applied = upgrade(target=target)
+        for migration in load_migrations():
+            if migration.revision in applied:
+                print(f"Applied {migration.revision:04d} {migration.description}")
+        print(f"Database at revision {current_revision()}")
+    elif command == "current":
+        print(current_revision())
+    else:
+        print(__doc__.strip())
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
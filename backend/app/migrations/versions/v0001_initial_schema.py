@@ -0,0 +1,68 @@
+"""
+Initial schema, frozen as it was before versioned migrations.
+
+Databases created by the old create_all-at-import already have these tables,
+so every table is created with checkfirst.
+"""
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text
+from sqlalchemy.sql import func
+
+revision = 1
+description = "initial schema"
+
+def upgrade(conn):
+    metadata = MetaData()
+    Table(
+        "users", metadata,
+        Column("user_id", Integer, primary_key=True, index=True),
+        Column("email", String, unique=True, index=True, nullable=False),
+        Column("hashed_password", String, nullable=False),
+        Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    )
+    Table(
+        "game_session", metadata,
+        Column("session_id", Integer, primary_key=True, index=True),
+        Column("user_id", Integer, ForeignKey("users.user_id"), nullable=False),
+        Column("session_name", Text, nullable=True),
+        Column("start_time", DateTime(timezone=True), server_default=func.now()),
+        Column("end_time", DateTime(timezone=True), nullable=True),
+        Column("status", Text, nullable=False),
+        Column("user_score", Integer),
+        Column("llm_score", Integer),
+        Column("reward_assigned", Text, nullable=True),
+    )
+    Table(
+        "action_library", metadata,
+        Column("library_id", Integer, primary_key=True, index=True),
+        Column("created_from_session_id", Integer, ForeignKey("game_session.session_id"), nullable=True),
+        Column("action_description", Text, nullable=False),
+        Column("default_user_movement", Integer, nullable=False),
+        Column("default_llm_movement", Integer, nullable=False),
+        Column("times_used", Integer),
+        Column("user_created", Boolean),
+    )
+    Table(
+        "tracked_actions", metadata,
+        Column("action_id", Integer, primary_key=True, index=True),
+        Column("library_id", Integer, ForeignKey("action_library.library_id"), nullable=True),
+        Column("session_id", Integer, ForeignKey("game_session.session_id"), nullable=False),
+        Column("action_description", Text, nullable=True),
+        Column("user_movement", Integer, nullable=False),
+        Column("llm_movement", Integer, nullable=False),
+        Column("timestamp", DateTime(timezone=True), server_default=func.now()),
+    )
+    Table(
+        "game_session_logs", metadata,
+        Column("log_id", Integer, primary_key=True, index=True),
+        Column("session_id", Integer, ForeignKey("game_session.session_id"), nullable=False),
+        Column("action_id", Integer, ForeignKey("tracked_actions.action_id"), nullable=False),
+        Column("timestamp", DateTime(timezone=True), server_default=func.now()),
+        Column("optional_note", Text, nullable=True),
+    )
+    Table(
+        "selected_actions", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("session_id", Integer, ForeignKey("game_session.session_id"), nullable=False),
+        Column("library_id", Integer, ForeignKey("action_library.library_id"), nullable=False),
+    )
+    metadata.create_all(conn, checkfirst=True)
@@ -0,0 +1,23 @@
+"""
+Indexes for the filters and sort orders used by the hot endpoints.
+"""
+from sqlalchemy import text
+
+revision = 2
+description = "indexes for session, action and log queries"
+
+INDEXES = [
+    # Session lists: filter by user (and status), newest first
+    ("ix_game_session_user_id_start_time", "game_session", "user_id, start_time"),
+    ("ix_game_session_user_id_status_start_time", "game_session", "user_id, status, start_time"),
+    # Per-session action and log listings in time order
+    ("ix_tracked_actions_session_id_timestamp", "tracked_actions", "session_id, timestamp"),
+    ("ix_game_session_logs_session_id_timestamp", "game_session_logs", "session_id, timestamp"),
+    ("ix_selected_actions_session_id", "selected_actions", "session_id"),
+    # Custom library actions are looked up through the session that created them
+    ("ix_action_library_created_from_session_id", "action_library", "created_from_session_id"),
+]
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
@@ -0,0 +1,23 @@
+"""
+Per user x day x library action rollup of tracked_actions, read by the
+analytics endpoints. Existing history is loaded with python -m app.analytics backfill.
+"""
+from sqlalchemy import Column, Date, ForeignKey, Integer, MetaData, Table
+
+revision = 3
+description = "user_action_daily analytics rollup"
+
+def upgrade(conn):
+    metadata = MetaData()
+    # Referenced by the foreign key below; not created here
+    Table("users", metadata, Column("user_id", Integer, primary_key=True))
+    Table(
+        "user_action_daily", metadata,
+        Column("user_id", Integer, ForeignKey("users.user_id"), primary_key=True),
+        Column("day", Date, primary_key=True),
+        Column("library_id", Integer, primary_key=True),
+        Column("action_count", Integer, nullable=False),
+        Column("user_movement_total", Integer, nullable=False),
+        Column("llm_movement_total", Integer, nullable=False),
+    )
+    metadata.tables["user_action_daily"].create(conn, checkfirst=True)
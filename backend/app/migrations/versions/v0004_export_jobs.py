@@ -0,0 +1,33 @@
+"""
+Background export jobs (app/export_jobs.py).
+"""
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text
+
+revision = 4
+description = "export_jobs table"
+
+def upgrade(conn):
+    metadata = MetaData()
+    # Referenced by the foreign key below; not created here
+    Table("users", metadata, Column("user_id", Integer, primary_key=True))
+    export_jobs = Table(
+        "export_jobs", metadata,
+        Column("job_id", String, primary_key=True),
+        Column("user_id", Integer, ForeignKey("users.user_id"), nullable=False),
+        Column("format", Text, nullable=False),
+        Column("dataset", Text, nullable=True),
+        Column("anonymize", Boolean, nullable=False),
+        Column("data_version", Text, nullable=False),
+        Column("status", Text, nullable=False),
+        Column("rows_written", Integer, nullable=False),
+        Column("rows_total", Integer, nullable=True),
+        Column("size_bytes", Integer, nullable=True),
+        Column("error", Text, nullable=True),
+        Column("created_at", DateTime(timezone=True), nullable=False),
+        Column("updated_at", DateTime(timezone=True), nullable=False),
+        Column("finished_at", DateTime(timezone=True), nullable=True),
+        Column("expires_at", DateTime(timezone=True), nullable=True),
+        Index("ix_export_jobs_user_id_created_at", "user_id", "created_at"),
+        Index("ix_export_jobs_expires_at", "expires_at"),
+    )
+    export_jobs.create(conn, checkfirst=True)
@@ -0,0 +1,33 @@
+"""
+Per-session version counters for conditional GETs and delta sync.
+
+game_session.version is bumped by every write to a session; each tracked
+action and log records the version its write produced. Existing rows start
+at version 1.
+"""
+from sqlalchemy import inspect, text
+
+revision = 5
+description = "session version counters"
+
+COLUMNS = [
+    ("game_session", "version"),
+    ("tracked_actions", "session_version"),
+    ("game_session_logs", "session_version"),
+]
+
+INDEXES = [
+    # ?since_version= delta queries
+    ("ix_tracked_actions_session_id_session_version", "tracked_actions", "session_id, session_version"),
+    ("ix_game_session_logs_session_id_session_version", "game_session_logs", "session_id, session_version"),
+]
+
+def upgrade(conn):
+    inspector = inspect(conn)
+    for table, column in COLUMNS:
+        if column in {c["name"] for c in inspector.get_columns(table)}:
+            # Databases created by create_all already have it
+            continue
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 1"))
+    for name, table, columns in INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
@@ -0,0 +1,24 @@
+"""
+Stored responses for Idempotency-Key retries (app/idempotency.py).
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text
+
+revision = 6
+description = "idempotency_keys table"
+
+def upgrade(conn):
+    metadata = MetaData()
+    # Referenced by the foreign key below; not created here
+    Table("users", metadata, Column("user_id", Integer, primary_key=True))
+    idempotency_keys = Table(
+        "idempotency_keys", metadata,
+        Column("user_id", Integer, ForeignKey("users.user_id"), primary_key=True),
+        Column("key", String, primary_key=True),
+        Column("fingerprint", String, nullable=False),
+        Column("status_code", Integer, nullable=False),
+        Column("response_body", Text, nullable=False),
+        Column("created_at", DateTime(timezone=True), nullable=False),
+        Column("expires_at", DateTime(timezone=True), nullable=False),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+    idempotency_keys.create(conn, checkfirst=True)
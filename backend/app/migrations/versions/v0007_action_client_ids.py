@@ -0,0 +1,17 @@
+"""
+Client-generated ids on tracked actions, so /api/sync can deduplicate
+actions that offline clients send more than once.
+"""
+from sqlalchemy import inspect, text
+
+revision = 7
+description = "tracked_actions.client_id"
+
+def upgrade(conn):
+    if "client_id" not in {c["name"] for c in inspect(conn).get_columns("tracked_actions")}:
+        conn.execute(text("ALTER TABLE tracked_actions ADD COLUMN client_id TEXT"))
+    # NULLs (actions tracked online) never collide
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_tracked_actions_session_id_client_id "
+        "ON tracked_actions (session_id, client_id)"
+    ))
@@ -0,0 +1,32 @@
+"""
+At most one queued or running export job per user and export, so two
+concurrent POST /api/exports requests can't both start the same job.
+"""
+from sqlalchemy import text
+
+revision = 8
+description = "unique active export job"
+
+# csv jobs have no dataset; coalesced so they collide like the others
+_KEY = "user_id, format, COALESCE(dataset, ''), anonymize, data_version"
+_ACTIVE = "status IN ('queued', 'running')"
+
+def upgrade(conn):
+    # Duplicates created before the index existed: keep the newest of each
+    conn.execute(text(f"""
+        UPDATE export_jobs
+        SET status = 'failed', error = 'Superseded by a duplicate export',
+            finished_at = CURRENT_TIMESTAMP, expires_at = CURRENT_TIMESTAMP
+        WHERE {_ACTIVE} AND EXISTS (
+            SELECT 1 FROM export_jobs AS newer
+            WHERE newer.status IN ('queued', 'running')
+              AND newer.user_id = export_jobs.user_id
+              AND newer.format = export_jobs.format
+              AND COALESCE(newer.dataset, '') = COALESCE(export_jobs.dataset, '')
+              AND newer.anonymize = export_jobs.anonymize
+              AND newer.data_version = export_jobs.data_version
+              AND (newer.created_at > export_jobs.created_at
+                   OR (newer.created_at = export_jobs.created_at AND newer.job_id > export_jobs.job_id))
+        )
+    """))
+    conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS ix_export_jobs_active ON export_jobs ({_KEY}) WHERE {_ACTIVE}"))
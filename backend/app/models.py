@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Boolean, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -16,6 +16,10 @@ class User(Base):
 
 class GameSession(Base):
     __tablename__ = "game_session"
+    __table_args__ = (
+        Index("ix_game_session_user_id_start_time", "user_id", "start_time"),
+        Index("ix_game_session_user_id_status_start_time", "user_id", "status", "start_time"),
+    )
 
     session_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
@@ -26,6 +30,7 @@ class GameSession(Base):
     user_score = Column(Integer, default=0)
     llm_score = Column(Integer, default=0)
     reward_assigned = Column(Text, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # bumped by every write
 
     # Relationships
     user = relationship("User", back_populates="game_sessions")
@@ -35,6 +40,9 @@ class GameSession(Base):
 
 class ActionLibrary(Base):
     __tablename__ = "action_library"
+    __table_args__ = (
+        Index("ix_action_library_created_from_session_id", "created_from_session_id"),
+    )
 
     library_id = Column(Integer, primary_key=True, index=True)
     created_from_session_id = Column(Integer, ForeignKey("game_session.session_id"), nullable=True)
@@ -50,6 +58,11 @@ class ActionLibrary(Base):
 
 class TrackedAction(Base):
     __tablename__ = "tracked_actions"
+    __table_args__ = (
+        Index("ix_tracked_actions_session_id_timestamp", "session_id", "timestamp"),
+        Index("ix_tracked_actions_session_id_session_version", "session_id", "session_version"),
+        Index("ix_tracked_actions_session_id_client_id", "session_id", "client_id", unique=True),
+    )
 
     action_id = Column(Integer, primary_key=True, index=True)
     library_id = Column(Integer, ForeignKey("action_library.library_id"), nullable=True)
@@ -58,6 +71,8 @@ class TrackedAction(Base):
     user_movement = Column(Integer, nullable=False)
     llm_movement = Column(Integer, nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    session_version = Column(Integer, nullable=False, default=1, server_default="1")  # session version this write produced
+    client_id = Column(String, nullable=True)  # set by offline clients through /api/sync
 
     # Relationships
     session = relationship("GameSession", back_populates="tracked_actions")
@@ -66,12 +81,17 @@ class TrackedAction(Base):
 
 class GameSessionLog(Base):
     __tablename__ = "game_session_logs"
+    __table_args__ = (
+        Index("ix_game_session_logs_session_id_timestamp", "session_id", "timestamp"),
+        Index("ix_game_session_logs_session_id_session_version", "session_id", "session_version"),
+    )
 
     log_id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("game_session.session_id"), nullable=False)
     action_id = Column(Integer, ForeignKey("tracked_actions.action_id"), nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     optional_note = Column(Text, nullable=True)
+    session_version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relationships
     session = relationship("GameSession", back_populates="logs")
@@ -79,6 +99,9 @@ class GameSessionLog(Base):
 
 class SelectedAction(Base):
     __tablename__ = "selected_actions"
+    __table_args__ = (
+        Index("ix_selected_actions_session_id", "session_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("game_session.session_id"), nullable=False)
@@ -87,3 +110,59 @@ class SelectedAction(Base):
     # Relationships
     session = relationship("GameSession", back_populates="selected_actions")
     library_action = relationship("ActionLibrary")
+
+class UserActionDaily(Base):
+    """Per user x UTC day x library action rollup of tracked_actions."""
+    __tablename__ = "user_action_daily"
+
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    library_id = Column(Integer, primary_key=True)  # 0 for free-text actions
+    action_count = Column(Integer, nullable=False, default=0)
+    user_movement_total = Column(Integer, nullable=False, default=0)
+    llm_movement_total = Column(Integer, nullable=False, default=0)
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+    __table_args__ = (
+        Index("ix_export_jobs_user_id_created_at", "user_id", "created_at"),
+        Index("ix_export_jobs_expires_at", "expires_at"),
+        # One queued or running job per export (migration 8)
+        Index(
+            "ix_export_jobs_active", "user_id", "format", text("COALESCE(dataset, '')"), "anonymize", "data_version",
+            unique=True,
+            sqlite_where=text("status IN ('queued', 'running')"),
+            postgresql_where=text("status IN ('queued', 'running')")
+        ),
+    )
+
+    job_id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    format = Column(Text, nullable=False)  # csv, jsonl, arrow, parquet
+    dataset = Column(Text, nullable=True)  # sessions, actions, logs; NULL for csv
+    anonymize = Column(Boolean, nullable=False, default=False)
+    data_version = Column(Text, nullable=False)
+    status = Column(Text, nullable=False, default="queued")  # queued, running, done, failed
+    rows_written = Column(Integer, nullable=False, default=0)
+    rows_total = Column(Integer, nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+
+class IdempotencyKey(Base):
+    """Stored response for a write sent with an Idempotency-Key (app/idempotency.py)."""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)  # endpoint and request body hash
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,112 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A page is fetched with `WHERE (sort, id) > (last_sort, last_id) ORDER BY sort,
+id LIMIT n`, which an index on (..., sort) serves in constant time however deep
+the client pages. The cursor handed back in the X-Next-Cursor header is an
+opaque encoding of the last row's (sort, id). Lists are paged by default:
+without `limit` a request gets DEFAULT_PAGE_SIZE rows.
+"""
+from datetime import datetime, timezone
+from fastapi import HTTPException, status
+from sqlalchemy import String, and_, cast, literal, or_
+from typing import Optional
+import base64
+import json
+import os
+
+from app.database import IS_SQLITE
+from app.models import GameSession, GameSessionLog, TrackedAction
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+DEFAULT_PAGE_SIZE = min(int(os.getenv("DEFAULT_PAGE_SIZE", "50")), MAX_PAGE_SIZE)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode(sort_value, id_value) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, id_value], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, id_value = json.loads(raw)
+        if not isinstance(sort_value, str) or not isinstance(id_value, int):
+            raise ValueError(cursor)
+        return sort_value, id_value
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def time_bound(column, value: datetime):
+    """Bind a datetime for comparison against a stored timestamp column."""
+    if not IS_SQLITE:
+        return literal(value, column.type)
+    # SQLite compares the stored text; func.now() rows have no fractional part,
+    # so a whole-second bound must not carry one either
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return literal(value.isoformat(sep=" ", timespec="seconds" if not value.microsecond else "microseconds"), String)
+
+class Keyset:
+    def __init__(self, sort_column, id_column, descending: bool = False):
+        self.sort_column = sort_column
+        self.id_column = id_column
+        self.descending = descending
+
+    def _sort_value_column(self):
+        # On SQLite the cursor keeps the exact stored text so equal timestamps
+        # compare equal regardless of how they were written
+        if IS_SQLITE:
+            return cast(self.sort_column, String)
+        return self.sort_column
+
+    def _after(self, cursor: str):
+        sort_value, id_value = _decode(cursor)
+        if IS_SQLITE:
+            bound = literal(sort_value, String)
+        else:
+            try:
+                bound = literal(datetime.fromisoformat(sort_value), self.sort_column.type)
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        if self.descending:
+            return or_(self.sort_column < bound, and_(self.sort_column == bound, self.id_column < id_value))
+        return or_(self.sort_column > bound, and_(self.sort_column == bound, self.id_column > id_value))
+
+    def apply(self, query, cursor: Optional[str], limit: Optional[int]):
+        query = query.add_columns(self._sort_value_column().label("cursor_sort"))
+        if cursor:
+            query = query.where(self._after(cursor))
+        if self.descending:
+            query = query.order_by(self.sort_column.desc(), self.id_column.desc())
+        else:
+            query = query.order_by(self.sort_column.asc(), self.id_column.asc())
+        if limit:
+            # One extra row tells us whether there is a next page
+            query = query.limit(limit + 1)
+        return query
+
+    def page(self, rows, limit: Optional[int]) -> tuple[list[tuple], Optional[str]]:
+        """Column tuples (without cursor_sort) and the cursor for the next page.
+
+        The query must select plain columns, including the id column.
+        """
+        rows = list(rows)
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = _encode(last.cursor_sort, getattr(last, self.id_column.key))
+        return [tuple(row)[:-1] for row in rows], next_cursor
+
+def next_cursor_headers(next_cursor: Optional[str]) -> dict:
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+# Orderings used by the paginated list endpoints; each is backed by an index
+SESSIONS_KEYSET = Keyset(GameSession.start_time, GameSession.session_id, descending=True)
+ACTIONS_KEYSET = Keyset(TrackedAction.timestamp, TrackedAction.action_id)
+LOGS_KEYSET = Keyset(GameSessionLog.timestamp, GameSessionLog.log_id)
@@ -0,0 +1,227 @@
+"""
+Research exports: one flat table per file, as JSON Lines or compressed Arrow
+IPC / Parquet, for loading straight into notebooks.
+
+Rows are fetched EXPORT_YIELD_PER at a time from the database cursor and each
+chunk is encoded and handed to the client before the next one is read, so an
+export runs in constant memory however large it gets. With anonymize on,
+user and session ids are replaced by keyed hashes (stable across exports, so
+tables still join) and free text (session names, notes, custom action
+descriptions) is dropped.
+
+Arrow and Parquet need pyarrow (pip install -e ".[research]").
+"""
+from datetime import datetime
+from sqlalchemy import func, select
+from typing import Iterator, Optional
+import hashlib
+import hmac
+import io
+import json
+import os
+
+from app.auth import SECRET_KEY
+from app.database import SessionLocal
+from app.export import EXPORT_YIELD_PER, action_counts_subquery
+from app.models import ActionLibrary, GameSession, GameSessionLog, TrackedAction
+
+def _anonymize_key() -> bytes:
+    key = os.getenv("EXPORT_ANONYMIZE_KEY")
+    if key:
+        return key.encode("utf-8")
+    # Derived under a fixed label, so the JWT signing key is never used directly
+    return hmac.new(SECRET_KEY.encode("utf-8"), b"turn research export pseudonyms", hashlib.sha256).digest()
+
+EXPORT_ANONYMIZE_KEY = _anonymize_key()
+EXPORT_COMPRESSION = os.getenv("EXPORT_COMPRESSION", "zstd")
+
+DATASETS = ("sessions", "actions", "logs")
+FORMATS = ("jsonl", "arrow", "parquet")
+
+MEDIA_TYPES = {
+    "jsonl": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXTENSIONS = {"jsonl": "jsonl", "arrow": "arrows", "parquet": "parquet"}
+
+# Column kinds: "id" columns are hashed and "text" columns dropped when anonymizing
+_COLUMNS = {
+    "sessions": [
+        ("session_id", "id"), ("user_id", "id"), ("session_name", "text"),
+        ("start_time", "timestamp"), ("end_time", "timestamp"), ("status", "str"),
+        ("user_score", "int"), ("llm_score", "int"), ("action_count", "int"),
+    ],
+    "actions": [
+        ("action_id", "int"), ("session_id", "id"), ("user_id", "id"), ("timestamp", "timestamp"),
+        ("library_id", "int"), ("action_description", "text"), ("user_created", "bool"),
+        ("user_movement", "int"), ("llm_movement", "int"),
+    ],
+    "logs": [
+        ("log_id", "int"), ("session_id", "id"), ("user_id", "id"), ("action_id", "int"),
+        ("timestamp", "timestamp"), ("optional_note", "text"),
+    ],
+}
+
+def _query(dataset: str, user_id: int, session_id: Optional[int]):
+    criteria = [GameSession.user_id == user_id]
+    if session_id is not None:
+        criteria.append(GameSession.session_id == session_id)
+
+    if dataset == "sessions":
+        action_counts = action_counts_subquery(*criteria)
+        query = (
+            select(
+                GameSession.session_id, GameSession.user_id, GameSession.session_name,
+                GameSession.start_time, GameSession.end_time, GameSession.status,
+                GameSession.user_score, GameSession.llm_score,
+                func.coalesce(action_counts.c.action_count, 0)
+            )
+            .outerjoin(action_counts, action_counts.c.session_id == GameSession.session_id)
+            .order_by(GameSession.start_time, GameSession.session_id)
+        )
+    elif dataset == "actions":
+        # Starter descriptions are shared text; user-created ones are the user's own words
+        query = (
+            select(
+                TrackedAction.action_id, TrackedAction.session_id, GameSession.user_id, TrackedAction.timestamp,
+                TrackedAction.library_id,
+                func.coalesce(ActionLibrary.action_description, TrackedAction.action_description),
+                func.coalesce(ActionLibrary.user_created, TrackedAction.library_id.is_(None)),
+                TrackedAction.user_movement, TrackedAction.llm_movement
+            )
+            .join(GameSession, GameSession.session_id == TrackedAction.session_id)
+            .outerjoin(ActionLibrary, ActionLibrary.library_id == TrackedAction.library_id)
+            .order_by(TrackedAction.session_id, TrackedAction.timestamp, TrackedAction.action_id)
+        )
+    else:
+        query = (
+            select(
+                GameSessionLog.log_id, GameSessionLog.session_id, GameSession.user_id, GameSessionLog.action_id,
+                GameSessionLog.timestamp, GameSessionLog.optional_note
+            )
+            .join(GameSession, GameSession.session_id == GameSessionLog.session_id)
+            .order_by(GameSessionLog.session_id, GameSessionLog.timestamp, GameSessionLog.log_id)
+        )
+
+    return query.where(*criteria).execution_options(yield_per=EXPORT_YIELD_PER)
+
+def count_query(dataset: str, user_id: int, session_id: Optional[int] = None):
+    return select(func.count()).select_from(_query(dataset, user_id, session_id).order_by(None).subquery())
+
+def pseudonymize(name: str, value: int) -> str:
+    # The column name keeps user and session ids in separate pseudonym spaces
+    return hmac.new(EXPORT_ANONYMIZE_KEY, f"{name}:{value}".encode("ascii"), hashlib.sha256).hexdigest()[:16]
+
+def _anonymizer(dataset: str):
+    columns = _COLUMNS[dataset]
+    id_positions = [(i, name) for i, (name, kind) in enumerate(columns) if kind == "id"]
+    text_positions = [i for i, (_, kind) in enumerate(columns) if kind == "text"]
+    user_created = next((i for i, (name, _) in enumerate(columns) if name == "user_created"), None)
+
+    def anonymize(row) -> list:
+        row = list(row)
+        for i, name in id_positions:
+            row[i] = pseudonymize(name, row[i])
+        # Starter action descriptions are kept; anything the user wrote is not
+        if user_created is None or row[user_created]:
+            for i in text_positions:
+                row[i] = None
+        return row
+    return anonymize
+
+def iter_chunks(dataset: str, user_id: int, session_id: Optional[int], anonymize: bool) -> Iterator[list]:
+    """Yield lists of up to EXPORT_YIELD_PER rows, anonymized if asked."""
+    # The export outlives the request's dependency-scoped session, so it owns one
+    db = SessionLocal()
+    try:
+        transform = _anonymizer(dataset) if anonymize else list
+        for partition in db.execute(_query(dataset, user_id, session_id)).partitions():
+            yield [transform(row) for row in partition]
+    finally:
+        db.close()
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+def encode_jsonl(dataset: str, chunks: Iterator[list]) -> Iterator[str]:
+    names = [name for name, _ in _COLUMNS[dataset]]
+    dumps = json.JSONEncoder(default=_json_default, separators=(",", ":")).encode
+    for chunk in chunks:
+        yield "".join(dumps(dict(zip(names, row))) + "\n" for row in chunk)
+
+def has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class _DrainSink(io.RawIOBase):
+    """Write target that hands back whatever has been written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _arrow_schema(dataset: str, anonymize: bool):
+    import pyarrow as pa
+
+    types = {
+        "int": pa.int64(),
+        "str": pa.string(),
+        "text": pa.string(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "id": pa.string() if anonymize else pa.int64(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in _COLUMNS[dataset]])
+
+def encode_columnar(dataset: str, chunks: Iterator[list], fmt: str, anonymize: bool) -> Iterator[bytes]:
+    """Encode each chunk as an Arrow record batch (IPC stream) or Parquet row group."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(dataset, anonymize)
+    sink = _DrainSink()
+    stream = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(stream, schema, compression=EXPORT_COMPRESSION)
+        write = writer.write_table
+        to_batch = pa.Table.from_arrays
+    else:
+        writer = pa.ipc.new_stream(stream, schema, options=pa.ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION))
+        write = writer.write_batch
+        to_batch = pa.RecordBatch.from_arrays
+
+    try:
+        for chunk in chunks:
+            columns = list(zip(*chunk)) if chunk else [[] for _ in schema]
+            write(to_batch([pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def encode(dataset: str, fmt: str, chunks: Iterator[list], anonymize: bool):
+    if fmt == "jsonl":
+        return encode_jsonl(dataset, chunks)
+    return encode_columnar(dataset, chunks, fmt, anonymize)
+
+def stream_export(dataset: str, fmt: str, user_id: int, session_id: Optional[int] = None, anonymize: bool = True):
+    return encode(dataset, fmt, iter_chunks(dataset, user_id, session_id, anonymize), anonymize)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from datetime import date, datetime
+from typing import Literal, Optional, Union
 
 # User schemas
 class UserCreate(BaseModel):
@@ -42,6 +42,7 @@ class GameSessionResponse(BaseModel):
     user_score: int
     llm_score: int
     reward_assigned: Optional[str]
+    version: int
 
     class Config:
         from_attributes = True
@@ -80,6 +81,8 @@ class TrackedActionResponse(BaseModel):
     user_movement: int
     llm_movement: int
     timestamp: datetime
+    session_version: int
+    client_id: Optional[str]
 
     class Config:
         from_attributes = True
@@ -96,6 +99,135 @@ class GameSessionLogResponse(BaseModel):
     action_id: int
     timestamp: datetime
     optional_note: Optional[str]
+    session_version: int
 
     class Config:
         from_attributes = True
+
+# Everything the session page needs on load, in one response
+class SessionStateResponse(BaseModel):
+    session: GameSessionResponse
+    selected_action_ids: list[int]
+    library_actions: list[ActionLibraryResponse]
+    tracked_actions: list[TrackedActionResponse]
+    logs: list[GameSessionLogResponse]
+
+# Offline sync schemas
+class SyncAction(BaseModel):
+    client_id: str = Field(min_length=1, max_length=64)
+    library_id: Optional[int] = None
+    action_description: Optional[str] = None
+    user_movement: int
+    llm_movement: int
+    timestamp: datetime
+
+class SyncRequest(BaseModel):
+    session_id: int
+    since_version: Optional[int] = Field(None, ge=0)
+    actions: list[SyncAction] = []
+
+class SyncResponse(BaseModel):
+    session: GameSessionResponse
+    applied: list[str]
+    actions: list[TrackedActionResponse]
+    logs: list[GameSessionLogResponse]
+
+# Analytics schemas, read from the user_action_daily rollup
+class AnalyticsTotals(BaseModel):
+    action_count: int
+    user_movement: int
+    llm_movement: int
+
+class AnalyticsOverallTotals(AnalyticsTotals):
+    active_days: int
+
+class AnalyticsDay(AnalyticsTotals):
+    day: date
+
+class AnalyticsAction(AnalyticsTotals):
+    library_id: Optional[int]  # None groups all free-text actions
+    action_description: Optional[str]
+
+class AnalyticsSummaryResponse(BaseModel):
+    since: date
+    totals: AnalyticsOverallTotals
+    days: list[AnalyticsDay]
+    top_actions: list[AnalyticsAction]
+
+# Trajectory analytics schemas
+class TrajectoryPoint(BaseModel):
+    timestamp: datetime
+    user_control: int
+    llm_control: int
+    net_balance: int
+    rolling_net: float
+
+class TrajectoryResponse(BaseModel):
+    action_count: int
+    window: int
+    points: list[TrajectoryPoint]
+
+class ActionContribution(BaseModel):
+    library_id: Optional[int]  # None groups all free-text actions
+    action_description: Optional[str]
+    action_count: int
+    user_movement: int
+    llm_movement: int
+    share: float
+
+class SessionDelta(BaseModel):
+    session_id: int
+    started_at: datetime
+    action_count: int
+    user_movement: int
+    llm_movement: int
+    net_balance: int
+    net_delta: Optional[int]  # None for the first session
+
+# Export job schemas
+class ExportJobCreate(BaseModel):
+    format: Literal["csv", "jsonl", "arrow", "parquet"] = "csv"
+    dataset: Optional[Literal["sessions", "actions", "logs"]] = None  # required except for csv
+    anonymize: bool = True  # research formats only
+
+class ExportJobResponse(BaseModel):
+    job_id: str
+    format: str
+    dataset: Optional[str]
+    anonymize: bool
+    status: str  # queued, running, done, failed
+    rows_written: int
+    rows_total: Optional[int]
+    size_bytes: Optional[int]
+    error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+    expires_at: Optional[datetime]
+    download_url: Optional[str] = None
+
+# Rows written by an import
+class ImportResponse(BaseModel):
+    sessions: int
+    actions: int
+    logs: int
+    library_actions: int
+
+# Slow-query log samples
+class SlowQuerySample(BaseModel):
+    id: int
+    recorded_at: datetime
+    duration_ms: float
+    route: Optional[str]  # "METHOD /route/{template}", None outside a request
+    engine: str  # sync or async
+    dialect: str
+    statement: str
+    parameters: Union[dict, list]
+    plan: Optional[list[str]]  # None when not captured (rate-limited or not explainable)
+    plan_error: Optional[str]
+
+class SlowQueryLogResponse(BaseModel):
+    enabled: bool
+    threshold_ms: float
+    sample_rate: float
+    recorded: int  # since the process started, including samples since evicted
+    samples: list[SlowQuerySample]
@@ -0,0 +1,184 @@
+"""
+Opt-in slow-query log (SLOW_QUERY_LOG=true).
+
+Cursor events on both engines time each statement. Any that runs longer than
+SLOW_QUERY_THRESHOLD_MS is kept, with its parameters, the route that issued it
+and its query plan, in a ring buffer of the last SLOW_QUERY_BUFFER_SIZE
+samples, served by GET /api/admin/slow-queries.
+
+The plan is read right after the statement, on the same connection and with
+the same parameters: EXPLAIN on Postgres, EXPLAIN QUERY PLAN on SQLite.
+Neither executes the statement. Both run on a raw DBAPI cursor, so they don't
+fire these events or show up in /metrics. On Postgres the EXPLAIN is wrapped
+in a savepoint: a failing EXPLAIN would otherwise abort the request's
+transaction.
+
+SLOW_QUERY_SAMPLE_RATE times only that fraction of statements. Unsampled
+statements cost one random() call, so the log can stay on in production at a
+low rate. SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS limits how often a plan is
+captured, so a burst of slow queries doesn't double the load on a database
+that is already struggling.
+"""
+from collections import deque
+from datetime import datetime
+from typing import Optional
+import random
+import threading
+import time
+import os
+
+from sqlalchemy import event
+
+from app.database import async_engine, engine
+from app.metrics import current_route
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+SLOW_QUERY_LOG = _env_flag("SLOW_QUERY_LOG", "false")
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200"))
+SLOW_QUERY_EXPLAIN = _env_flag("SLOW_QUERY_EXPLAIN", "true")
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "1"))
+# Long parameter values (e.g. bulk IN lists) are cut to this many characters
+SLOW_QUERY_PARAM_LENGTH = 200
+
+# Only these can be explained without side effects; DDL, PRAGMA and
+# transaction control are recorded without a plan
+_EXPLAINABLE = ("select", "insert", "update", "delete", "with")
+
+class SlowQueryLog:
+    def __init__(self, size: int):
+        self._lock = threading.Lock()
+        self._samples: deque = deque(maxlen=size)
+        self._next_explain = 0.0
+        self.recorded = 0
+
+    def add(self, sample: dict) -> None:
+        with self._lock:
+            self.recorded += 1
+            sample["id"] = self.recorded
+            self._samples.append(sample)
+
+    def claim_explain(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_explain:
+                return False
+            self._next_explain = now + SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+            return True
+
+    def samples(self) -> list[dict]:
+        """Newest first."""
+        with self._lock:
+            return list(reversed(self._samples))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_BUFFER_SIZE)
+
+def _shorten(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return (value if isinstance(value, str) else repr(value))[:SLOW_QUERY_PARAM_LENGTH]
+
+def _parameters(parameters, executemany: bool):
+    if executemany:
+        # One row's worth shows the shape; the rest only add bulk
+        return {"rows": len(parameters), "first": _parameters(parameters[0], False) if parameters else None}
+    if isinstance(parameters, dict):
+        return {key: _shorten(value) for key, value in parameters.items()}
+    return [_shorten(value) for value in parameters or ()]
+
+def explain(conn, statement: str, parameters) -> list[str]:
+    """The statement's plan, one line per row, read on a raw DBAPI cursor."""
+    postgres = conn.dialect.name == "postgresql"
+    dbapi_connection = conn.connection.dbapi_connection
+    cursor = dbapi_connection.cursor()
+    try:
+        if not postgres or getattr(dbapi_connection, "autocommit", False):
+            # Nothing to protect: SQLite errors don't abort the transaction,
+            # and in autocommit mode there is no transaction
+            cursor.execute(("EXPLAIN " if postgres else "EXPLAIN QUERY PLAN ") + statement, parameters)
+            rows = cursor.fetchall()
+        else:
+            # Any error inside a Postgres transaction aborts it; rolling back to
+            # the savepoint leaves the request's own work usable
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute("EXPLAIN " + statement, parameters)
+                rows = cursor.fetchall()
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+            finally:
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    finally:
+        cursor.close()
+    if postgres:
+        return [row[0] for row in rows]
+    # SQLite rows are (id, parent, notused, detail); indent children under parents
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sampled = SLOW_QUERY_SAMPLE_RATE >= 1.0 or random.random() < SLOW_QUERY_SAMPLE_RATE
+    conn.info.setdefault("slow_query_start", []).append(time.perf_counter() if sampled else None)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["slow_query_start"].pop()
+    if start is None:
+        return
+    duration_ms = (time.perf_counter() - start) * 1000
+    if duration_ms < SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    plan, plan_error = None, None
+    explainable = not executemany and statement.lstrip().split(None, 1)[0].lower() in _EXPLAINABLE
+    if SLOW_QUERY_EXPLAIN and explainable and slow_query_log.claim_explain():
+        try:
+            plan = explain(conn, statement, parameters)
+        except Exception as exc:
+            plan_error = str(exc)[:500]
+
+    slow_query_log.add({
+        "recorded_at": datetime.utcnow(),
+        "duration_ms": round(duration_ms, 3),
+        "route": current_route(),
+        "engine": "async" if conn.engine is not engine else "sync",
+        "dialect": conn.dialect.name,
+        "statement": statement,
+        "parameters": _parameters(parameters, executemany),
+        "plan": plan,
+        "plan_error": plan_error,
+    })
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("slow_query_start") if exception_context.connection is not None else None
+    if starts:
+        starts.pop()
+
+def install() -> None:
+    for target in (engine, async_engine.sync_engine if async_engine is not None else None):
+        if target is not None and not event.contains(target, "after_cursor_execute", _after_cursor_execute):
+            event.listen(target, "before_cursor_execute", _before_cursor_execute)
+            event.listen(target, "after_cursor_execute", _after_cursor_execute)
+            event.listen(target, "handle_error", _handle_error)
+
+# Nothing is hooked (and nothing costs anything) unless the log is switched on
+if SLOW_QUERY_LOG:
+    install()
+
+def query_samples(route: Optional[str] = None, min_duration_ms: float = 0.0, limit: Optional[int] = None) -> list[dict]:
+    samples = [
+        sample for sample in slow_query_log.samples()
+        if sample["duration_ms"] >= min_duration_ms and (route is None or sample["route"] == route)
+    ]
+    return samples[:limit] if limit is not None else samples
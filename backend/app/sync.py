@@ -0,0 +1,93 @@
+"""
+Offline-first sync for the session page.
+
+The client records taps locally, each with a client-generated id and the
+time it happened, and sends its queue to POST /api/sync every few seconds
+(or when it comes back online). One sync request:
+
+1. drops actions whose client_id is already stored for the session, so
+   resending a queue after a lost response is harmless
+2. stores the rest in one transaction, as one session version, keeping the
+   client timestamps (clamped to the server clock, since a device clock
+   running fast would otherwise put actions in the future)
+3. returns the session and every action and log written after the client's
+   since_version, including the ones just stored
+
+The session's version in the response is the cursor for the next sync.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import select
+from typing import Iterable, Optional
+import os
+
+from app.fastjson import columns, rows_to_dicts
+from app.models import GameSession, GameSessionLog, TrackedAction
+from app.schemas import GameSessionLogResponse, GameSessionResponse, SyncAction, TrackedActionResponse
+
+SYNC_MAX_ACTIONS = int(os.getenv("SYNC_MAX_ACTIONS", "1000"))
+
+def _utc(value: datetime, now: datetime) -> datetime:
+    # Stored timestamps are naive UTC; clients without an offset are taken as UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(value, now)
+
+def prepare(actions: Iterable[SyncAction], now: datetime) -> list[SyncAction]:
+    """First occurrence of each client_id, with its timestamp normalized."""
+    seen = set()
+    prepared = []
+    for action in actions:
+        if action.client_id in seen:
+            continue
+        seen.add(action.client_id)
+        prepared.append(action.model_copy(update={"timestamp": _utc(action.timestamp, now)}))
+    return prepared
+
+def stored_client_ids(session_id: int, actions: list[SyncAction]):
+    return select(TrackedAction.client_id).where(
+        TrackedAction.session_id == session_id,
+        TrackedAction.client_id.in_([action.client_id for action in actions])
+    )
+
+def unstored(actions: list[SyncAction], stored: Iterable[str]) -> list[SyncAction]:
+    stored = set(stored)
+    return [action for action in actions if action.client_id not in stored]
+
+def action_rows(session_id: int, actions: list[SyncAction], version: int) -> list[dict]:
+    return [
+        {
+            "session_id": session_id,
+            "library_id": action.library_id,
+            "action_description": action.action_description,
+            "user_movement": action.user_movement,
+            "llm_movement": action.llm_movement,
+            "timestamp": action.timestamp,
+            "session_version": version,
+            "client_id": action.client_id
+        }
+        for action in actions
+    ]
+
+def session_query(session_id: int):
+    return select(*columns(GameSession, GameSessionResponse)).where(GameSession.session_id == session_id)
+
+def actions_query(session_id: int, since_version: Optional[int]):
+    query = select(*columns(TrackedAction, TrackedActionResponse)).where(TrackedAction.session_id == session_id)
+    if since_version is not None:
+        query = query.where(TrackedAction.session_version > since_version)
+    return query.order_by(TrackedAction.timestamp, TrackedAction.action_id)
+
+def logs_query(session_id: int, since_version: Optional[int]):
+    query = select(*columns(GameSessionLog, GameSessionLogResponse)).where(GameSessionLog.session_id == session_id)
+    if since_version is not None:
+        query = query.where(GameSessionLog.session_version > since_version)
+    return query.order_by(GameSessionLog.timestamp, GameSessionLog.log_id)
+
+def response_body(session_row, applied: list[SyncAction], actions: Iterable, logs: Iterable) -> dict:
+    """SyncResponse as plain data for FastJSONResponse."""
+    return {
+        "session": rows_to_dicts(GameSessionResponse, [session_row])[0],
+        "applied": [action.client_id for action in applied],
+        "actions": rows_to_dicts(TrackedActionResponse, actions),
+        "logs": rows_to_dicts(GameSessionLogResponse, logs),
+    }
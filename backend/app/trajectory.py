@@ -0,0 +1,198 @@
+"""
+Vectorized control-trajectory analytics.
+
+A user's (or one session's) tracked actions are read in one query straight
+into NumPy columns: epoch timestamps, session_id, library_id, user_movement
+and llm_movement, in time order. Trajectories, rolling windows, per-action
+shares and session-to-session deltas are then whole-array operations
+(cumsum, bincount, unique) rather than Python loops over ORM objects, which
+keeps histories of hundreds of thousands of actions interactive.
+
+The entry points take a blocking Session; async handlers call them through
+AsyncSession.run_sync.
+"""
+from datetime import datetime, timezone
+from itertools import chain
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.orm import Session
+from typing import Optional
+import numpy as np
+import os
+
+from app.models import ActionLibrary, GameSession, TrackedAction
+
+TRAJECTORY_DEFAULT_POINTS = int(os.getenv("TRAJECTORY_DEFAULT_POINTS", "500"))
+TRAJECTORY_MAX_POINTS = int(os.getenv("TRAJECTORY_MAX_POINTS", "5000"))
+TRAJECTORY_DEFAULT_WINDOW = int(os.getenv("TRAJECTORY_DEFAULT_WINDOW", "20"))
+TRAJECTORY_MAX_WINDOW = int(os.getenv("TRAJECTORY_MAX_WINDOW", "10000"))
+
+_CUSTOM_ACTION_ID = 0
+
+class ActionHistory:
+    __slots__ = ("timestamps", "session_ids", "library_ids", "user_movement", "llm_movement")
+
+    def __init__(self, columns: np.ndarray):
+        self.timestamps = columns[:, 0]
+        self.session_ids = columns[:, 1].astype(np.int64)
+        self.library_ids = columns[:, 2].astype(np.int64)
+        self.user_movement = columns[:, 3].astype(np.int64)
+        self.llm_movement = columns[:, 4].astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+def _epoch_seconds(column, dialect_name: str):
+    if dialect_name == "postgresql":
+        return cast(func.extract("epoch", column), Float)
+    # julianday() of the Unix epoch is 2440587.5
+    return (func.julianday(column) - 2440587.5) * 86400.0
+
+def load_history(db: Session, user_id: int, session_id: Optional[int] = None) -> ActionHistory:
+    query = (
+        select(
+            _epoch_seconds(TrackedAction.timestamp, db.get_bind().dialect.name),
+            TrackedAction.session_id,
+            func.coalesce(TrackedAction.library_id, _CUSTOM_ACTION_ID),
+            TrackedAction.user_movement,
+            TrackedAction.llm_movement
+        )
+        .join(GameSession, GameSession.session_id == TrackedAction.session_id)
+        .where(GameSession.user_id == user_id)
+        .order_by(TrackedAction.timestamp, TrackedAction.action_id)
+    )
+    if session_id is not None:
+        query = query.where(TrackedAction.session_id == session_id)
+
+    # Every column is numeric, so rows are read straight off the DBAPI cursor
+    # without building SQLAlchemy Row objects
+    rows = db.connection().execute(query).cursor.fetchall()
+    columns = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=5 * len(rows))
+    return ActionHistory(columns.reshape(len(rows), 5))
+
+def _to_datetime(seconds: float) -> datetime:
+    # Epoch floats carry rounding noise below the millisecond
+    return datetime.fromtimestamp(round(seconds, 3), tz=timezone.utc)
+
+def _sample_indices(n: int, points: int) -> np.ndarray:
+    # Evenly spaced, always keeping the first and latest action
+    if n <= points:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, points).round().astype(np.int64))
+
+def compute_trajectory(history: ActionHistory, window: int, points: int) -> dict:
+    """Cumulative control, net balance and a rolling mean of net movement per action."""
+    n = len(history)
+    user_control = np.cumsum(history.user_movement)
+    llm_control = np.cumsum(history.llm_movement)
+    net_balance = user_control - llm_control
+
+    # Rolling sum as the difference of two prefix sums; early points average what exists
+    shifted = np.concatenate((np.zeros(min(window, n), dtype=np.int64), net_balance[:max(n - window, 0)]))
+    rolling_net = (net_balance - shifted) / np.minimum(np.arange(1, n + 1), window)
+
+    idx = _sample_indices(n, points)
+    return {
+        "action_count": n,
+        "window": window,
+        "points": [
+            {
+                "timestamp": _to_datetime(timestamp),
+                "user_control": user,
+                "llm_control": llm,
+                "net_balance": net,
+                "rolling_net": rolling
+            }
+            for timestamp, user, llm, net, rolling in zip(
+                history.timestamps[idx].tolist(),
+                user_control[idx].tolist(),
+                llm_control[idx].tolist(),
+                net_balance[idx].tolist(),
+                rolling_net[idx].tolist()
+            )
+        ],
+    }
+
+def compute_contributions(history: ActionHistory) -> list[dict]:
+    """Per library action totals and share of all movement (by magnitude), largest first."""
+    if not len(history):
+        return []
+    library_ids, inverse, counts = np.unique(history.library_ids, return_inverse=True, return_counts=True)
+    user_totals = np.bincount(inverse, weights=history.user_movement, minlength=len(library_ids))
+    llm_totals = np.bincount(inverse, weights=history.llm_movement, minlength=len(library_ids))
+    magnitude = np.bincount(
+        inverse,
+        weights=np.abs(history.user_movement) + np.abs(history.llm_movement),
+        minlength=len(library_ids)
+    )
+    total = magnitude.sum()
+    shares = magnitude / total if total else np.zeros_like(magnitude)
+
+    order = np.lexsort((library_ids, -magnitude))
+    return [
+        {
+            "library_id": library_id or None,
+            "action_count": count,
+            "user_movement": int(user),
+            "llm_movement": int(llm),
+            "share": share
+        }
+        for library_id, count, user, llm, share in zip(
+            library_ids[order].tolist(),
+            counts[order].tolist(),
+            user_totals[order].tolist(),
+            llm_totals[order].tolist(),
+            shares[order].tolist()
+        )
+    ]
+
+def compute_session_deltas(history: ActionHistory) -> list[dict]:
+    """Per-session totals in order of each session's first action, with the change in net balance."""
+    if not len(history):
+        return []
+    session_ids, first_index, inverse, counts = np.unique(
+        history.session_ids, return_index=True, return_inverse=True, return_counts=True
+    )
+    user_totals = np.bincount(inverse, weights=history.user_movement, minlength=len(session_ids)).astype(np.int64)
+    llm_totals = np.bincount(inverse, weights=history.llm_movement, minlength=len(session_ids)).astype(np.int64)
+
+    order = np.argsort(first_index, kind="stable")
+    net = (user_totals - llm_totals)[order]
+    net_delta = [None] + np.diff(net).tolist()
+    return [
+        {
+            "session_id": session_id,
+            "started_at": _to_datetime(started_at),
+            "action_count": count,
+            "user_movement": user,
+            "llm_movement": llm,
+            "net_balance": balance,
+            "net_delta": delta
+        }
+        for session_id, started_at, count, user, llm, balance, delta in zip(
+            session_ids[order].tolist(),
+            history.timestamps[first_index[order]].tolist(),
+            counts[order].tolist(),
+            user_totals[order].tolist(),
+            llm_totals[order].tolist(),
+            net.tolist(),
+            net_delta
+        )
+    ]
+
+def trajectory_for(db: Session, user_id: int, session_id: Optional[int], window: int, points: int) -> dict:
+    return compute_trajectory(load_history(db, user_id, session_id), window, points)
+
+def contributions_for(db: Session, user_id: int, session_id: Optional[int]) -> list[dict]:
+    contributions = compute_contributions(load_history(db, user_id, session_id))
+    library_ids = [c["library_id"] for c in contributions if c["library_id"]]
+    descriptions = dict(db.execute(
+        select(ActionLibrary.library_id, ActionLibrary.action_description)
+        .where(ActionLibrary.library_id.in_(library_ids))
+    ).all()) if library_ids else {}
+    for contribution in contributions:
+        library_id = contribution["library_id"]
+        contribution["action_description"] = descriptions.get(library_id) if library_id else "Custom actions"
+    return contributions
+
+def session_deltas_for(db: Session, user_id: int) -> list[dict]:
+    return compute_session_deltas(load_history(db, user_id))
@@ -0,0 +1,112 @@
+"""
+Write-behind aggregation for ActionLibrary.times_used.
+
+Starter actions are shared by every user, so incrementing their row on every
+tap makes a handful of rows the hottest write contention point in the app.
+Increments are accumulated in memory instead and flushed every
+USAGE_FLUSH_INTERVAL_SECONDS in a single grouped UPDATE (and on shutdown).
+Flushes add deltas rather than overwrite, so several workers can share a
+database safely.
+
+Pending increments live in one process. The library endpoint adds this
+process's pending counts to times_used (see library_cache), so a user sees
+their own taps at once when served by the same worker; taps handled by other
+workers show up after their next flush.
+"""
+from collections import Counter
+from sqlalchemy import case, func, update
+from sqlalchemy.engine import Engine
+from typing import Callable, Mapping, Optional
+import logging
+import threading
+import os
+
+from app.database import engine as default_engine
+from app.models import ActionLibrary
+
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+class UsageCounter:
+    def __init__(self, engine: Engine, interval: float):
+        self.engine = engine
+        self.interval = interval
+        self._pending: Counter = Counter()
+        # Taken from _pending by a flush that hasn't finished yet
+        self._flushing: Counter = Counter()
+        self._listeners: list[Callable[[Mapping[int, int]], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, library_id: int, count: int = 1) -> None:
+        with self._lock:
+            self._pending[library_id] += count
+
+    def add_many(self, counts: Mapping[int, int]) -> None:
+        with self._lock:
+            self._pending.update(counts)
+
+    def pending(self, library_id: int) -> int:
+        with self._lock:
+            return self._pending.get(library_id, 0)
+
+    def snapshot(self) -> dict[int, int]:
+        """Every increment this process has not flushed yet, by library_id."""
+        with self._lock:
+            return dict(self._pending + self._flushing)
+
+    def on_flush(self, listener: Callable[[Mapping[int, int]], None]) -> None:
+        """Call listener with the flushed counts after each flush commits."""
+        self._listeners.append(listener)
+
+    def flush(self) -> int:
+        with self._lock:
+            counts, self._pending = self._pending, Counter()
+            self._flushing.update(counts)
+        if not counts:
+            return 0
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    update(ActionLibrary)
+                    .where(ActionLibrary.library_id.in_(counts))
+                    .values(times_used=func.coalesce(ActionLibrary.times_used, 0) + case(counts, value=ActionLibrary.library_id, else_=0))
+                )
+        except Exception:
+            # Keep the increments for the next attempt rather than losing them
+            with self._lock:
+                self._pending.update(counts)
+                self._flushing -= counts
+            logger.exception("Failed to flush %d library usage counters", len(counts))
+            raise
+        try:
+            for listener in self._listeners:
+                listener(counts)
+        finally:
+            with self._lock:
+                self._flushing -= counts
+        return sum(counts.values())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                pass  # already logged; retried on the next tick
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="usage-counter-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+usage_counter = UsageCounter(default_engine, USAGE_FLUSH_INTERVAL_SECONDS)
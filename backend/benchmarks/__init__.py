@@ -0,0 +1,16 @@
+"""
+Benchmarks: a synthetic data generator and a scripted load harness.
+
+    cd backend
+    python -m benchmarks.generate --users 200 --seed 1
+    python -m benchmarks.load --users 20 --save benchmarks/baselines/sqlite.json
+    python -m benchmarks.load --users 20 --compare benchmarks/baselines/sqlite.json
+    python -m benchmarks.serialization --rows 10000
+
+Both read DATABASE_URL like the app does, so the same commands run against
+SQLite or a local Postgres. The load harness needs httpx
+(pip install -e ".[bench]").
+"""
+
+# Every generated account shares this password
+BENCH_PASSWORD = "benchmark-password"
@@ -0,0 +1,225 @@
+"""
+Synthetic data generator: python -m benchmarks.generate [options]
+
+Creates --users accounts ({prefix}-{n}@example.com, password BENCH_PASSWORD)
+with sessions, selected actions, tracked actions and logs drawn from
+distributions shaped like real use:
+
+- sessions per user are geometric (most users have a few, some have many)
+- actions per session are log-normal (short sessions are common, long ones
+  have a heavy tail)
+- sessions start on random days in the last --days days, mostly in the
+  evening, and actions within a session are spaced by exponential gaps
+- library actions are picked with Zipf weights from the session's selected
+  actions, so a handful of starter actions dominate as they do in practice;
+  --custom-share of actions are free text
+- --log-share of actions get a log entry, a third of those with a note
+
+Runs are reproducible for a given --seed against the same starter pack.
+Rows are written with executemany in batches, scores are set from the
+generated movement, and the analytics rollup and times_used are brought up
+to date at the end.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks import BENCH_PASSWORD
+from app.auth import get_password_hash
+from app.database import engine as default_engine
+from app.models import ActionLibrary, GameSession, GameSessionLog, SelectedAction, TrackedAction, User
+
+BATCH_SIZE = 5000
+
+_NOTES = (
+    "Caught a wrong date in the answer",
+    "Rewrote the intro myself",
+    "Too tired to check this one",
+    "Asked for sources first",
+    "Kept my own outline",
+)
+
+class Generator:
+    def __init__(self, engine: Engine, seed: int, days: int, sessions_mean: float, actions_median: float,
+                 custom_share: float, log_share: float):
+        self.engine = engine
+        self.rng = np.random.default_rng(seed)
+        self.days = days
+        self.sessions_mean = sessions_mean
+        self.actions_median = actions_median
+        self.custom_share = custom_share
+        self.log_share = log_share
+        self.midnight = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.library_uses: Counter = Counter()
+        self.counts = Counter(users=0, sessions=0, actions=0, logs=0)
+
+        with engine.connect() as conn:
+            starters = conn.execute(
+                select(ActionLibrary.library_id, ActionLibrary.default_user_movement, ActionLibrary.default_llm_movement)
+                .where(ActionLibrary.user_created == False)
+                .order_by(ActionLibrary.library_id)
+            ).all()
+        if not starters:
+            raise SystemExit("No starter actions; run python seed_data.py first")
+        self.library = np.array(starters, dtype=np.int64)
+
+    def _zipf_weights(self, n: int) -> np.ndarray:
+        weights = 1.0 / np.arange(1, n + 1) ** 1.1
+        return weights / weights.sum()
+
+    def user_sessions(self, user_id: int) -> tuple[list[dict], list[list[dict]]]:
+        """Session rows and, per session, its action rows (without session_id)."""
+        rng = self.rng
+        n_sessions = int(rng.geometric(1.0 / self.sessions_mean))
+        # Whole days back from today's midnight, so nothing lands in the future
+        start_days = np.sort(rng.integers(1, self.days + 1, n_sessions))[::-1]
+        # Evening-heavy start times, wrapped into the day
+        start_minutes = rng.normal(20 * 60, 180, n_sessions).astype(np.int64) % (24 * 60)
+        action_counts = np.maximum(1, rng.lognormal(np.log(self.actions_median), 0.8, n_sessions).astype(np.int64))
+
+        sessions, actions = [], []
+        for index in range(n_sessions):
+            start = self.midnight - timedelta(days=int(start_days[index])) + timedelta(minutes=int(start_minutes[index]))
+            n = int(action_counts[index])
+            # Each session picks a handful of starter actions and sticks mostly to them
+            selected = rng.choice(len(self.library), size=min(len(self.library), int(rng.integers(3, 9))), replace=False)
+            picks = selected[rng.choice(len(selected), size=n, p=self._zipf_weights(len(selected)))]
+            custom = rng.random(n) < self.custom_share
+            offsets = np.cumsum(rng.exponential(45.0, n))
+
+            rows = []
+            for pick, is_custom, offset in zip(picks.tolist(), custom.tolist(), offsets.tolist()):
+                library_id, user_movement, llm_movement = self.library[pick].tolist()
+                if is_custom:
+                    library_id = None
+                    user_movement, llm_movement = int(rng.integers(-3, 5)), int(rng.integers(-2, 5))
+                else:
+                    self.library_uses[library_id] += 1
+                rows.append({
+                    "library_id": library_id,
+                    "action_description": "Custom synthetic action" if is_custom else None,
+                    "user_movement": user_movement,
+                    "llm_movement": llm_movement,
+                    "timestamp": start + timedelta(seconds=offset)
+                })
+
+            # The most recent session may still be running
+            ongoing = index == n_sessions - 1 and rng.random() < 0.2
+            sessions.append({
+                "user_id": user_id,
+                "session_name": f"Session {index + 1}",
+                "start_time": start,
+                "end_time": None if ongoing else rows[-1]["timestamp"] + timedelta(seconds=30),
+                "status": "active" if ongoing else "ended",
+                "user_score": sum(row["user_movement"] for row in rows),
+                "llm_score": sum(row["llm_movement"] for row in rows),
+                "selected": [int(self.library[i][0]) for i in selected.tolist()],
+            })
+            actions.append(rows)
+        return sessions, actions
+
+    def run(self, users: int, prefix: str, hashed_password: str) -> Counter:
+        with self.engine.begin() as conn:
+            taken = conn.execute(
+                select(func.count()).select_from(User).where(User.email.like(f"{prefix}-%@example.com"))
+            ).scalar()
+            if taken:
+                raise SystemExit(f"{taken} users with prefix {prefix!r} already exist; pick another --prefix")
+
+            user_ids = conn.execute(
+                insert(User).returning(User.user_id, sort_by_parameter_order=True),
+                [{"email": f"{prefix}-{n}@example.com", "hashed_password": hashed_password} for n in range(users)]
+            ).scalars().all()
+            self.counts["users"] = len(user_ids)
+
+            pending_sessions, pending_actions, pending_rows = [], [], 0
+            for user_id in user_ids:
+                sessions, actions = self.user_sessions(user_id)
+                pending_sessions.extend(sessions)
+                pending_actions.extend(actions)
+                pending_rows += sum(len(rows) for rows in actions)
+                if pending_rows >= BATCH_SIZE:
+                    self._write(conn, pending_sessions, pending_actions)
+                    pending_sessions, pending_actions, pending_rows = [], [], 0
+            self._write(conn, pending_sessions, pending_actions)
+        return self.counts
+
+    def _write(self, conn, sessions: list[dict], actions: list[list[dict]]) -> None:
+        if not sessions:
+            return
+        session_ids = conn.execute(
+            insert(GameSession).returning(GameSession.session_id, sort_by_parameter_order=True),
+            [{key: value for key, value in session.items() if key != "selected"} for session in sessions]
+        ).scalars().all()
+        conn.execute(insert(SelectedAction), [
+            {"session_id": session_id, "library_id": library_id}
+            for session_id, session in zip(session_ids, sessions)
+            for library_id in session["selected"]
+        ])
+
+        action_rows = [
+            {**row, "session_id": session_id}
+            for session_id, rows in zip(session_ids, actions)
+            for row in rows
+        ]
+        action_ids = conn.execute(
+            insert(TrackedAction).returning(TrackedAction.action_id, sort_by_parameter_order=True),
+            action_rows
+        ).scalars().all()
+
+        logged = np.flatnonzero(self.rng.random(len(action_rows)) < self.log_share)
+        notes = self.rng.integers(0, 3 * len(_NOTES), len(logged))
+        log_rows = [
+            {
+                "session_id": action_rows[i]["session_id"],
+                "action_id": action_ids[i],
+                "timestamp": action_rows[i]["timestamp"],
+                "optional_note": _NOTES[note] if note < len(_NOTES) else None
+            }
+            for i, note in zip(logged.tolist(), notes.tolist())
+        ]
+        if log_rows:
+            conn.execute(insert(GameSessionLog), log_rows)
+
+        self.counts["sessions"] += len(session_ids)
+        self.counts["actions"] += len(action_ids)
+        self.counts["logs"] += len(log_rows)
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.generate", description="Generate synthetic Turn data.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--prefix", default="bench", help="email prefix for the generated accounts")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--days", type=int, default=180, help="spread sessions over this many days")
+    parser.add_argument("--sessions-mean", type=float, default=8.0, help="mean sessions per user")
+    parser.add_argument("--actions-median", type=float, default=25.0, help="median actions per session")
+    parser.add_argument("--custom-share", type=float, default=0.1, help="fraction of free-text actions")
+    parser.add_argument("--log-share", type=float, default=0.3, help="fraction of actions with a log entry")
+    args = parser.parse_args(argv)
+
+    from app import analytics
+    from app.usage_counter import usage_counter
+
+    started = time.perf_counter()
+    generator = Generator(
+        default_engine, args.seed, args.days, args.sessions_mean, args.actions_median,
+        args.custom_share, args.log_share
+    )
+    # Every account shares one hash; bcrypt per user would dominate the run
+    counts = generator.run(args.users, args.prefix, get_password_hash(BENCH_PASSWORD))
+    analytics.backfill(default_engine)
+    usage_counter.add_many(generator.library_uses)
+    usage_counter.flush()
+    print(
+        ", ".join(f"{count} {name}" for name, count in counts.items())
+        + f" in {time.perf_counter() - started:.1f}s"
+    )
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,233 @@
+"""
+Scripted load harness: python -m benchmarks.load [options]
+
+Each of --users virtual users (accounts made by benchmarks.generate) runs
+the same script concurrently:
+
+    login, fetch the library, then --iterations times:
+        create a session, --burst single track calls, one batch track call,
+        fetch the session state and the library, end the session
+    and finally both exports (the all-sessions CSV and a JSON Lines research
+    export), read to the end
+
+Requests run in-process through httpx's ASGI transport against the database
+in DATABASE_URL (or --database-url), or over HTTP against a running server
+with --url. Latency is measured to the last byte of the body.
+
+The report gives throughput and p50/p95/p99 latency per step. --save writes
+it as JSON with the git commit and settings; --compare checks the run
+against a saved baseline and exits 1 when a step's p95 or throughput is
+worse by more than --tolerance, so it can gate CI.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import os
+
+import numpy as np
+
+from benchmarks import BENCH_PASSWORD
+
+class Recorder:
+    def __init__(self):
+        self.latencies: defaultdict[str, list[float]] = defaultdict(list)
+        self.errors: defaultdict[str, int] = defaultdict(int)
+
+    async def request(self, client, name: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        async with client.stream(method, url, **kwargs) as response:
+            body = b"".join([chunk async for chunk in response.aiter_bytes()])
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            return response, None
+        return response, body
+
+    def report(self, wall_seconds: float) -> dict:
+        endpoints = {}
+        for name, samples in self.latencies.items():
+            millis = np.array(samples) * 1000
+            p50, p95, p99 = np.percentile(millis, [50, 95, 99]).tolist()
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "throughput_rps": round(len(samples) / wall_seconds, 2),
+                "mean_ms": round(float(millis.mean()), 2),
+                "p50_ms": round(p50, 2),
+                "p95_ms": round(p95, 2),
+                "p99_ms": round(p99, 2),
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {
+            "wall_seconds": round(wall_seconds, 3),
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(total / wall_seconds, 2),
+            "endpoints": endpoints,
+        }
+
+async def virtual_user(client, recorder: Recorder, email: str, args, rng: random.Random) -> None:
+    response, body = await recorder.request(
+        client, "login", "POST", "/api/auth/login", data={"username": email, "password": BENCH_PASSWORD}
+    )
+    if body is None:
+        raise SystemExit(f"Login failed for {email} ({response.status_code}); run python -m benchmarks.generate first")
+    headers = {"Authorization": f"Bearer {json.loads(body)['access_token']}"}
+
+    _, body = await recorder.request(client, "library", "GET", "/api/actions/library", headers=headers)
+    library = [(a["library_id"], a["default_user_movement"], a["default_llm_movement"]) for a in json.loads(body)]
+
+    def action(session_id: int) -> dict:
+        library_id, user_movement, llm_movement = rng.choice(library)
+        return {"session_id": session_id, "library_id": library_id, "user_movement": user_movement, "llm_movement": llm_movement}
+
+    for iteration in range(args.iterations):
+        _, body = await recorder.request(
+            client, "create_session", "POST", "/api/sessions/", headers=headers, json={"session_name": f"Load {iteration}"}
+        )
+        session_id = json.loads(body)["session_id"]
+        for _ in range(args.burst):
+            await recorder.request(client, "track", "POST", "/api/actions/track", headers=headers, json=action(session_id))
+        await recorder.request(
+            client, "track_batch", "POST", "/api/actions/track/batch", headers=headers,
+            json=[action(session_id) for _ in range(args.batch_size)]
+        )
+        await recorder.request(client, "session_state", "GET", f"/api/sessions/{session_id}/state", headers=headers)
+        await recorder.request(client, "library", "GET", "/api/actions/library", headers=headers)
+        await recorder.request(client, "end_session", "POST", f"/api/sessions/{session_id}/end", headers=headers)
+
+    if not args.skip_exports:
+        await recorder.request(client, "export_csv", "GET", "/api/sessions/export-all", headers=headers)
+        await recorder.request(
+            client, "export_research", "GET", "/api/sessions/export-research/actions",
+            headers=headers, params={"format": "jsonl"}
+        )
+
+async def run(args) -> dict:
+    import httpx
+
+    recorder = Recorder()
+    emails = [f"{args.prefix}-{n}@example.com" for n in range(args.users)]
+    rngs = [random.Random(args.seed * 100_003 + n) for n in range(args.users)]
+
+    async def drive(client):
+        start = time.perf_counter()
+        await asyncio.gather(*(virtual_user(client, recorder, email, args, rng) for email, rng in zip(emails, rngs)))
+        return recorder.report(time.perf_counter() - start)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            return await drive(client)
+
+    from app.main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            return await drive(client)
+
+def _git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+def _database(args) -> str:
+    if args.url:
+        return "remote"
+    # Dialect only; the URL may carry credentials
+    return os.environ.get("DATABASE_URL", "sqlite:///./turn_app.db").split(":", 1)[0]
+
+def print_report(result: dict) -> None:
+    print(f"{'step':<16} {'requests':>8} {'errors':>6} {'req/s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in result["endpoints"].items():
+        print(
+            f"{name:<16} {row['requests']:>8} {row['errors']:>6} {row['throughput_rps']:>9.1f} "
+            f"{row['mean_ms']:>9.1f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}"
+        )
+    print(f"{result['requests']} requests, {result['errors']} errors in {result['wall_seconds']:.1f}s "
+          f"({result['throughput_rps']:.1f} req/s)")
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Steps whose p95 latency rose, or whose throughput fell, by more than tolerance."""
+    regressions = []
+    print(f"\nAgainst {baseline['meta'].get('git_commit') or 'baseline'} ({baseline['meta']['created_at']}):")
+    print(f"{'step':<16} {'p95 ms':>19} {'change':>8} {'req/s':>17} {'change':>8}")
+    for name, row in result["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            continue
+        p95_change = row["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps_change = row["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+        flag = ""
+        if p95_change > tolerance or rps_change < -tolerance:
+            regressions.append(name)
+            flag = "  REGRESSED"
+        print(
+            f"{name:<16} {before['p95_ms']:>9.1f} → {row['p95_ms']:>7.1f} {p95_change:>+8.0%} "
+            f"{before['throughput_rps']:>7.1f} → {row['throughput_rps']:>7.1f} {rps_change:>+8.0%}{flag}"
+        )
+    return regressions
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description="Load-test the Turn API.")
+    parser.add_argument("--url", help="run against a server (e.g. http://localhost:8000) instead of in-process")
+    parser.add_argument("--database-url", help="in-process only; defaults to DATABASE_URL")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--prefix", default="bench", help="email prefix used by benchmarks.generate")
+    parser.add_argument("--iterations", type=int, default=5, help="sessions each user plays")
+    parser.add_argument("--burst", type=int, default=20, help="single track calls per session")
+    parser.add_argument("--batch-size", type=int, default=10, help="actions in the batch track call")
+    parser.add_argument("--skip-exports", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--save", metavar="PATH", help="write the report as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p95 / throughput change")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        # Read when app.database is first imported
+        os.environ["DATABASE_URL"] = args.database_url
+
+    result = asyncio.run(run(args))
+    result["meta"] = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "git_commit": _git_commit(),
+        "database": _database(args),
+        "db_mode": os.environ.get("DB_MODE", "sync"),
+        "python": platform.python_version(),
+        "settings": {
+            key: getattr(args, key)
+            for key in ("users", "iterations", "burst", "batch_size", "skip_exports", "seed")
+        },
+    }
+    print_report(result)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("settings") != result["meta"]["settings"]:
+            print("Warning: the baseline was recorded with different settings")
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
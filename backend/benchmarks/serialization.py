@@ -0,0 +1,79 @@
+"""
+List serialization benchmark: python -m benchmarks.serialization [--rows N]
+
+Times the two ways a list endpoint can turn rows into a response body, on
+the same rows from the database in DATABASE_URL (run benchmarks.generate
+first):
+
+    orm   load ORM instances, validate them through the from_attributes
+          response model and dump JSON, as FastAPI does for a returned list
+    fast  select the schema's columns as tuples and encode them with
+          app.fastjson (orjson when installed), as the list endpoints now do
+
+Both are checked to produce the same JSON before timing.
+"""
+from sqlalchemy import func, select
+from typing import List
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from pydantic import TypeAdapter
+
+from app import fastjson
+from app.database import SessionLocal
+from app.models import GameSession, GameSessionLog, TrackedAction
+from app.schemas import GameSessionLogResponse, GameSessionResponse, TrackedActionResponse
+
+# (name, model, schema, order column, id column)
+_CASES = (
+    ("actions", TrackedAction, TrackedActionResponse, TrackedAction.timestamp, TrackedAction.action_id),
+    ("logs", GameSessionLog, GameSessionLogResponse, GameSessionLog.timestamp, GameSessionLog.log_id),
+    ("sessions", GameSession, GameSessionResponse, GameSession.start_time, GameSession.session_id),
+)
+
+def _orm_path(db, model, schema, order, limit: int) -> bytes:
+    adapter = TypeAdapter(List[schema])
+    rows = db.scalars(select(model).order_by(*order).limit(limit)).all()
+    body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    db.expunge_all()
+    return body
+
+def _fast_path(db, model, schema, order, limit: int) -> bytes:
+    rows = db.execute(select(*fastjson.columns(model, schema)).order_by(*order).limit(limit)).all()
+    return fastjson.list_response(schema, rows).body
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization", description="Compare list serialization paths.")
+    parser.add_argument("--rows", type=int, default=10000, help="rows per list")
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    print(f"encoder: {'orjson' if fastjson.has_orjson() else 'json (install orjson for the full gain)'}")
+    print(f"{'list':<10} {'rows':>7} {'orm ms':>9} {'fast ms':>9} {'speedup':>8}")
+    with SessionLocal() as db:
+        for name, model, schema, order_column, id_column in _CASES:
+            order = (order_column, id_column)
+            rows = min(args.rows, db.execute(select(func.count()).select_from(model)).scalar())
+            if not rows:
+                raise SystemExit(f"No {name} rows; run python -m benchmarks.generate first")
+            # Same documents either way (whitespace and key order aside)
+            if json.loads(_orm_path(db, model, schema, order, rows)) != json.loads(_fast_path(db, model, schema, order, rows)):
+                raise SystemExit(f"The two paths disagree on {name}")
+
+            orm = _time(lambda: _orm_path(db, model, schema, order, rows), args.repeat)
+            fast = _time(lambda: _fast_path(db, model, schema, order, rows), args.repeat)
+            print(f"{name:<10} {rows:>7} {orm * 1000:>9.1f} {fast * 1000:>9.1f} {orm / fast:>7.1f}x")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
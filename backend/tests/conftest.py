@@ -0,0 +1,58 @@
+import itertools
+import os
+import tempfile
+
+# The app reads its settings at import time, so point it at a scratch database first.
+# DB_MODE is left to the caller; test_db_modes reruns the suite in the other mode.
+_db_dir = tempfile.mkdtemp(prefix="turn-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault("PASSWORD_HASH_EXECUTOR", "thread")
+# Tests flush library usage counts themselves rather than racing the background flush
+os.environ.setdefault("USAGE_FLUSH_INTERVAL_SECONDS", "3600")
+
+import pytest
+
+_emails = (f"user-{n}@example.com" for n in itertools.count())
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    from app import migrations
+    migrations.upgrade()
+    yield
+
+@pytest.fixture(scope="session")
+def client(migrated_database):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def db():
+    from app.database import SessionLocal
+    with SessionLocal() as session:
+        yield session
+
+def new_user_id(db) -> int:
+    from app.models import User
+    user = User(email=next(_emails), hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user.user_id
+
+def auth_headers(user_id: int) -> dict:
+    from app.auth import create_access_token
+    return {"Authorization": "Bearer " + create_access_token(data={"sub": str(user_id)})}
+
+@pytest.fixture
+def user(db):
+    """A fresh user: (user_id, auth headers)."""
+    user_id = new_user_id(db)
+    return user_id, auth_headers(user_id)
+
+@pytest.fixture
+def session_id(client, user) -> int:
+    _, headers = user
+    response = client.post("/api/sessions/", headers=headers, json={"session_name": "Test"})
+    assert response.status_code == 201, response.text
+    return response.json()["session_id"]
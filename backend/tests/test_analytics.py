@@ -0,0 +1,62 @@
+from datetime import datetime, time, timedelta, timezone
+from sqlalchemy import select
+import uuid
+
+from app import analytics
+from app.models import UserActionDaily
+
+def _rollup(db, user_id: int) -> set[tuple]:
+    db.expire_all()
+    return set(db.execute(
+        select(
+            UserActionDaily.day,
+            UserActionDaily.library_id,
+            UserActionDaily.action_count,
+            UserActionDaily.user_movement_total,
+            UserActionDaily.llm_movement_total
+        ).where(UserActionDaily.user_id == user_id)
+    ).all())
+
+def test_incremental_rollups_match_backfill(client, db, user, session_id):
+    user_id, headers = user
+    library_id = client.post("/api/actions/library", headers=headers, json={
+        "action_description": "Rolled up", "default_user_movement": 1, "default_llm_movement": 0,
+        "created_from_session_id": session_id,
+    }).json()["library_id"]
+
+    # Single tracks, a library action and free text
+    for payload in (
+        {"library_id": library_id, "user_movement": 2, "llm_movement": 0},
+        {"library_id": library_id, "user_movement": 1, "llm_movement": 1},
+        {"action_description": "Free text", "user_movement": -1, "llm_movement": 3},
+    ):
+        response = client.post("/api/actions/track", headers=headers, json={"session_id": session_id, **payload})
+        assert response.status_code == 201, response.text
+
+    # A batch mixing both kinds
+    batch = [
+        {"session_id": session_id, "library_id": library_id, "user_movement": 4, "llm_movement": 0},
+        {"session_id": session_id, "action_description": "Batched", "user_movement": 0, "llm_movement": 2},
+    ]
+    assert client.post("/api/actions/track/batch", headers=headers, json=batch).status_code == 201
+
+    # An offline queue spanning days, written in another offset, including a
+    # timestamp just after UTC midnight that is still the previous day locally
+    midnight = datetime.combine(datetime.utcnow().date() - timedelta(days=2), time.min)
+    queue = [
+        {"client_id": uuid.uuid4().hex, "library_id": library_id, "user_movement": 1, "llm_movement": 0,
+         "timestamp": (midnight - timedelta(minutes=5)).replace(tzinfo=timezone.utc).isoformat()},
+        {"client_id": uuid.uuid4().hex, "library_id": library_id, "user_movement": 1, "llm_movement": 0,
+         "timestamp": (midnight + timedelta(minutes=5)).replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=-4))).isoformat()},
+        {"client_id": uuid.uuid4().hex, "action_description": "Synced", "user_movement": 0, "llm_movement": 5,
+         "timestamp": (midnight + timedelta(hours=1)).isoformat()},
+    ]
+    response = client.post("/api/sync", headers=headers, json={"session_id": session_id, "since_version": 0, "actions": queue})
+    assert response.status_code == 200, response.text
+
+    incremental = _rollup(db, user_id)
+    assert {row.day for row in incremental} >= {midnight.date() - timedelta(days=1), midnight.date()}
+    assert sum(row.action_count for row in incremental) == 8
+
+    analytics.backfill(user_id=user_id)
+    assert _rollup(db, user_id) == incremental
@@ -0,0 +1,56 @@
+import itertools
+
+import pytest
+
+from app import hashing
+from app.database import DB_MODE, async_engine, engine
+
+_emails = (f"auth-{n}@example.com" for n in itertools.count())
+
+def _auth_module():
+    if DB_MODE == "async":
+        from app.api.aio import auth
+    else:
+        from app.api import auth
+    return auth
+
+@pytest.fixture
+def checked_out_while_hashing(monkeypatch):
+    """Pooled connections in use each time a password is hashed or verified."""
+    pool = (async_engine or engine).pool
+    seen = []
+
+    async def hash_password(password):
+        seen.append(pool.checkedout())
+        return hashing.hash_password_sync(password)
+
+    async def verify_password(password, hashed):
+        seen.append(pool.checkedout())
+        return hashing.verify_password_sync(password, hashed)
+
+    module = _auth_module()
+    monkeypatch.setattr(module, "hash_password", hash_password)
+    monkeypatch.setattr(module, "verify_password", verify_password)
+    return seen
+
+def test_signup_and_login(client):
+    email = next(_emails)
+    response = client.post("/api/auth/signup", json={"email": email, "password": "correct-horse"})
+    assert response.status_code == 201, response.text
+    assert response.json()["email"] == email
+
+    assert client.post("/api/auth/signup", json={"email": email, "password": "other"}).status_code == 400
+    assert client.post("/api/auth/login", data={"username": email, "password": "wrong"}).status_code == 401
+
+    response = client.post("/api/auth/login", data={"username": email, "password": "correct-horse"})
+    assert response.status_code == 200
+    token = response.json()["access_token"]
+    me = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert me.json()["email"] == email
+
+def test_no_connection_held_while_hashing(client, checked_out_while_hashing):
+    email = next(_emails)
+    assert client.post("/api/auth/signup", json={"email": email, "password": "pw-123456"}).status_code == 201
+    assert client.post("/api/auth/login", data={"username": email, "password": "pw-123456"}).status_code == 200
+
+    assert checked_out_while_hashing == [0, 0]
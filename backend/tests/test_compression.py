@@ -0,0 +1,124 @@
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+import gzip
+import pytest
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate
+
+BIG = b'{"rows": [' + b", ".join(b'{"n": %d}' % n for n in range(500)) + b"]}"
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/json")
+    def big_json():
+        return Response(BIG, media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/sized/{size}")
+    def sized_json(size: int):
+        return Response(BIG[:size], media_type="application/json")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((b"row,%d\n" % n for n in range(3)), media_type="text/csv")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse((b"data: %d\n\n" % n * 200 for n in range(3)), media_type="text/event-stream")
+
+    @app.get("/arrow")
+    def arrow():
+        return Response(BIG, media_type="application/vnd.apache.arrow.stream")
+
+    @app.get("/parquet")
+    def parquet():
+        return Response(BIG, media_type="application/vnd.apache.parquet")
+
+    @app.get("/ranged")
+    def ranged():
+        return Response(BIG, media_type="text/csv", headers={"Accept-Ranges": "bytes"})
+
+    @app.get("/partial")
+    def partial():
+        return Response(BIG[:2000], status_code=206, media_type="text/csv",
+                        headers={"Content-Range": f"bytes 0-1999/{len(BIG)}"})
+
+    app.add_middleware(CompressionMiddleware)
+    return app
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESSION_ENCODINGS", ("gzip",))
+
+@pytest.fixture
+def raw_client(gzip_only):
+    # httpx would decode gzip on its own; read the raw body to see what was sent
+    with TestClient(_app()) as client:
+        yield client
+
+def _get(client, path: str, accept_encoding: str = "gzip"):
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+def test_negotiation_honours_quality_and_wildcard(monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESSION_ENCODINGS", ("zstd", "br", "gzip"))
+    monkeypatch.setattr(compression, "_CODECS", {"gzip": object, "br": object})
+    assert negotiate(None) is None
+    assert negotiate("") is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip") == "gzip"
+    # Server preference wins among accepted encodings; zstd can't be produced here
+    assert negotiate("gzip, br, zstd") == "br"
+    assert negotiate("br;q=0, gzip") == "gzip"
+    assert negotiate("gzip;q=0, br;q=0") is None
+    assert negotiate("GZIP;q=0.5") == "gzip"
+    assert negotiate("gzip;q=bogus") is None
+    assert negotiate("*") == "br"
+    assert negotiate("*;q=0") is None
+    # An explicit entry overrides the wildcard either way
+    assert negotiate("*, br;q=0") == "gzip"
+    assert negotiate("*;q=0, gzip") == "gzip"
+
+def test_large_json_is_compressed(raw_client):
+    response, raw = _get(raw_client, "/json")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.headers["etag"] == 'W/"abc"'
+    assert gzip.decompress(raw) == BIG
+    assert len(raw) < len(BIG)
+
+def test_identity_without_an_accepted_encoding(raw_client):
+    for accept_encoding in ("identity", "gzip;q=0", "*;q=0"):
+        response, raw = _get(raw_client, "/json", accept_encoding)
+        assert "content-encoding" not in response.headers, accept_encoding
+        assert raw == BIG
+
+def test_responses_under_the_threshold_are_sent_as_is(raw_client):
+    below = compression.COMPRESSION_MIN_SIZE - 1
+    response, raw = _get(raw_client, f"/sized/{below}")
+    assert "content-encoding" not in response.headers
+    assert raw == BIG[:below]
+
+    response, raw = _get(raw_client, f"/sized/{compression.COMPRESSION_MIN_SIZE}")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw) == BIG[:compression.COMPRESSION_MIN_SIZE]
+
+def test_streams_are_compressed_chunk_by_chunk(raw_client):
+    # Streamed bodies don't know their size up front, so even a small one is compressed
+    response, raw = _get(raw_client, "/stream")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw) == b"row,0\nrow,1\nrow,2\n"
+
+def test_server_sent_events_pass_through(raw_client):
+    response, raw = _get(raw_client, "/events")
+    assert "content-encoding" not in response.headers
+    assert raw == b"".join(b"data: %d\n\n" % n * 200 for n in range(3))
+
+@pytest.mark.parametrize("path", ["/arrow", "/parquet", "/ranged", "/partial"])
+def test_self_compressed_and_ranged_bodies_pass_through(raw_client, path):
+    response, raw = _get(raw_client, path)
+    assert "content-encoding" not in response.headers
+    assert raw == (BIG[:2000] if path == "/partial" else BIG)
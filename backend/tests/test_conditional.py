@@ -0,0 +1,60 @@
+def _track(client, headers, session_id, description: str) -> dict:
+    response = client.post(
+        "/api/actions/track",
+        headers=headers,
+        json={"session_id": session_id, "action_description": description, "user_movement": 1, "llm_movement": 0}
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def test_lists_revalidate_per_kind_and_query(client, user, session_id):
+    _, headers = user
+    action = _track(client, headers, session_id, "first")
+    client.post("/api/actions/log", headers=headers, json={"session_id": session_id, "action_id": action["action_id"]})
+
+    session = client.get(f"/api/sessions/{session_id}", headers=headers)
+    actions = client.get(f"/api/actions/session/{session_id}/actions", headers=headers)
+    logs = client.get(f"/api/actions/session/{session_id}/logs", headers=headers)
+    page = client.get(f"/api/actions/session/{session_id}/actions", headers=headers, params={"limit": 1})
+    etags = [response.headers["ETag"] for response in (session, actions, logs, page)]
+    assert len(set(etags)) == 4
+    # All four describe the same version of the session
+    assert len({response.headers["X-Session-Version"] for response in (session, actions, logs, page)}) == 1
+
+    url = f"/api/actions/session/{session_id}/actions"
+    assert client.get(url, headers={**headers, "If-None-Match": actions.headers["ETag"]}).status_code == 304
+    assert client.get(url, headers={**headers, "If-None-Match": page.headers["ETag"]}, params={"limit": 1}).status_code == 304
+    # Another representation's validator must not turn into a 304
+    assert client.get(url, headers={**headers, "If-None-Match": session.headers["ETag"]}).status_code == 200
+    assert client.get(url, headers={**headers, "If-None-Match": actions.headers["ETag"]}, params={"limit": 1}).status_code == 200
+    logs_url = f"/api/actions/session/{session_id}/logs"
+    assert client.get(logs_url, headers={**headers, "If-None-Match": logs.headers["ETag"]}).status_code == 304
+    assert client.get(logs_url, headers={**headers, "If-None-Match": actions.headers["ETag"]}).status_code == 200
+
+    # A write bumps the version, so the old validator no longer matches
+    _track(client, headers, session_id, "second")
+    fresh = client.get(url, headers={**headers, "If-None-Match": actions.headers["ETag"]})
+    assert fresh.status_code == 200
+    assert len(fresh.json()) == 2
+
+def test_since_version_returns_only_newer_rows(client, user, session_id):
+    _, headers = user
+    _track(client, headers, session_id, "before")
+    url = f"/api/actions/session/{session_id}/actions"
+    seen = client.get(url, headers=headers)
+    version = int(seen.headers["X-Session-Version"])
+
+    delta = client.get(url, headers=headers, params={"since_version": version})
+    assert delta.status_code == 200
+    assert delta.json() == []
+    assert delta.headers["ETag"] != seen.headers["ETag"]
+    # Nothing changed, so the empty delta revalidates
+    assert client.get(url, headers={**headers, "If-None-Match": delta.headers["ETag"]}, params={"since_version": version}).status_code == 304
+
+    _track(client, headers, session_id, "after")
+    delta = client.get(url, headers={**headers, "If-None-Match": delta.headers["ETag"]}, params={"since_version": version})
+    assert delta.status_code == 200
+    assert [row["action_description"] for row in delta.json()] == ["after"]
+    assert int(delta.headers["X-Session-Version"]) > version
+    # Everything from the start is still there without the filter
+    assert len(client.get(url, headers=headers).json()) == 2
@@ -0,0 +1,44 @@
+"""
+The aio package re-implements the database-bound routers for DB_MODE=async.
+The endpoint tests run against whichever mode the suite was started in, and
+test_suite_passes_in_the_other_mode reruns them in the other one, so a
+single pytest run checks both sets of handlers against the same assertions.
+"""
+import importlib.util
+import inspect
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import main
+from app.database import DB_MODE
+
+# Set in the nested run so it doesn't start a third
+_NESTED = "TURN_TESTS_NESTED_DB_MODE"
+_OTHER_MODE = "sync" if DB_MODE == "async" else "async"
+
+@pytest.mark.parametrize("name", ["auth_router", "sessions_router", "actions_router", "analytics_router", "sync_router"])
+def test_routes_are_served_by_this_modes_handlers(name):
+    routes = getattr(main, name).routes
+    ported = [route for route in routes if route.endpoint.__module__.startswith("app.api.aio.")]
+    if DB_MODE == "async":
+        # Each router has async copies, and every copy mounted is a coroutine
+        assert ported
+        assert all(inspect.iscoroutinefunction(route.endpoint) for route in ported)
+    else:
+        assert not ported
+
+@pytest.mark.skipif(bool(os.environ.get(_NESTED)), reason="already the nested run")
+def test_suite_passes_in_the_other_mode(request):
+    if _OTHER_MODE == "async" and importlib.util.find_spec("aiosqlite") is None:
+        pytest.skip('DB_MODE=async needs aiosqlite (pip install -e ".[async]")')
+    env = {**os.environ, "DB_MODE": _OTHER_MODE, _NESTED: "1"}
+    # conftest points the nested run at its own scratch database
+    env.pop("DATABASE_URL", None)
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "-p", "no:warnings"],
+        cwd=request.config.rootpath, env=env, capture_output=True, text=True, timeout=600
+    )
+    assert result.returncode == 0, f"DB_MODE={_OTHER_MODE} run failed:\n{result.stdout[-4000:]}{result.stderr[-2000:]}"
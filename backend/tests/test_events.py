@@ -0,0 +1,56 @@
+import asyncio
+
+from app import events
+from app.api import sessions
+
+class _ConnectedRequest:
+    async def is_disconnected(self) -> bool:
+        return False
+
+def test_lagging_subscriber_gets_resync_and_its_stream_ends(monkeypatch):
+    hub = events.LocalBackend()
+    monkeypatch.setattr(events, "hub", hub)
+    monkeypatch.setattr(events, "EVENTS_QUEUE_SIZE", 3)
+    monkeypatch.setattr(sessions, "_session_snapshot", lambda session_id, user_id: {"session_id": session_id})
+    channel = events.session_channel(1)
+    published = [events.format_event("score", {"n": n}) for n in range(5)]
+
+    async def scenario():
+        stream = sessions._event_stream(_ConnectedRequest(), 1, 1)
+        assert (await stream.__anext__()).startswith("event: snapshot")
+        async with hub.subscribe(channel) as keeping_up:
+            assert hub.subscriber_count() == 2
+            received = []
+            for message in published:
+                hub.publish(channel, message)
+                # Let the delivery run, then drain only the subscriber that keeps up
+                await asyncio.sleep(0)
+                received.append(await keeping_up.get())
+            assert received == published
+            assert not keeping_up.overflowed
+
+            # The stream that never read falls behind: one resync, then it ends
+            async def drain():
+                return [message async for message in stream]
+            rest = await asyncio.wait_for(drain(), timeout=5)
+            assert rest == [events.RESYNC]
+            # Its subscription is gone; the other one is untouched
+            assert hub.subscriber_count() == 1
+        assert hub.subscriber_count() == 0
+
+    asyncio.run(scenario())
+
+def test_subscriber_within_the_limit_gets_every_event(monkeypatch):
+    hub = events.LocalBackend()
+    monkeypatch.setattr(events, "EVENTS_QUEUE_SIZE", 3)
+    published = [events.format_event("score", {"n": n}) for n in range(3)]
+
+    async def scenario():
+        async with hub.subscribe("session:2") as subscription:
+            for message in published:
+                hub.publish("session:2", message)
+            await asyncio.sleep(0)
+            assert [await subscription.get() for _ in published] == published
+            assert not subscription.overflowed
+
+    asyncio.run(scenario())
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+import uuid
+
+from app import idempotency
+from app.database import SessionLocal
+from app.models import GameSession, IdempotencyKey, TrackedAction
+
+def _action_count(db, session_id: int) -> int:
+    return db.scalar(select(func.count(TrackedAction.action_id)).where(TrackedAction.session_id == session_id))
+
+def _track(client, headers, session_id, key, user_movement=1):
+    return client.post(
+        "/api/actions/track",
+        headers={**headers, "Idempotency-Key": key},
+        json={"session_id": session_id, "action_description": "Asked again", "user_movement": user_movement, "llm_movement": 0}
+    )
+
+def test_retry_replays_stored_response(client, db, user, session_id):
+    _, headers = user
+    key = uuid.uuid4().hex
+    first = _track(client, headers, session_id, key)
+    assert first.status_code == 201
+    assert idempotency.REPLAYED_HEADER not in first.headers
+
+    idempotency._cache.clear()  # the stored row answers too, not just this worker's cache
+    for _ in range(2):
+        retry = _track(client, headers, session_id, key)
+        assert retry.status_code == 201
+        assert retry.headers[idempotency.REPLAYED_HEADER] == "true"
+        assert retry.json() == first.json()
+
+    assert _action_count(db, session_id) == 1
+    assert db.scalar(select(GameSession.user_score).where(GameSession.session_id == session_id)) == 1
+
+def test_key_reused_for_different_request(client, db, user, session_id):
+    _, headers = user
+    key = uuid.uuid4().hex
+    assert _track(client, headers, session_id, key).status_code == 201
+
+    response = _track(client, headers, session_id, key, user_movement=2)
+    assert response.status_code == 422
+    assert _action_count(db, session_id) == 1
+
+def test_expired_key_runs_write_again(client, db, user, session_id):
+    user_id, headers = user
+    key = uuid.uuid4().hex
+    assert _track(client, headers, session_id, key).status_code == 201
+
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db.commit()
+    idempotency._cache.clear()
+
+    response = _track(client, headers, session_id, key)
+    assert response.status_code == 201
+    assert idempotency.REPLAYED_HEADER not in response.headers
+    assert _action_count(db, session_id) == 2
+
+def test_keys_are_scoped_to_the_user(client, db, user, session_id):
+    from conftest import auth_headers, new_user_id
+    _, headers = user
+    key = uuid.uuid4().hex
+    assert _track(client, headers, session_id, key).status_code == 201
+
+    other_headers = auth_headers(new_user_id(db))
+    other_session = client.post("/api/sessions/", headers=other_headers, json={}).json()["session_id"]
+    response = _track(client, other_headers, other_session, key)
+    assert response.status_code == 201
+    assert idempotency.REPLAYED_HEADER not in response.headers
+
+def test_losing_a_race_replays_the_winner(db, user):
+    user_id, _ = user
+    request = idempotency.request_key(user_id, uuid.uuid4().hex, "create_session", {"session_name": "race"})
+
+    # The loser passed replay() before the winner committed; SQLite allows one
+    # writer at a time, so the two transactions run one after the other here
+    with SessionLocal() as winner, SessionLocal() as loser:
+        assert idempotency.replay(winner, request) is None
+        winner.add(GameSession(user_id=user_id, session_name="race", status="active"))
+        assert idempotency.commit(winner, request, 201, {"session_name": "race", "copy": "winner"}) is None
+
+        loser.add(GameSession(user_id=user_id, session_name="race", status="active"))
+        replayed = idempotency.commit(loser, request, 201, {"session_name": "race", "copy": "loser"})
+
+    assert replayed is not None
+    assert replayed.status_code == 201
+    assert replayed.headers[idempotency.REPLAYED_HEADER] == "true"
+    assert b'"copy":"winner"' in replayed.body
+    # The loser's write was rolled back with its key
+    assert db.scalar(select(func.count()).where(GameSession.user_id == user_id, GameSession.session_name == "race")) == 1
@@ -0,0 +1,99 @@
+from datetime import datetime
+from sqlalchemy import func, select
+import io
+
+import pytest
+
+from app import export, importer, research_export
+from app.models import ActionLibrary, GameSession, GameSessionLog, TrackedAction
+from conftest import new_user_id as _new_user
+
+@pytest.fixture
+def source_user(db) -> int:
+    user_id = _new_user(db)
+    library = ActionLibrary(action_description="Asked for a summary", default_user_movement=1,
+                            default_llm_movement=2, times_used=0, user_created=False)
+    db.add(library)
+    for n, status in enumerate(("ended", "active")):
+        session = GameSession(user_id=user_id, session_name=f"Session {n}", status=status,
+                              start_time=datetime(2026, 3, 1 + n, 9, 0), user_score=4, llm_score=1)
+        db.add(session)
+        db.flush()
+        actions = [
+            TrackedAction(session_id=session.session_id, library_id=library.library_id,
+                          user_movement=1, llm_movement=2, timestamp=datetime(2026, 3, 1 + n, 9, 5)),
+            TrackedAction(session_id=session.session_id, action_description="Wrote it myself",
+                          user_movement=3, llm_movement=-1, timestamp=datetime(2026, 3, 1 + n, 9, 10)),
+        ]
+        db.add_all(actions)
+        db.flush()
+        db.add(GameSessionLog(session_id=session.session_id, action_id=actions[1].action_id,
+                              timestamp=datetime(2026, 3, 1 + n, 9, 11), optional_note="note"))
+    db.commit()
+    return user_id
+
+def _snapshot(db, user_id: int) -> dict:
+    """What a restore has to reproduce, without the ids it remaps."""
+    sessions = db.execute(
+        select(GameSession.session_name, GameSession.status, GameSession.start_time,
+               GameSession.user_score, GameSession.llm_score)
+        .where(GameSession.user_id == user_id)
+        .order_by(GameSession.start_time)
+    ).all()
+    actions = db.execute(
+        select(GameSession.session_name, TrackedAction.timestamp,
+               func.coalesce(ActionLibrary.action_description, TrackedAction.action_description),
+               TrackedAction.library_id.is_not(None), TrackedAction.user_movement, TrackedAction.llm_movement)
+        .join(GameSession, GameSession.session_id == TrackedAction.session_id)
+        .outerjoin(ActionLibrary, ActionLibrary.library_id == TrackedAction.library_id)
+        .where(GameSession.user_id == user_id)
+        .order_by(TrackedAction.timestamp)
+    ).all()
+    logs = db.scalar(
+        select(func.count(GameSessionLog.log_id))
+        .join(GameSession, GameSession.session_id == GameSessionLog.session_id)
+        .where(GameSession.user_id == user_id)
+    )
+    return {"sessions": sessions, "actions": actions, "logs": logs}
+
+def _csv_file(user_id: int) -> io.BytesIO:
+    return io.BytesIO("".join(export.stream_csv(export.iter_all_sessions_rows(user_id))).encode("utf-8"))
+
+def _jsonl_files(user_id: int) -> list[io.BytesIO]:
+    return [
+        io.BytesIO("".join(research_export.stream_export(dataset, "jsonl", user_id, anonymize=False)).encode("utf-8"))
+        for dataset in research_export.DATASETS
+    ]
+
+def _restore(db, files: list[io.BytesIO]) -> tuple[int, dict]:
+    user_id = _new_user(db)
+    counts, _ = importer.import_files(db, user_id, files)
+    return user_id, counts
+
+def test_csv_roundtrip(db, source_user):
+    user_id, counts = _restore(db, [_csv_file(source_user)])
+
+    assert counts["sessions"] == 2
+    assert counts["actions"] == 4
+    restored, original = _snapshot(db, user_id), _snapshot(db, source_user)
+    # The CSV export carries no logs
+    assert restored["sessions"] == original["sessions"]
+    assert restored["actions"] == original["actions"]
+    assert restored["logs"] == 0
+
+def test_jsonl_roundtrip(db, source_user):
+    user_id, counts = _restore(db, _jsonl_files(source_user))
+
+    assert (counts["sessions"], counts["actions"], counts["logs"]) == (2, 4, 2)
+    assert _snapshot(db, user_id) == _snapshot(db, source_user)
+
+def test_empty_roundtrip(db):
+    empty_user = _new_user(db)
+    files = _jsonl_files(empty_user)
+    assert all(file.getvalue() == b"" for file in files)
+    assert importer.detect(files[0]) == "empty"
+
+    user_id, counts = _restore(db, files + [_csv_file(empty_user)])
+
+    assert (counts["sessions"], counts["actions"], counts["logs"]) == (0, 0, 0)
+    assert _snapshot(db, user_id) == {"sessions": [], "actions": [], "logs": 0}
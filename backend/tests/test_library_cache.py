@@ -0,0 +1,135 @@
+import time
+
+from app import library_cache
+from app.cache import TTLCache
+
+def _create(client, headers, session_id, description: str) -> dict:
+    response = client.post("/api/actions/library", headers=headers, json={
+        "action_description": description,
+        "default_user_movement": 1,
+        "default_llm_movement": 0,
+        "created_from_session_id": session_id,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def test_library_revalidates_until_a_custom_action_is_created(client, user, session_id):
+    _, headers = user
+    first = client.get("/api/actions/library", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert client.get("/api/actions/library", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    created = _create(client, headers, session_id, "Custom move")
+    after = client.get("/api/actions/library", headers={**headers, "If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != etag
+    assert created["library_id"] in [row["library_id"] for row in after.json()]
+    assert client.get("/api/actions/library", headers={**headers, "If-None-Match": after.headers["ETag"]}).status_code == 304
+
+def test_overlay_owners_go_with_their_overlay(client, user, session_id):
+    user_id, headers = user
+    created = _create(client, headers, session_id, "Owned move")["library_id"]
+    client.get("/api/actions/library", headers=headers)
+    assert library_cache._overlay_owner[created] == user_id
+
+    library_cache.invalidate_user(user_id)
+    assert created not in library_cache._overlay_owner
+
+    # Reloading the overlay claims it again; replacing the overlay keeps the claim
+    client.get("/api/actions/library", headers=headers)
+    assert library_cache._overlay_owner[created] == user_id
+    library_cache._drop("user", user_id)
+    client.get("/api/actions/library", headers=headers)
+    client.get("/api/actions/library", headers=headers)
+    assert library_cache._overlay_owner[created] == user_id
+
+def test_evicted_and_expired_entries_are_reported():
+    evicted = []
+    cache = TTLCache(maxsize=2, ttl=60, on_evict=lambda key, value: evicted.append((key, value)))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 3)
+    cache.set("c", 4)
+    assert evicted == [("a", 1), ("b", 2)]
+    cache.pop("a")
+    assert len(evicted) == 2
+
+    cache.set("d", 5, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("d") is None
+    assert evicted[-1] == ("d", 5)
+
+def test_pending_taps_show_before_the_flush_writes_them_once(client, db, user, session_id):
+    from sqlalchemy import event, select
+    from app.database import engine
+    from app.models import ActionLibrary
+    from app.usage_counter import usage_counter
+
+    _, headers = user
+    usage_counter.flush()
+    library_id = _create(client, headers, session_id, "Tapped move")["library_id"]
+    before = client.get("/api/actions/library", headers=headers)
+    for _ in range(3):
+        response = client.post("/api/actions/track", headers=headers, json={
+            "session_id": session_id, "library_id": library_id, "user_movement": 1, "llm_movement": 0
+        })
+        assert response.status_code == 201, response.text
+
+    # Not in the database yet, but already counted in times_used, the order and the ETag
+    assert db.scalar(select(ActionLibrary.times_used).where(ActionLibrary.library_id == library_id)) in (0, None)
+    pending = client.get("/api/actions/library", headers={**headers, "If-None-Match": before.headers["ETag"]})
+    assert pending.status_code == 200
+    assert pending.headers["ETag"] != before.headers["ETag"]
+    rows = {row["library_id"]: row for row in pending.json()}
+    assert rows[library_id]["times_used"] == 3
+
+    updates = []
+    def count_updates(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("UPDATE ACTION_LIBRARY"):
+            updates.append(statement)
+    event.listen(engine, "before_cursor_execute", count_updates)
+    try:
+        assert usage_counter.flush() == 3
+        assert usage_counter.flush() == 0
+    finally:
+        event.remove(engine, "before_cursor_execute", count_updates)
+    assert len(updates) == 1
+    db.expire_all()
+    assert db.scalar(select(ActionLibrary.times_used).where(ActionLibrary.library_id == library_id)) == 3
+
+    # Reloaded from the database, the count is not added twice
+    flushed = client.get("/api/actions/library", headers=headers)
+    assert {row["library_id"]: row for row in flushed.json()}[library_id]["times_used"] == 3
+    assert library_id not in usage_counter.snapshot()
+
+def test_session_state_orders_selected_actions_like_the_library(client, db, user, session_id):
+    from sqlalchemy import insert
+    from app.models import ActionLibrary
+
+    _, headers = user
+    ids = [_create(client, headers, session_id, f"Selectable {n}")["library_id"] for n in range(3)]
+    # Tap the last one so only a pending count puts it first
+    for _ in range(2):
+        client.post("/api/actions/track", headers=headers, json={
+            "session_id": session_id, "library_id": ids[2], "user_movement": 0, "llm_movement": 0
+        })
+    client.get("/api/actions/library", headers=headers)
+    # Written behind the cache's back, so the cached library doesn't hold it
+    unseen = db.execute(insert(ActionLibrary).values(
+        action_description="Unseen", default_user_movement=0, default_llm_movement=0,
+        times_used=1, user_created=True, created_from_session_id=session_id
+    ).returning(ActionLibrary.library_id)).scalar_one()
+    db.commit()
+
+    selection = [ids[1], unseen, ids[0], ids[2]]
+    picked = client.post("/api/sessions/", headers=headers, json={"selected_action_ids": selection}).json()["session_id"]
+    state = client.get(f"/api/sessions/{picked}/state", headers=headers).json()
+
+    expected = [ids[2], unseen, ids[0], ids[1]]
+    assert [row["library_id"] for row in state["library_actions"]] == expected
+    assert state["selected_action_ids"] == expected
+    assert [row["times_used"] for row in state["library_actions"]] == [2, 1, 0, 0]
+    # The same relative order the library endpoint uses
+    library = [row["library_id"] for row in client.get("/api/actions/library", headers=headers).json()]
+    assert [library_id for library_id in library if library_id in ids] == [ids[2], ids[0], ids[1]]
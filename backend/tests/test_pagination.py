@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+
+from app.models import GameSession, TrackedAction
+
+def _walk(client, url, headers, limit, **params) -> list[dict]:
+    rows, cursor, pages = [], None, 0
+    while True:
+        response = client.get(url, headers=headers, params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        assert len(response.json()) <= limit
+        rows += response.json()
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return rows
+        assert pages < 100
+
+def test_action_pages_cover_every_row_once(client, db, user, session_id):
+    _, headers = user
+    base = datetime(2026, 5, 1, 12, 0, 0)
+    # Runs of equal timestamps straddle page boundaries; some rows take the server default
+    stamps = [base] * 4 + [base + timedelta(seconds=1)] * 3 + [base + timedelta(microseconds=500)] * 2 + [None] * 3
+    rows = [
+        {"session_id": session_id, "action_description": f"a{n}", "user_movement": 0, "llm_movement": 0, "timestamp": stamp}
+        for n, stamp in enumerate(stamps)
+    ]
+    db.execute(insert(TrackedAction), [row for row in rows if row["timestamp"] is not None])
+    db.execute(insert(TrackedAction), [{k: v for k, v in row.items() if k != "timestamp"} for row in rows if row["timestamp"] is None])
+    db.commit()
+    expected = db.scalars(
+        select(TrackedAction.action_id)
+        .where(TrackedAction.session_id == session_id)
+        .order_by(TrackedAction.timestamp, TrackedAction.action_id)
+    ).all()
+
+    for limit in (1, 2, 3, 5, len(stamps), 50):
+        walked = _walk(client, f"/api/actions/session/{session_id}/actions", headers, limit)
+        assert [row["action_id"] for row in walked] == expected, limit
+
+def test_session_pages_newest_first(client, db, user):
+    user_id, headers = user
+    start = datetime(2026, 5, 2, 9, 0, 0)
+    db.execute(insert(GameSession), [
+        {"user_id": user_id, "session_name": f"s{n}", "status": "ended", "start_time": start - timedelta(hours=n // 3)}
+        for n in range(10)
+    ])
+    db.commit()
+    expected = db.scalars(
+        select(GameSession.session_id)
+        .where(GameSession.user_id == user_id)
+        .order_by(GameSession.start_time.desc(), GameSession.session_id.desc())
+    ).all()
+
+    for limit in (1, 3, 4, 10):
+        assert [row["session_id"] for row in _walk(client, "/api/sessions/", headers, limit)] == expected
+    # Filters hold across pages
+    assert len(_walk(client, "/api/sessions/", headers, 2, status="ended")) == 10
+    assert _walk(client, "/api/sessions/", headers, 2, status="active") == []
+
+def test_default_page_size_and_bad_cursor(client, db, user, session_id):
+    from app.pagination import DEFAULT_PAGE_SIZE
+    _, headers = user
+    db.execute(insert(TrackedAction), [
+        {"session_id": session_id, "action_description": "x", "user_movement": 0, "llm_movement": 0}
+    ] * (DEFAULT_PAGE_SIZE + 1))
+    db.commit()
+
+    response = client.get(f"/api/actions/session/{session_id}/actions", headers=headers)
+    assert len(response.json()) == DEFAULT_PAGE_SIZE
+    assert response.headers["X-Next-Cursor"]
+    bad = client.get(f"/api/actions/session/{session_id}/actions", headers=headers, params={"cursor": "not-a-cursor"})
+    assert bad.status_code == 400
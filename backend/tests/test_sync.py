@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+import uuid
+
+from app.models import GameSession, TrackedAction
+
+def _queue(now: datetime) -> list[dict]:
+    earlier = now - timedelta(hours=2)
+    return [
+        {"client_id": uuid.uuid4().hex, "action_description": "Offline one", "user_movement": 2, "llm_movement": 1,
+         "timestamp": earlier.replace(tzinfo=timezone.utc).isoformat()},
+        # Another offset, same instant a minute later
+        {"client_id": uuid.uuid4().hex, "action_description": "Offline two", "user_movement": 3, "llm_movement": 0,
+         "timestamp": (earlier + timedelta(minutes=1)).replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=5))).isoformat()},
+        # A device clock running fast
+        {"client_id": uuid.uuid4().hex, "action_description": "From the future", "user_movement": 0, "llm_movement": 4,
+         "timestamp": (now + timedelta(days=1)).isoformat()},
+    ]
+
+def test_queue_sent_twice_is_applied_once(client, db, user, session_id):
+    _, headers = user
+    now = datetime.utcnow().replace(microsecond=0)
+    queue = _queue(now)
+    # A queue can also repeat an action within itself
+    body = {"session_id": session_id, "since_version": 1, "actions": queue + [queue[0]]}
+
+    first = client.post("/api/sync", headers=headers, json=body)
+    assert first.status_code == 200, first.text
+    first = first.json()
+    assert first["applied"] == [action["client_id"] for action in queue]
+    assert first["session"]["version"] == 2
+    assert (first["session"]["user_score"], first["session"]["llm_score"]) == (5, 5)
+    assert len(first["actions"]) == 3
+
+    second = client.post("/api/sync", headers=headers, json=body).json()
+    assert second["applied"] == []
+    assert second["session"]["version"] == 2
+    assert (second["session"]["user_score"], second["session"]["llm_score"]) == (5, 5)
+
+    rows = db.execute(
+        select(TrackedAction.client_id, TrackedAction.timestamp)
+        .where(TrackedAction.session_id == session_id)
+        .order_by(TrackedAction.timestamp)
+    ).all()
+    assert [row.client_id for row in rows] == [action["client_id"] for action in queue]
+    # Client times are kept, in UTC, and clamped to the server clock
+    assert rows[0].timestamp == now - timedelta(hours=2)
+    assert rows[1].timestamp == now - timedelta(hours=2) + timedelta(minutes=1)
+    assert now <= rows[2].timestamp <= datetime.utcnow()
+    assert db.scalar(select(GameSession.user_score).where(GameSession.session_id == session_id)) == 5
+
+def test_sync_returns_changes_since_version(client, user, session_id):
+    _, headers = user
+    now = datetime.utcnow()
+    queue = _queue(now)
+    first = client.post("/api/sync", headers=headers, json={"session_id": session_id, "actions": queue[:1]}).json()
+    cursor = first["session"]["version"]
+
+    second = client.post("/api/sync", headers=headers, json={"session_id": session_id, "since_version": cursor, "actions": queue[1:]}).json()
+    assert sorted(action["action_description"] for action in second["actions"]) == ["From the future", "Offline two"]
+
+    empty = client.post("/api/sync", headers=headers, json={"session_id": session_id, "since_version": second["session"]["version"]}).json()
+    assert empty["actions"] == [] and empty["applied"] == []
+
+def test_sync_of_another_users_session(client, db, session_id):
+    from conftest import auth_headers, new_user_id
+    response = client.post("/api/sync", headers=auth_headers(new_user_id(db)), json={
+        "session_id": session_id, "actions": _queue(datetime.utcnow())
+    })
+    assert response.status_code == 404
+    assert db.scalar(select(TrackedAction.action_id).where(TrackedAction.session_id == session_id)) is None
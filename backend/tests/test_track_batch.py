@@ -0,0 +1,52 @@
+from sqlalchemy import func, select
+
+from app.models import GameSession, TrackedAction
+
+def _session(db, session_id: int):
+    db.expire_all()
+    return db.execute(
+        select(GameSession.user_score, GameSession.llm_score, GameSession.version)
+        .where(GameSession.session_id == session_id)
+    ).one()
+
+def test_batch_applies_summed_movement_as_one_version(client, db, user, session_id):
+    _, headers = user
+    movements = [(1, 0), (3, -2), (-1, 4), (0, 0), (2, 2)]
+    batch = [
+        {"session_id": session_id, "action_description": f"Action {n}", "user_movement": user_movement, "llm_movement": llm_movement}
+        for n, (user_movement, llm_movement) in enumerate(movements)
+    ]
+    before = _session(db, session_id)
+
+    response = client.post("/api/actions/track/batch", headers=headers, json=batch)
+    assert response.status_code == 201, response.text
+    actions = response.json()
+
+    after = _session(db, session_id)
+    assert after.user_score - before.user_score == sum(m[0] for m in movements)
+    assert after.llm_score - before.llm_score == sum(m[1] for m in movements)
+    assert after.version == before.version + 1
+    # Returned in insertion order, all written as that one version
+    assert [action["action_description"] for action in actions] == [f"Action {n}" for n in range(len(movements))]
+    assert {action["session_version"] for action in actions} == {after.version}
+    assert db.scalar(select(func.count()).where(TrackedAction.session_id == session_id)) == len(movements)
+
+def test_batch_for_someone_elses_session_writes_nothing(client, db, session_id):
+    from conftest import auth_headers, new_user_id
+    before = _session(db, session_id)
+    batch = [{"session_id": session_id, "action_description": "Not mine", "user_movement": 5, "llm_movement": 5}] * 3
+
+    response = client.post("/api/actions/track/batch", headers=auth_headers(new_user_id(db)), json=batch)
+    assert response.status_code == 404
+    assert _session(db, session_id) == before
+    assert db.scalar(select(func.count()).where(TrackedAction.session_id == session_id)) == 0
+
+def test_batch_must_name_one_session(client, db, user, session_id):
+    _, headers = user
+    batch = [
+        {"session_id": session_id, "action_description": "a", "user_movement": 1, "llm_movement": 0},
+        {"session_id": session_id + 1000, "action_description": "b", "user_movement": 1, "llm_movement": 0},
+    ]
+    assert client.post("/api/actions/track/batch", headers=headers, json=batch).status_code == 400
+    assert client.post("/api/actions/track/batch", headers=headers, json=[]).status_code == 400
+    assert db.scalar(select(func.count()).where(TrackedAction.session_id == session_id)) == 0
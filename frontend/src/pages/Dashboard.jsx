@@ -6,6 +6,8 @@ import axios from 'axios'
 export default function Dashboard() {
   const [sessions, setSessions] = useState([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [creating, setCreating] = useState(false)
   const [sessionName, setSessionName] = useState('')
   const { user, logout } = useAuth()
@@ -15,17 +17,27 @@ export default function Dashboard() {
     fetchSessions()
   }, [])
 
-  const fetchSessions = async () => {
+  // The list is paged; X-Next-Cursor is set while older sessions remain
+  const fetchSessions = async (cursor = null) => {
     try {
-      const response = await axios.get('/api/sessions/')
-      setSessions(response.data)
+      const response = await axios.get('/api/sessions/', {
+        params: cursor ? { cursor } : {}
+      })
+      setSessions((current) => (cursor ? [...current, ...response.data] : response.data))
+      setNextCursor(response.headers['x-next-cursor'] || null)
     } catch (error) {
       console.error('Failed to fetch sessions:', error)
     } finally {
       setLoading(false)
+      setLoadingMore(false)
     }
   }
 
+  const loadMoreSessions = () => {
+    setLoadingMore(true)
+    fetchSessions(nextCursor)
+  }
+
   const createSession = async (e) => {
     e.preventDefault()
     // Navigate to action picker instead of creating session directly
@@ -172,6 +184,17 @@ export default function Dashboard() {
               ))
             )}
           </div>
+          {nextCursor && (
+            <div className="px-6 py-4 border-t border-gray-200 text-center">
+              <button
+                onClick={loadMoreSessions}
+                disabled={loadingMore}
+                className="text-sm text-gray-600 hover:text-gray-900 font-medium disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more sessions'}
+              </button>
+            </div>
+          )}
         </div>
       </main>
     </div>
@@ -1,8 +1,28 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useParams, useNavigate, useLocation } from 'react-router-dom'
 import axios from 'axios'
 import ScoreBars from '../components/ScoreBars'
 
+// Taps are queued locally and sent to /api/sync in one request per interval
+const SYNC_INTERVAL_MS = 3000
+
+const queueKey = (sessionId) => `turn-sync-queue-${sessionId}`
+
+const loadQueue = (sessionId) => {
+  try {
+    return JSON.parse(localStorage.getItem(queueKey(sessionId))) || []
+  } catch {
+    return []
+  }
+}
+
+const newClientId = () =>
+  crypto.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(36).slice(2)}`
+
+// Server timestamps share one ISO format, so they sort as strings
+const byTime = (a, b) =>
+  a.timestamp < b.timestamp ? -1 : a.timestamp > b.timestamp ? 1 : a.action_id - b.action_id
+
 export default function GameSession() {
   const { sessionId } = useParams()
   const navigate = useNavigate()
@@ -10,7 +30,6 @@ export default function GameSession() {
   const initialCustomActions = location.state?.initialCustomActions || []
 
   const [session, setSession] = useState(null)
-  const [actions, setActions] = useState([])
   const [actionLibrary, setActionLibrary] = useState([])
   const [selectedAction, setSelectedAction] = useState(null)
   const [customAction, setCustomAction] = useState('')
@@ -23,18 +42,54 @@ export default function GameSession() {
   const [sessionCustomActions, setSessionCustomActions] = useState(initialCustomActions) // Initialize with pre-session customs
   const [showEndDialog, setShowEndDialog] = useState(false)
   const [actionsToSave, setActionsToSave] = useState([])
+  const [pendingActions, setPendingActions] = useState([])
+  const [offline, setOffline] = useState(false)
+
+  // Refs so the interval and event handlers always see the latest values
+  const pendingRef = useRef([])
+  const versionRef = useRef(null)
+  const syncingRef = useRef(false)
+
+  useEffect(() => {
+    versionRef.current = null
+    fetchSessionState()
+  }, [sessionId])
 
   useEffect(() => {
-    fetchSession()
-    fetchActionLibrary()
-    fetchTrackedActions()
-    fetchSelectedActions()
+    const interval = setInterval(() => {
+      if (pendingRef.current.length > 0) syncNow()
+    }, SYNC_INTERVAL_MS)
+    window.addEventListener('online', syncNow)
+    return () => {
+      clearInterval(interval)
+      window.removeEventListener('online', syncNow)
+      // Whatever is still queued stays in localStorage for the next visit
+      if (pendingRef.current.length > 0) syncNow()
+    }
   }, [sessionId])
 
-  const fetchSession = async () => {
+  const setQueue = (queue) => {
+    pendingRef.current = queue
+    localStorage.setItem(queueKey(sessionId), JSON.stringify(queue))
+    setPendingActions(queue)
+  }
+
+  // One request loads the session, its selected actions, tracked actions and logs
+  const fetchSessionState = async () => {
     try {
-      const response = await axios.get(`/api/sessions/${sessionId}`)
-      setSession(response.data)
+      const response = await axios.get(`/api/sessions/${sessionId}/state`)
+      const tracked = response.data.tracked_actions
+      setSession(response.data.session)
+      setActionLibrary(response.data.library_actions)
+      setSelectedActionIds(response.data.selected_action_ids)
+      setTrackedActions(tracked)
+      addCustomActions(tracked)
+
+      // Drop queued actions an earlier sync stored but never heard back about
+      const stored = new Set(tracked.map(action => action.client_id))
+      setQueue(loadQueue(sessionId).filter(action => !stored.has(action.client_id)))
+      versionRef.current = response.data.session.version
+      if (pendingRef.current.length > 0) syncNow()
     } catch (error) {
       console.error('Failed to fetch session:', error)
       navigate('/dashboard')
@@ -43,91 +98,92 @@ export default function GameSession() {
     }
   }
 
-  const fetchActionLibrary = async () => {
+  // Sends the queue and merges in everything written since our last sync
+  const syncNow = async () => {
+    if (syncingRef.current || versionRef.current === null) return
+    syncingRef.current = true
+    const sent = pendingRef.current
     try {
-      const response = await axios.get('/api/actions/library')
-      setActionLibrary(response.data)
-    } catch (error) {
-      console.error('Failed to fetch action library:', error)
-    }
-  }
-
-  const fetchTrackedActions = async () => {
-    try {
-      const response = await axios.get(`/api/actions/session/${sessionId}/actions`)
-      setTrackedActions(response.data)
-
-      // Extract custom actions (those without library_id) from tracked actions
-      const trackedCustomActions = response.data
-        .filter(action => !action.library_id && action.action_description)
-        .map(action => ({
-          action_description: action.action_description,
-          default_user_movement: action.user_movement,
-          default_llm_movement: action.llm_movement,
-          action_id: action.action_id
-        }))
-
-      // Merge with pre-session custom actions, removing duplicates by description
-      setSessionCustomActions(prevCustoms => {
-        const allCustomActions = [...prevCustoms, ...trackedCustomActions]
-        return allCustomActions.filter((action, index, self) =>
-          index === self.findIndex(a => a.action_description === action.action_description)
-        )
+      const response = await axios.post('/api/sync', {
+        session_id: parseInt(sessionId),
+        since_version: versionRef.current,
+        actions: sent
       })
+      // Everything sent is stored now, by this request or an earlier one
+      const sentIds = new Set(sent.map(action => action.client_id))
+      setQueue(pendingRef.current.filter(action => !sentIds.has(action.client_id)))
+      versionRef.current = response.data.session.version
+      setSession(response.data.session)
+      mergeTrackedActions(response.data.actions)
+      setOffline(false)
     } catch (error) {
-      console.error('Failed to fetch tracked actions:', error)
+      // The queue is kept and retried on the next interval
+      if (!error.response) {
+        setOffline(true)
+      } else {
+        console.error('Failed to sync actions:', error)
+      }
+    } finally {
+      syncingRef.current = false
     }
   }
 
-  const fetchSelectedActions = async () => {
-    try {
-      const response = await axios.get(`/api/sessions/${sessionId}/selected-actions`)
-      setSelectedActionIds(response.data)
-    } catch (error) {
-      console.error('Failed to fetch selected actions:', error)
-    }
+  const mergeTrackedActions = (tracked) => {
+    if (tracked.length === 0) return
+    setTrackedActions(prev => {
+      const byId = new Map(prev.map(action => [action.action_id, action]))
+      tracked.forEach(action => byId.set(action.action_id, action))
+      return [...byId.values()].sort(byTime)
+    })
+    addCustomActions(tracked)
   }
 
-  const trackAction = async (libraryId = null, description = null, userMov = 0, llmMov = 0, isNewCustom = false) => {
-    try {
-      const response = await axios.post('/api/actions/track', {
-        session_id: parseInt(sessionId),
-        library_id: libraryId,
-        action_description: description,
-        user_movement: userMov,
-        llm_movement: llmMov
-      })
-
-      // Update local session scores immediately for smooth UX
-      setSession(prev => ({
-        ...prev,
-        user_score: prev.user_score + userMov,
-        llm_score: prev.llm_score + llmMov
+  const addCustomActions = (tracked) => {
+    // Extract custom actions (those without library_id) from tracked actions
+    const trackedCustomActions = tracked
+      .filter(action => !action.library_id && action.action_description)
+      .map(action => ({
+        action_description: action.action_description,
+        default_user_movement: action.user_movement,
+        default_llm_movement: action.llm_movement,
+        action_id: action.action_id
       }))
 
-      setActions(prev => [response.data, ...prev])
-
-      // Only add to sessionCustomActions if this is a NEW custom action (not reusing an existing one)
-      if (isNewCustom && !libraryId && description) {
-        const customActionObj = {
-          action_description: description,
-          default_user_movement: userMov,
-          default_llm_movement: llmMov,
-          action_id: response.data.action_id
-        }
-        setSessionCustomActions(prev => [...prev, customActionObj])
-      }
+    // Merge with pre-session custom actions, removing duplicates by description
+    setSessionCustomActions(prevCustoms => {
+      const allCustomActions = [...prevCustoms, ...trackedCustomActions]
+      return allCustomActions.filter((action, index, self) =>
+        index === self.findIndex(a => a.action_description === action.action_description)
+      )
+    })
+  }
 
-      setSelectedAction(null)
-      setShowCustom(false)
-      setCustomAction('')
+  const trackAction = (libraryId = null, description = null, userMov = 0, llmMov = 0, isNewCustom = false) => {
+    // Recorded locally right away; the next sync sends it with its original time
+    const action = {
+      client_id: newClientId(),
+      library_id: libraryId,
+      action_description: description,
+      user_movement: userMov,
+      llm_movement: llmMov,
+      timestamp: new Date().toISOString()
+    }
+    setQueue([...pendingRef.current, action])
 
-      // Refresh tracked actions
-      fetchTrackedActions()
-    } catch (error) {
-      console.error('Failed to track action:', error)
-      alert('Failed to track action')
+    // Only add to sessionCustomActions if this is a NEW custom action (not reusing an existing one)
+    if (isNewCustom && !libraryId && description) {
+      const customActionObj = {
+        action_description: description,
+        default_user_movement: userMov,
+        default_llm_movement: llmMov,
+        action_id: action.client_id
+      }
+      setSessionCustomActions(prev => [...prev, customActionObj])
     }
+
+    setSelectedAction(null)
+    setShowCustom(false)
+    setCustomAction('')
   }
 
   const handleLibraryAction = (action) => {
@@ -158,14 +214,15 @@ export default function GameSession() {
     trackAction(
       null,
       customAction,
-      parseInt(customUserMovement),
-      parseInt(customLlmMovement),
+      parseInt(customUserMovement) || 0,
+      parseInt(customLlmMovement) || 0,
       true  // This IS a new custom action
     )
   }
 
   const pauseSession = async () => {
     try {
+      await syncNow()
       const response = await axios.post(`/api/sessions/${sessionId}/pause`)
       setSession(response.data)
     } catch (error) {
@@ -195,6 +252,11 @@ export default function GameSession() {
   }
 
   const confirmEndSession = async () => {
+    await syncNow()
+    if (pendingRef.current.length > 0) {
+      alert('Some actions have not synced yet. Reconnect before ending the session.')
+      return
+    }
     try {
       // Save selected custom actions to library
       for (const action of actionsToSave) {
@@ -252,6 +314,11 @@ export default function GameSession() {
     return null
   }
 
+  // Queued actions count towards the scores and history until they sync
+  const userScore = session.user_score + pendingActions.reduce((sum, action) => sum + action.user_movement, 0)
+  const llmScore = session.llm_score + pendingActions.reduce((sum, action) => sum + action.llm_movement, 0)
+  const history = [...trackedActions, ...pendingActions]
+
   return (
     <div className="min-h-screen bg-gray-50">
       {/* Header */}
@@ -306,8 +373,15 @@ export default function GameSession() {
       <main className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8 py-8">
         {/* Score Bars - Sticky */}
         <div className="sticky top-16 z-20 bg-white rounded-lg shadow p-6 mb-8">
-          <h2 className="text-lg font-semibold mb-4">Collaboration Balance</h2>
-          <ScoreBars userScore={session.user_score} llmScore={session.llm_score} />
+          <div className="flex justify-between items-center mb-4">
+            <h2 className="text-lg font-semibold">Collaboration Balance</h2>
+            {pendingActions.length > 0 && (
+              <span className="text-xs text-gray-500">
+                {offline ? 'Offline, ' : ''}{pendingActions.length} action{pendingActions.length === 1 ? '' : 's'} waiting to sync
+              </span>
+            )}
+          </div>
+          <ScoreBars userScore={userScore} llmScore={llmScore} />
         </div>
 
         {session.status === 'active' && (
@@ -441,11 +515,11 @@ export default function GameSession() {
         )}
 
         {/* Session History */}
-        {trackedActions.length > 0 && (
+        {history.length > 0 && (
           <div className="bg-white rounded-lg shadow p-6">
             <h2 className="text-lg font-semibold mb-4">Session History</h2>
             <div className="space-y-3">
-              {trackedActions.map((action, index) => {
+              {history.map((action, index) => {
                 // Find the library action for description if library_id exists
                 const libraryAction = action.library_id
                   ? actionLibrary.find(a => a.library_id === action.library_id)
@@ -453,9 +527,9 @@ export default function GameSession() {
                 const description = libraryAction?.action_description || action.action_description || 'Custom action'
 
                 return (
-                  <div key={action.action_id} className="flex items-center justify-between p-3 bg-gray-50 rounded-lg">
+                  <div key={action.client_id ?? action.action_id} className="flex items-center justify-between p-3 bg-gray-50 rounded-lg">
                     <div className="flex items-center gap-3">
-                      <span className="text-sm font-medium text-gray-500">#{trackedActions.length - index}</span>
+                      <span className="text-sm font-medium text-gray-500">#{history.length - index}</span>
                       <span className="text-sm text-gray-900">{description}</span>
                     </div>
                     <div className="flex gap-4 text-xs">